@@ -1,76 +1,122 @@
 from tabulate import tabulate
 from rich.console import Console
 import json
+import os
+
+from assistant.rewards.rewards_log import summarize_log
+
 console = Console()
-class RewardsLogger:
-    def __init__(self):
-        self._distributionInfo = {}
-        self._unlockSchedules = {}
-        self._userData = {}
-        self._epochData = {}
 
-    def _check_user_vault(self,address,vault):
-        if vault not in self._userData:
-            self._userData[vault] = {}
-        if address not in self._userData[vault]:
-            self._userData[vault][address] = {}
+"""
+Rewards calculation log
+
+Every value is appended as one JSON record per line (one per vault, user, token / epoch) as it is produced,
+buffered and flushed in batches, rather than held in nested dicts for the whole run.
+save() moves the stream to logs/<name>.jsonl. The nested summary (logs/<name>.json) holds every user for every
+epoch at once, so it is only built on request: save(name, summary=True), or afterwards with
+scripts/rewards/query_rewards_log.py summarize logs/<name>.jsonl
+"""
+
+
+class JsonLinesSink:
+    def __init__(self, path, batchSize=10000):
+        self.path = path
+        self.batchSize = batchSize
+        self._buffer = []
+        self._file = None
+        self.count = 0
+
+    def write(self, record):
+        self._buffer.append(json.dumps(record))
+        self.count += 1
+        if len(self._buffer) >= self.batchSize:
+            self.flush()
+
+    def flush(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        if len(self._buffer) > 0:
+            self._file.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._file = None
 
 
+class RewardsLogger:
+    def __init__(self, logDir="logs", batchSize=10000):
+        self.logDir = logDir
+        self.batchSize = batchSize
+        self._sink = None
+
+    @property
+    def sink(self):
+        # Spool file for the current run, renamed on save
+        if self._sink is None:
+            path = os.path.join(self.logDir, ".rewards-{}.jsonl.part".format(os.getpid()))
+            if os.path.exists(path):
+                os.remove(path)
+            self._sink = JsonLinesSink(path, self.batchSize)
+        return self._sink
+
     def add_epoch_data(self,users,vault,token,unit,epoch):
-        if vault not in self._epochData:
-            self._epochData[vault] = {}
-        if epoch not in self._epochData[vault]:
-            self._epochData[vault][epoch] = {}
         for user in users:
-            totals = {}
-            totals[token] = unit * user.shareSeconds
-            self._epochData[vault][epoch][user.address] = {
-                "shareSeconds":user.shareSeconds,
-                "totals":totals
-            }
-
-    
+            self.sink.write(
+                {
+                    "type": "epoch",
+                    "vault": vault,
+                    "epoch": epoch,
+                    "user": user.address,
+                    "shareSeconds": user.shareSeconds,
+                    "token": token,
+                    "amount": unit * user.shareSeconds,
+                }
+            )
 
     def add_user_share_seconds(self,address,vault,shareSeconds):
-        self._check_user_vault(address,vault)
-        if "shareSeconds" not in self._userData[vault][address]:
-            self._userData[vault][address]["shareSeconds"] = shareSeconds
-        else:
-            self._userData[vault][address]["shareSeconds"] += shareSeconds
+        self.sink.write(
+            {"type": "shareSeconds", "vault": vault, "user": address, "amount": shareSeconds}
+        )
 
     def add_user_token(self,address,vault,token,tokenAmount):
-        self._check_user_vault(address,vault)
-        if "totals" not in self._userData[vault][address]:
-            self._userData[vault][address]["totals"] = {}
-        if token not in self._userData[vault][address]["totals"]:
-            self._userData[vault][address]["totals"][token] = tokenAmount
-        else:
-            self._userData[vault][address]["totals"][token] += tokenAmount
+        self.sink.write(
+            {"type": "token", "vault": vault, "user": address, "token": token, "amount": tokenAmount}
+        )
 
     def add_multiplier(self,address,vault,multiplier):
-        self._check_user_vault(address,vault)
-        self._userData[vault][address]["multiplier"] = multiplier
+        self.sink.write(
+            {"type": "multiplier", "vault": vault, "user": address, "multiplier": multiplier}
+        )
 
     def add_unlock_schedule(self,token,schedule):
-        self._unlockSchedules[token] = schedule
+        self.sink.write({"type": "unlockSchedule", "token": token, "schedule": schedule})
 
     def add_distribution_info(self,geyserName,distribution):
-        self._distributionInfo[geyserName] = distribution
-
+        self.sink.write(
+            {"type": "distribution", "vault": geyserName, "distribution": distribution}
+        )
 
+    def save(self,fileName,summary=False):
+        """
+        Finish the current run: logs/<fileName>.jsonl holds the records, and with summary logs/<fileName>.json
+        the nested summary rebuilt from them
+        """
+        sink = self.sink
+        sink.close()
+        self._sink = None
 
+        streamPath = os.path.join(self.logDir, "{}.jsonl".format(fileName))
+        os.replace(sink.path, streamPath)
+        console.print("Logged {} records to {}".format(sink.count, streamPath))
 
-    def save(self,fileName):
+        if summary:
+            with open(os.path.join(self.logDir, "{}.json".format(fileName)), "w") as f:
+                json.dump(summarize_log(streamPath), f, indent=4)
 
-        data = {
-            "userData":self._userData,
-            "distributionInfo":self._distributionInfo,
-            "unlockSchedules":self._unlockSchedules,
-            "retroactiveData":self._epochData
-        }
-        with open("logs/{}.json".format(fileName),"w") as f:
-            json.dump(data,f,indent=4)
-    
 
 
-rewardsLogger = RewardsLogger()
\ No newline at end of file
+rewardsLogger = RewardsLogger()
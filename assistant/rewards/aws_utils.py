@@ -1,29 +1,108 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
-from brownie import *
+from boto3.s3.transfer import TransferConfig
 import requests
 from rich.console import Console
 
-console = Console()
+from assistant.rewards.local_s3 import LocalS3Client
+from assistant.rewards.proof_index import index_filenames
 
+console = Console()
 
-def download_latest_tree():
-    from config.env_config import env_config
+MB = 1024 * 1024
+
+# Files above the threshold are uploaded as concurrent multipart transfers
+transfer_config = TransferConfig(
+    multipart_threshold=8 * MB, multipart_chunksize=8 * MB, max_concurrency=8
+)
+
+_s3 = None
+_s3_lock = threading.Lock()
+
+
+def get_s3():
+    """
+    Shared S3 client, created on first use. Uses the local filesystem stand-in when S3_LOCAL_ROOT is set
+    """
+    global _s3
+    with _s3_lock:
+        if _s3 is None:
+            from config.env_config import env_config
+
+            if env_config.s3_local_root:
+                console.print("Using local S3 stand-in at " + env_config.s3_local_root)
+                _s3 = LocalS3Client(env_config.s3_local_root)
+            else:
+                session = boto3.session.Session(
+                    aws_access_key_id=env_config.aws_access_key_id,
+                    aws_secret_access_key=env_config.aws_secret_access_key,
+                )
+                _s3 = session.client("s3")
+    return _s3
+
+
+def set_s3(client):
+    """
+    Replace the shared client, e.g. with a LocalS3Client in tests
+    """
+    global _s3
+    with _s3_lock:
+        _s3 = client
+
+
+def open_object(bucket, key):
+    """
+    Open an object as a binary stream, transparently decompressing gzip encoded objects
+    """
+    s3_clientobj = get_s3().get_object(Bucket=bucket, Key=key)
+    body = s3_clientobj["Body"]
+    if s3_clientobj.get("ContentEncoding") == "gzip":
+        return gzip.GzipFile(fileobj=body)
+    return body
+
+
+def download_json(bucket, key):
+    """
+    Parse an object straight from the response stream
+    """
+    stream = open_object(bucket, key)
+    try:
+        return json.load(io.TextIOWrapper(stream, encoding="utf-8"))
+    finally:
+        stream.close()
+
+
+def download_to_file(bucket, key, path):
+    stream = open_object(bucket, key)
+    try:
+        with open(path + ".tmp", "wb") as f:
+            shutil.copyfileobj(stream, f, MB)
+    finally:
+        stream.close()
+    os.replace(path + ".tmp", path)
+    return path
 
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=env_config.aws_access_key_id,
-        aws_secret_access_key=env_config.aws_secret_access_key,
-    )
 
+def download_latest_tree():
     target = {
         "bucket": "badger-merkle-proofs",
         "key": "badger-tree.json",
     }  # badger-api production
 
     console.print("Downloading latest rewards file from s3: " + target["bucket"])
-    s3_clientobj = s3.get_object(Bucket=target["bucket"], Key=target["key"])
-    s3_clientdata = s3_clientobj["Body"].read().decode("utf-8")
-    return s3_clientdata
+    stream = open_object(target["bucket"], target["key"])
+    try:
+        return stream.read().decode("utf-8")
+    finally:
+        stream.close()
 
 
 def download(fileName):
@@ -33,64 +112,124 @@ def download(fileName):
     return requests.get(url=url).json()
 
 
+upload_bucket = "badger-json"
+
+
+def rewards_file_key(fileName):
+    # Local files may live in a state directory; the bucket is keyed by file name only
+    return "rewards/" + os.path.basename(fileName)
+
+
 def download_bucket(fileName):
-    from config.env_config import env_config
+    upload_file_key = rewards_file_key(fileName)
 
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=env_config.aws_access_key_id,
-        aws_secret_access_key=env_config.aws_secret_access_key,
-    )
+    console.print("Downloading file from s3: " + upload_file_key)
+
+    stream = open_object(upload_bucket, upload_file_key)
+    try:
+        return stream.read().decode("utf-8")
+    finally:
+        stream.close()
 
-    upload_bucket = "badger-json"
-    upload_file_key = "rewards/" + fileName
 
+def download_bucket_json(fileName):
+    upload_file_key = rewards_file_key(fileName)
     console.print("Downloading file from s3: " + upload_file_key)
+    return download_json(upload_bucket, upload_file_key)
 
-    s3_clientobj = s3.get_object(Bucket=upload_bucket, Key=upload_file_key)
-    # console.print(s3_clientobj)
-    s3_clientdata = s3_clientobj["Body"].read().decode("utf-8")
 
-    return s3_clientdata
+def download_bucket_to_file(fileName, path=None):
+    upload_file_key = rewards_file_key(fileName)
+    console.print("Downloading file from s3: " + upload_file_key)
+    return download_to_file(upload_bucket, upload_file_key, path or fileName)
 
 
-def upload(fileName, bucket="badger-json", publish=True):
-    from config.env_config import env_config
+def get_upload_targets(fileName, publish=True):
     if not publish:
-        upload_targets = [
+        return [
             {
                 "bucket": "badger-json",
-                "key": "rewards/" + fileName,
+                "key": rewards_file_key(fileName),
             },  # badger-json rewards api
         ]
 
     # enumeration of reward api dependency upload targets
-    if publish:
-        upload_targets = []
-        upload_targets.append(
-            {
-                "bucket": "badger-staging-merkle-proofs",
-                "key": "badger-tree.json",
-            }  # badger-api staging
-        )
-
-        upload_targets.append(
-            {
-                "bucket": "badger-merkle-proofs",
-                "key": "badger-tree.json",
-            }  # badger-api production
-        )
-
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=env_config.aws_access_key_id,
-        aws_secret_access_key=env_config.aws_secret_access_key,
+    return [
+        {
+            "bucket": "badger-staging-merkle-proofs",
+            "key": "badger-tree.json",
+        },  # badger-api staging
+        {
+            "bucket": "badger-merkle-proofs",
+            "key": "badger-tree.json",
+        },  # badger-api production
+    ]
+
+
+def get_index_upload_targets(fileName):
+    """
+    (path, target) for the proof index files written next to a content file, keyed beside it in the rewards bucket
+    """
+    return [
+        (path, {"bucket": upload_bucket, "key": rewards_file_key(path)})
+        for path in index_filenames(fileName)
+        if os.path.exists(path)
+    ]
+
+
+def compress_file(fileName):
+    """
+    Gzip a file into a temporary file, returning its path
+    """
+    (handle, path) = tempfile.mkstemp(suffix=".json.gz")
+    with open(fileName, "rb") as source, os.fdopen(handle, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed, MB)
+    return path
+
+
+def upload_target(s3, fileName, target, extraArgs):
+    console.print("Uploading file to s3://" + target["bucket"] + "/" + target["key"])
+    s3.upload_file(
+        fileName,
+        target["bucket"],
+        target["key"],
+        ExtraArgs=extraArgs,
+        Config=transfer_config,
     )
-    for target in upload_targets:
-        console.print(
-            "Uploading file to s3://" + target["bucket"] + "/" + target["key"]
-        )
-        s3.upload_file(fileName, target["bucket"], target["key"])
-        console.print(
-            "✅ Uploaded file to s3://" + target["bucket"] + "/" + target["key"]
-        )
+    console.print("✅ Uploaded file to s3://" + target["bucket"] + "/" + target["key"])
+
+
+def upload(fileName, publish=True):
+    from config.env_config import env_config
+
+    upload_targets = get_upload_targets(fileName, publish)
+
+    s3 = get_s3()
+
+    # Compress once, then send the same payload to every target concurrently
+    extraArgs = {"ContentType": "application/json"}
+    payload = fileName
+    if env_config.s3_gzip_uploads:
+        payload = compress_file(fileName)
+        extraArgs["ContentEncoding"] = "gzip"
+
+    # The proof index goes with the content file; it is binary and read by offset, so never compressed
+    index_targets = [] if publish else get_index_upload_targets(fileName)
+    indexArgs = {"ContentType": "application/octet-stream"}
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(upload_targets) + len(index_targets)) as executor:
+            futures = [
+                executor.submit(upload_target, s3, payload, target, extraArgs)
+                for target in upload_targets
+            ] + [
+                executor.submit(upload_target, s3, path, target, indexArgs)
+                for (path, target) in index_targets
+            ]
+            # Surface the first failure after all targets have been attempted
+            for future in futures:
+                future.result()
+    finally:
+        if payload != fileName:
+            os.remove(payload)
@@ -5,7 +5,9 @@ from assistant.rewards.BadgerGeyserMock import BadgerGeyserMock
 from assistant.rewards.RewardsLogger import rewardsLogger
 from brownie import *
 from dotmap import DotMap
+from eth_utils import encode_hex, event_abi_to_log_topic
 from helpers.constants import AddressZero
+from helpers.rpc_batch import get_block_timestamps, get_rpc_batch
 from rich.console import Console
 from tqdm import trange
 
@@ -16,10 +18,16 @@ digg_token = "0x798D1bE841a82a273720CE31c822C61a67a601C3"
 badger_token = "0x3472A5A71965499acd81997a54BBA8D852C6E53d"
 badger_tree = "0x660802Fc641b154aBA66a62137e71f331B6d787A"
 
-def calc_geyser_stakes(key, geyser, periodStartBlock, periodEndBlock):
-    globalStartTime = web3.eth.getBlock(globalStartBlock)["timestamp"]
-    periodStartTime = web3.eth.getBlock(periodStartBlock)["timestamp"]
-    periodEndTime = web3.eth.getBlock(periodEndBlock)["timestamp"]
+def calc_geyser_stakes(key, geyser, periodStartBlock, periodEndBlock, state=None):
+    """
+    state (rewards_state.RewardsState) keeps block times, geyser events and mock checkpoints warm between runs
+    """
+    if state:
+        return calc_geyser_stakes_warm(key, geyser, periodStartBlock, periodEndBlock, state)
+
+    blockTimes = get_block_timestamps([periodStartBlock, periodEndBlock])
+    periodStartTime = blockTimes[periodStartBlock]
+    periodEndTime = blockTimes[periodEndBlock]
 
     geyserMock = BadgerGeyserMock(key)
     geyserMock.set_current_period(periodStartTime, periodEndTime)
@@ -37,6 +45,26 @@ def calc_geyser_stakes(key, geyser, periodStartBlock, periodEndBlock):
     )
 
 
+def calc_geyser_stakes_warm(key, geyser, periodStartBlock, periodEndBlock, state):
+    state.blockTimes.prefetch([periodStartBlock, periodEndBlock])
+    periodStartTime = state.blockTimes.timestamp(periodStartBlock)
+    periodEndTime = state.blockTimes.timestamp(periodEndBlock)
+
+    with state.metrics.stage("collect_actions"):
+        events = state.events.get_events(geyser, globalStartBlock, periodEndBlock)
+        actions = build_actions(events)
+
+    with state.metrics.stage("process_actions"):
+        geyserMock = state.checkpoints.mock_for_period(
+            key, actions, periodStartTime, periodEndTime
+        )
+
+    with state.metrics.stage("token_distributions"):
+        return calculate_token_distributions(
+            geyser, geyserMock, periodStartTime, periodEndTime
+        )
+
+
 def calculate_token_distributions(
     geyser, geyserMock: BadgerGeyserMock, snapshotStartTime, periodEndTime
 ):
@@ -134,7 +162,46 @@ def collect_actions(geyser):
     return actions
 
 
-def collect_actions_from_events(geyser, startBlock, endBlock):
+def fetch_geyser_events(geyser, startBlock, endBlock):
+    """
+    Raw Staked / Unstaked event args in the block range, stakes first
+    """
+    contract = web3.eth.contract(geyser.address, abi=BadgerGeyser.abi)
+    events = {"Staked": [], "Unstaked": []}
+
+    batch = get_rpc_batch()
+    if batch:
+        # Every 1000 block window as one eth_getLogs, sent in JSON-RPC batches
+        requests = []
+        for name in ["Staked", "Unstaked"]:
+            event = getattr(contract.events, name)
+            topic = encode_hex(event_abi_to_log_topic(event().abi))
+            for start in range(startBlock, endBlock + 1, 1000):
+                logFilter = {
+                    "address": geyser.address,
+                    "fromBlock": start,
+                    "toBlock": min(start + 999, endBlock),
+                    "topics": [topic],
+                }
+                requests.append((name, event, batch.get_logs(logFilter)))
+        batch.flush()
+        for name, event, logs in requests:
+            for log in logs.result():
+                decoded = event().processLog(log)
+                events[name].append(dict(decoded["args"], blockNumber=decoded["blockNumber"]))
+        return events
+
+    for name in ["Staked", "Unstaked"]:
+        event = getattr(contract.events, name)
+        for start in trange(startBlock, endBlock + 1, 1000):
+            end = min(start + 999, endBlock)
+            logs = event().getLogs(fromBlock=start, toBlock=end)
+            for log in logs:
+                events[name].append(dict(log["args"], blockNumber=log["blockNumber"]))
+    return events
+
+
+def build_actions(events):
     """
     Construct a sequence of stake and unstake actions from events
     Unstakes for a given block are ALWAYS processed after the stakes, as we aren't tracking the transaction order within a block
@@ -142,54 +209,45 @@ def collect_actions_from_events(geyser, startBlock, endBlock):
     user -> timestamp -> action[]
     action: STAKE or UNSTAKE w/ parameters. (Stakes are always processed before unstakes within a given block)
     """
-    contract = web3.eth.contract(geyser.address, abi=BadgerGeyser.abi)
     actions = DotMap()
-    console.log("collecting actions")
     # Add stake actions
-    for start in trange(startBlock, endBlock, 1000):
-        end = min(start + 999, endBlock)
-        logs = contract.events.Staked().getLogs(fromBlock=start, toBlock=end)
-        for log in logs:
-            timestamp = log["args"]["timestamp"]
-            user = log["args"]["user"]
-            #console.log("Staked", log["args"])
-            if user != AddressZero:
-                if not actions[user]:
-                    actions[user] = OrderedDict()
-                if not timestamp in actions[user]:
-                    actions[user][timestamp] = []
-                actions[user][timestamp].append(
-                    DotMap(
-                        user=user,
-                        action="Stake",
-                        amount=log["args"]["amount"],
-                        userTotal=log["args"]["total"],
-                        stakedAt=log["args"]["timestamp"],
-                        timestamp=log["args"]["timestamp"],
-                    )
+    for args in events["Staked"]:
+        timestamp = args["timestamp"]
+        user = args["user"]
+        if user != AddressZero:
+            if not actions[user]:
+                actions[user] = OrderedDict()
+            if not timestamp in actions[user]:
+                actions[user][timestamp] = []
+            actions[user][timestamp].append(
+                DotMap(
+                    user=user,
+                    action="Stake",
+                    amount=args["amount"],
+                    userTotal=args["total"],
+                    stakedAt=args["timestamp"],
+                    timestamp=args["timestamp"],
                 )
+            )
 
     # Add unstake actions
-    for start in trange(startBlock, endBlock, 1000):
-        end = min(start + 999, endBlock)
-        logs = contract.events.Unstaked().getLogs(fromBlock=start, toBlock=end)
-        for log in logs:
-            timestamp = log["args"]["timestamp"]
-            user = log["args"]["user"]
-            if user != AddressZero:
-                if not actions[user]:
-                    actions[user] = OrderedDict()
-                if not timestamp in actions[user]:
-                    actions[user][timestamp] = []
-                actions[user][timestamp].append(
-                    DotMap(
-                        user=user,
-                        action="Unstake",
-                        amount=log["args"]["amount"],
-                        userTotal=log["args"]["total"],
-                        timestamp=log["args"]["timestamp"],
-                    )
+    for args in events["Unstaked"]:
+        timestamp = args["timestamp"]
+        user = args["user"]
+        if user != AddressZero:
+            if not actions[user]:
+                actions[user] = OrderedDict()
+            if not timestamp in actions[user]:
+                actions[user][timestamp] = []
+            actions[user][timestamp].append(
+                DotMap(
+                    user=user,
+                    action="Unstake",
+                    amount=args["amount"],
+                    userTotal=args["total"],
+                    timestamp=args["timestamp"],
                 )
+            )
     # Sort timestamps within each user
     for user, timestamps in actions.items():
         sortedDict = OrderedDict(sorted(timestamps.items()))
@@ -197,6 +255,11 @@ def collect_actions_from_events(geyser, startBlock, endBlock):
     return actions
 
 
+def collect_actions_from_events(geyser, startBlock, endBlock):
+    console.log("collecting actions")
+    return build_actions(fetch_geyser_events(geyser, startBlock, endBlock))
+
+
 def process_actions(
     geyserMock: BadgerGeyserMock, actions, snapshotStartBlock, periodEndBlock, key
 ):
@@ -206,37 +269,53 @@ def process_actions(
     """
     console.print("[green]== Processing Claim Period Actions for {} ==[/green]\n".format(key))
     for user, userData in actions.items():
-        table = []
-        # console.print("\n= Processing actions for user: ", user + " =")
-        latestTimestamp = 0
-
-        # Iterate over actions, grouped by timestamp
-        for timestamp, timestampEntries in userData.items():
-            assert int(timestamp) > latestTimestamp
-            for action in timestampEntries:
-                if action.action == "Stake":
-                    table.append(["stake", action["amount"], action["timestamp"]])
-                    geyserMock.stake(action.user, action)
-                if action.action == "Unstake":
-                    table.append(["unstake", action["amount"], action["timestamp"]])
-                    geyserMock.unstake(action.user, action)
-            latestTimestamp = int(timestamp)
+        process_user_actions(geyserMock, user, userData)
 
         # End accounting for user
-        geyserMock.calc_end_share_seconds_for(user)
-
-        # Print results
-        # print(tabulate(table, headers=["action", "amount", "timestamp"]))
-        # print("\n")
-        userData = geyserMock.users[user]
-        #table = []
-        #table.append([user.shareSecondsInRange, user.shareSeconds, user.total])
-        rewardsLogger.add_multiplier(user,geyserMock.key,userData.stakeMultiplier)
-        # print(tabulate(table, headers=["shareSecondsInRange", "shareSeconds", "total"]))
+        end_user_accounting(geyserMock, user)
 
     return geyserMock
 
 
+def process_user_actions(geyserMock: BadgerGeyserMock, user, userData, after=None, until=None):
+    """
+    Apply a user's actions, optionally only those with after < timestamp <= until
+    """
+    table = []
+    # console.print("\n= Processing actions for user: ", user + " =")
+    latestTimestamp = 0
+
+    # Iterate over actions, grouped by timestamp
+    for timestamp, timestampEntries in userData.items():
+        assert int(timestamp) > latestTimestamp
+        latestTimestamp = int(timestamp)
+        if after is not None and int(timestamp) <= after:
+            continue
+        if until is not None and int(timestamp) > until:
+            break
+        for action in timestampEntries:
+            if action.action == "Stake":
+                table.append(["stake", action["amount"], action["timestamp"]])
+                geyserMock.stake(action.user, action)
+            if action.action == "Unstake":
+                table.append(["unstake", action["amount"], action["timestamp"]])
+                geyserMock.unstake(action.user, action)
+
+    # Print results
+    # print(tabulate(table, headers=["action", "amount", "timestamp"]))
+    # print("\n")
+
+
+def end_user_accounting(geyserMock: BadgerGeyserMock, user):
+    geyserMock.calc_end_share_seconds_for(user)
+
+    userData = geyserMock.users[user]
+    #table = []
+    #table.append([user.shareSecondsInRange, user.shareSeconds, user.total])
+    rewardsLogger.add_multiplier(user,geyserMock.key,userData.stakeMultiplier)
+    # print(tabulate(table, headers=["shareSecondsInRange", "shareSeconds", "total"]))
+
+
 # def ensure_archive_node():
 #     fresh = web3.eth.call({"to": str(EMN), "data": EMN.totalSupply.encode_input()})
 #     old = web3.eth.call(
@@ -0,0 +1,319 @@
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from brownie import web3
+from rich.console import Console
+from tabulate import tabulate
+from web3 import Web3
+
+from helpers.multicall import Call, Multicall, Signature
+
+console = Console()
+
+"""
+Claim verification for a full rewards file
+
+Every claimant is checked against the tree's on-chain state in bulk through multicall:
+- claimed amounts (getClaimedFor) must never exceed the file's cumulative amounts
+- isClaimAvailableFor must agree with cumulative - claimed
+Real claim transactions are only sent for a stratified sample, spread across one or more forked nodes.
+"""
+
+getClaimedFor = "getClaimedFor(address,address[])(address[],uint256[])"
+isClaimAvailableFor = "isClaimAvailableFor(address,address[],uint256[])(bool)"
+
+claimSignature = Signature("claim(address[],uint256[],uint256,uint256,bytes32[])()")
+getClaimedForSignature = Signature(getClaimedFor)
+balanceOfSignature = Signature("balanceOf(address)(uint256)")
+sharesOfSignature = Signature("sharesOf(address)(uint256)")
+sharesPerFragmentSignature = Signature("_sharesPerFragment()(uint256)")
+
+
+def parse_amounts(claim):
+    return [int(amount) for amount in claim["cumulativeAmounts"]]
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+# ===== Bulk checks =====
+
+
+def fetch_claimed(treeAddress, claims, chunkSize=200):
+    """
+    Claimed amounts for every claimant, aligned with the tokens in their claim
+    """
+    claimed = {}
+    for users in chunks(list(claims.keys()), chunkSize):
+        calls = [
+            Call(
+                treeAddress,
+                [getClaimedFor, user, claims[user]["tokens"]],
+                [[(user, "tokens"), None], [(user, "claimed"), None]],
+            )
+            for user in users
+        ]
+        result = Multicall(calls)()
+        for user in users:
+            claimed[user] = list(result[(user, "claimed")])
+    return claimed
+
+
+def fetch_claim_available(treeAddress, claims, users, chunkSize=200):
+    available = {}
+    for batch in chunks(users, chunkSize):
+        calls = [
+            Call(
+                treeAddress,
+                [isClaimAvailableFor, user, claims[user]["tokens"], parse_amounts(claims[user])],
+                [[user, None]],
+            )
+            for user in batch
+        ]
+        available.update(Multicall(calls)())
+    return available
+
+
+def check_claims_bulk(treeAddress, claims, chunkSize=200):
+    """
+    Compare every claim in the file with the tree's state
+    """
+    start = time.time()
+    claimed = fetch_claimed(treeAddress, claims, chunkSize)
+
+    regressed = []
+    expectedAvailable = {}
+    claimableTotals = {}
+    for user, claim in claims.items():
+        amounts = parse_amounts(claim)
+        if any(amount < done for amount, done in zip(amounts, claimed[user])):
+            regressed.append(user)
+            continue
+        expectedAvailable[user] = False
+        for token, amount, done in zip(claim["tokens"], amounts, claimed[user]):
+            claimableTotals[token] = claimableTotals.get(token, 0) + amount - done
+            if amount > done:
+                expectedAvailable[user] = True
+
+    # isClaimAvailableFor reverts (SafeMath) for regressed claims, which would fail the whole aggregate
+    available = fetch_claim_available(
+        treeAddress, claims, list(expectedAvailable.keys()), chunkSize
+    )
+    availabilityMismatch = [
+        user for user, expected in expectedAvailable.items() if available[user] != expected
+    ]
+
+    return {
+        "numClaims": len(claims),
+        "numAvailable": sum(1 for value in available.values() if value),
+        "claimed": claimed,
+        "available": available,
+        "claimableTotals": claimableTotals,
+        "regressed": regressed,
+        "availabilityMismatch": availabilityMismatch,
+        "time": time.time() - start,
+    }
+
+
+# ===== Sampling =====
+
+
+def claim_stratum(claim, claimed, available):
+    """
+    Group claims by availability, token count and order of magnitude of the first token's claimable amount
+    """
+    amounts = parse_amounts(claim)
+    claimable = amounts[0] - claimed[0] if len(amounts) > 0 else 0
+    magnitude = int(math.log10(claimable)) // 3 if claimable > 0 else -1
+    return (bool(available), len(amounts), magnitude)
+
+
+def stratified_sample(claims, bulk, sampleSize, seed=0):
+    """
+    Pick about sampleSize claimants, proportionally from each stratum with at least one per stratum
+    """
+    regressed = set(bulk["regressed"])
+    strata = {}
+    for user, claim in claims.items():
+        if user in regressed:
+            continue
+        key = claim_stratum(claim, bulk["claimed"][user], bulk["available"].get(user))
+        strata.setdefault(key, []).append(user)
+
+    total = sum(len(users) for users in strata.values())
+    rng = random.Random(seed)
+    sample = []
+    for key in sorted(strata.keys()):
+        users = strata[key]
+        count = min(len(users), max(1, round(sampleSize * len(users) / total)))
+        sample.extend(rng.sample(users, count))
+    return sample
+
+
+# ===== Fork claims =====
+
+
+class ForkClaimer:
+    """
+    Sends real claims against a single forked node
+    """
+
+    def __init__(self, rpcUrl, treeAddress, shareTokens=None):
+        self.rpcUrl = rpcUrl
+        self.w3 = Web3(Web3.HTTPProvider(rpcUrl, request_kwargs={"timeout": 120}))
+        self.treeAddress = treeAddress
+        self.shareTokens = set(shareTokens or [])
+        self.funder = self.w3.eth.accounts[0]
+
+    def impersonate(self, user):
+        # ganache, then hardhat / anvil
+        for method in ["evm_unlockUnknownAccount", "hardhat_impersonateAccount"]:
+            response = self.w3.provider.make_request(method, [user])
+            if "error" not in response:
+                return
+
+    def eth_call(self, target, signature, args):
+        output = self.w3.eth.call({"to": target, "data": signature.encode_data(args)})
+        return signature.decode_data(output)
+
+    def share_tolerance(self, token):
+        """
+        The tree pays share tokens (digg) as sharesToFragments(amount), rounded down to whole fragments,
+        so the shares received can fall short of the claim by up to one fragment's worth of shares
+        """
+        if token not in self.shareTokens:
+            return 0
+        return self.eth_call(token, sharesPerFragmentSignature, [])[0]
+
+    def token_balance(self, token, user):
+        signature = sharesOfSignature if token in self.shareTokens else balanceOfSignature
+        return self.eth_call(token, signature, [user])[0]
+
+    def send_claim(self, user, claim):
+        data = claimSignature.encode_data(
+            [
+                claim["tokens"],
+                parse_amounts(claim),
+                int(claim["index"], 16),
+                int(claim["cycle"], 16),
+                [bytes.fromhex(node[2:]) for node in claim["proof"]],
+            ]
+        )
+        try:
+            txHash = self.w3.eth.sendTransaction(
+                {"from": user, "to": self.treeAddress, "data": data, "gas": 1000000}
+            )
+            receipt = self.w3.eth.waitForTransactionReceipt(txHash)
+            return receipt.status == 1
+        except ValueError:
+            # Reverts surface as errors on ganache
+            return False
+
+    def verify_claim(self, user, claim):
+        tokens = claim["tokens"]
+        amounts = parse_amounts(claim)
+
+        self.impersonate(user)
+        self.w3.eth.sendTransaction(
+            {"from": self.funder, "to": user, "value": Web3.toWei(0.5, "ether")}
+        )
+
+        claimedBefore = self.eth_call(self.treeAddress, getClaimedForSignature, [user, tokens])[1]
+        pre = [self.token_balance(token, user) for token in tokens]
+
+        claimable = [amount - done for amount, done in zip(amounts, claimedBefore)]
+        canClaim = any(amount > 0 for amount in claimable)
+
+        claimed = self.send_claim(user, claim)
+        doubleClaimed = self.send_claim(user, claim)
+
+        claimedAfter = self.eth_call(self.treeAddress, getClaimedForSignature, [user, tokens])[1]
+        post = [self.token_balance(token, user) for token in tokens]
+
+        errors = []
+        if claimed != canClaim:
+            errors.append("claim {} (expected {})".format(claimed, canClaim))
+        if doubleClaimed:
+            errors.append("double claim succeeded")
+        for i, token in enumerate(tokens):
+            if claimedAfter[i] != amounts[i]:
+                errors.append("{} claimed {} != cumulative {}".format(token, claimedAfter[i], amounts[i]))
+            if abs(post[i] - pre[i] - claimable[i]) > self.share_tolerance(token):
+                errors.append("{} received {} != claimable {}".format(token, post[i] - pre[i], claimable[i]))
+
+        return {"user": user, "rpc": self.rpcUrl, "claimed": claimed, "errors": errors}
+
+    def verify_claims(self, users, claims):
+        return [self.verify_claim(user, claims[user]) for user in users]
+
+
+def verify_sample_on_forks(rpcUrls, treeAddress, users, claims, shareTokens=None):
+    """
+    Split the sample across forked nodes and claim on each in parallel
+    """
+    claimers = [ForkClaimer(url, treeAddress, shareTokens) for url in rpcUrls]
+    assignments = [users[i :: len(claimers)] for i in range(len(claimers))]
+
+    results = []
+    with ThreadPoolExecutor(max_workers=len(claimers)) as executor:
+        futures = [
+            executor.submit(claimer.verify_claims, assigned, claims)
+            for claimer, assigned in zip(claimers, assignments)
+        ]
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+
+# ===== Entry point =====
+
+
+def verify_all_claims(
+    treeAddress, rewards, rpcUrls=None, sampleSize=20, shareTokens=None, seed=0
+):
+    """
+    Bulk-check every claim in a rewards file, then claim a stratified sample on forked nodes
+    rpcUrls defaults to the node brownie is connected to
+    """
+    claims = rewards["claims"]
+
+    bulk = check_claims_bulk(treeAddress, claims)
+    console.print(
+        {
+            "claims": bulk["numClaims"],
+            "available": bulk["numAvailable"],
+            "regressed": len(bulk["regressed"]),
+            "availabilityMismatch": len(bulk["availabilityMismatch"]),
+            "time": "{:.2f}s".format(bulk["time"]),
+        }
+    )
+    print(
+        tabulate(
+            [[token, amount] for token, amount in bulk["claimableTotals"].items()],
+            headers=["token", "claimable"],
+        )
+    )
+
+    sample = stratified_sample(claims, bulk, sampleSize, seed)
+
+    rpcUrls = rpcUrls or [web3.provider.endpoint_uri]
+    console.print("Claiming for {} users across {} nodes".format(len(sample), len(rpcUrls)))
+    sampleResults = verify_sample_on_forks(rpcUrls, treeAddress, sample, claims, shareTokens)
+
+    failed = [result for result in sampleResults if len(result["errors"]) > 0]
+    for result in failed:
+        console.print("[red]Claim failed for {} on {}[/red]".format(result["user"], result["rpc"]), result["errors"])
+
+    valid = (
+        len(bulk["regressed"]) == 0
+        and len(bulk["availabilityMismatch"]) == 0
+        and len(failed) == 0
+    )
+    color = "green" if valid else "red"
+    console.print("[{}]===== Claims {} =====[/{}]".format(color, "OK" if valid else "FAILED", color))
+
+    return {"bulk": bulk, "sample": sampleResults, "failed": failed, "valid": valid}
@@ -0,0 +1,41 @@
+import json
+import os
+import shutil
+
+"""
+Filesystem-backed stand-in for the subset of the boto3 S3 client used by aws_utils.
+Objects live at <root>/<bucket>/<key>, with upload ExtraArgs (e.g. ContentEncoding) kept in a sidecar file.
+"""
+
+
+class LocalS3Client:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _meta_path(self, bucket, key):
+        return self._path(bucket, key) + ".meta.json"
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Config=None):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename, so concurrent readers never see a partial object
+        shutil.copyfile(Filename, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        with open(self._meta_path(Bucket, Key), "w") as f:
+            json.dump(ExtraArgs or {}, f)
+
+    def get_object(self, Bucket, Key):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise Exception("NoSuchKey: s3://{}/{}".format(Bucket, Key))
+
+        response = {"Body": open(path, "rb"), "ContentLength": os.path.getsize(path)}
+        if os.path.exists(self._meta_path(Bucket, Key)):
+            with open(self._meta_path(Bucket, Key)) as f:
+                response.update(json.load(f))
+        return response
@@ -0,0 +1,222 @@
+import mmap
+import os
+import struct
+
+from eth_utils import to_checksum_address
+
+"""
+Companion binary index for rewards content files
+
+A content file (rewards-<chain>-<hash>.json) holds every claim in the tree. Anything that only needs
+one user's claim has to download and parse the whole file. Alongside each content file we write:
+
+- <name>.idx:   header + fixed width entries (address, offset, length), sorted by raw address bytes
+- <name>.proofs: packed claim records, referenced by the offsets in the index
+
+The reader mmaps both files and binary searches the index, so a single lookup touches a handful of pages.
+"""
+
+INDEX_MAGIC = b"BDGRIDX1"
+
+# magic, version, count, cycle, merkleRoot
+INDEX_HEADER = struct.Struct(">8sHIQ32s")
+
+# address, record offset, record length
+INDEX_ENTRY = struct.Struct(">20sQI")
+
+# index, cycle, number of tokens
+RECORD_HEADER = struct.Struct(">QQH")
+
+INDEX_VERSION = 1
+
+
+def index_filenames(contentFileName):
+    base = contentFileName[:-5] if contentFileName.endswith(".json") else contentFileName
+    return (base + ".idx", base + ".proofs")
+
+
+def _hex_bytes(value):
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def _to_int(value):
+    if isinstance(value, int):
+        return value
+    return int(value, 16) if value.startswith("0x") else int(value)
+
+
+def encode_claim_record(claim):
+    """
+    Pack a single claim: index, cycle, tokens, cumulativeAmounts, proof
+    """
+    tokens = claim["tokens"]
+    amounts = claim["cumulativeAmounts"]
+    proof = claim["proof"]
+
+    assert len(tokens) == len(amounts)
+
+    parts = [RECORD_HEADER.pack(_to_int(claim["index"]), _to_int(claim["cycle"]), len(tokens))]
+    for token in tokens:
+        parts.append(_hex_bytes(token))
+    for amount in amounts:
+        parts.append(int(amount).to_bytes(32, "big"))
+    parts.append(struct.pack(">H", len(proof)))
+    for node in proof:
+        parts.append(_hex_bytes(node))
+    return b"".join(parts)
+
+
+def decode_claim_record(user, data):
+    (index, cycle, numTokens) = RECORD_HEADER.unpack_from(data, 0)
+    pos = RECORD_HEADER.size
+
+    tokens = []
+    for i in range(numTokens):
+        tokens.append(to_checksum_address(data[pos : pos + 20]))
+        pos += 20
+
+    amounts = []
+    for i in range(numTokens):
+        amounts.append(str(int.from_bytes(data[pos : pos + 32], "big")))
+        pos += 32
+
+    (numProof,) = struct.unpack_from(">H", data, pos)
+    pos += 2
+
+    proof = []
+    for i in range(numProof):
+        proof.append("0x" + data[pos : pos + 32].hex())
+        pos += 32
+
+    return {
+        "index": hex(index),
+        "user": user,
+        "cycle": hex(cycle),
+        "tokens": tokens,
+        "cumulativeAmounts": amounts,
+        "proof": proof,
+    }
+
+
+def write_proof_index(tree, contentFileName):
+    """
+    Write the .idx / .proofs companion files for a rewards tree (as produced by rewards_to_merkle_tree)
+    """
+    (indexFileName, recordFileName) = index_filenames(contentFileName)
+
+    entries = []
+    offset = 0
+    with open(recordFileName + ".tmp", "wb") as records:
+        for user, claim in tree["claims"].items():
+            record = encode_claim_record(claim)
+            records.write(record)
+            entries.append((_hex_bytes(user), offset, len(record)))
+            offset += len(record)
+
+    entries.sort(key=lambda entry: entry[0])
+
+    with open(indexFileName + ".tmp", "wb") as index:
+        index.write(
+            INDEX_HEADER.pack(
+                INDEX_MAGIC,
+                INDEX_VERSION,
+                len(entries),
+                _to_int(tree["cycle"]),
+                _hex_bytes(tree["merkleRoot"]),
+            )
+        )
+        for entry in entries:
+            index.write(INDEX_ENTRY.pack(*entry))
+
+    # Only expose complete files to readers
+    os.replace(recordFileName + ".tmp", recordFileName)
+    os.replace(indexFileName + ".tmp", indexFileName)
+
+    return (indexFileName, recordFileName)
+
+
+class ProofIndex:
+    """
+    Read-only, memory-mapped view over a proof index
+    """
+
+    def __init__(self, contentFileName):
+        (self.indexFileName, self.recordFileName) = index_filenames(contentFileName)
+
+        self._indexFile = open(self.indexFileName, "rb")
+        self._recordFile = open(self.recordFileName, "rb")
+        self._index = mmap.mmap(self._indexFile.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # mmap refuses zero-length files, which is a valid tree with no claims
+        if os.fstat(self._recordFile.fileno()).st_size > 0:
+            self._records = mmap.mmap(self._recordFile.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._records = b""
+
+        (magic, version, count, cycle, root) = INDEX_HEADER.unpack_from(self._index, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self.close()
+            raise Exception("{} is not a proof index".format(self.indexFileName))
+
+        self.count = count
+        self.cycle = cycle
+        self.merkleRoot = "0x" + root.hex()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, address):
+        return self._find(address) is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _entry(self, i):
+        return INDEX_ENTRY.unpack_from(self._index, INDEX_HEADER.size + i * INDEX_ENTRY.size)
+
+    def _find(self, address):
+        key = _hex_bytes(address.lower())
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = INDEX_HEADER.size + mid * INDEX_ENTRY.size
+            current = self._index[start : start + 20]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                return self._entry(mid)
+        return None
+
+    def get(self, address):
+        """
+        Return the claim for an address in content file format, or None if it has no claim
+        """
+        entry = self._find(address)
+        if entry is None:
+            return None
+        (raw, offset, length) = entry
+        return decode_claim_record(
+            to_checksum_address(raw), self._records[offset : offset + length]
+        )
+
+    def addresses(self):
+        for i in range(self.count):
+            yield to_checksum_address(self._entry(i)[0])
+
+    def close(self):
+        if isinstance(self._records, mmap.mmap):
+            self._records.close()
+        if hasattr(self, "_index"):
+            self._index.close()
+        self._indexFile.close()
+        self._recordFile.close()
+
+
+def open_proof_index(contentFileName):
+    return ProofIndex(contentFileName)
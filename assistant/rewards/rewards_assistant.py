@@ -1,7 +1,14 @@
 import json
+import os
+import time
+from contextlib import nullcontext
 
 from tqdm import tqdm
-from assistant.rewards.aws_utils import download, download_bucket ,upload
+from assistant.rewards.aws_utils import (
+    download,
+    download_bucket_to_file,
+    upload,
+)
 from assistant.rewards.calc_stakes import calc_geyser_stakes
 from assistant.rewards.calc_harvest import calc_balances_from_geyser_events,get_initial_user_state
 from assistant.rewards.RewardsLogger import rewardsLogger
@@ -14,6 +21,9 @@ from assistant.subgraph.client import (
 )
 from assistant.rewards.User import User
 from assistant.rewards.merkle_tree import rewards_to_merkle_tree
+from assistant.rewards.proof_index import write_proof_index
+from assistant.rewards.rewards_cache import RewardsCache
+from assistant.rewards.tree_verifier import print_verification, verify_content_file
 from assistant.rewards.rewards_checker import compare_rewards, verify_rewards
 from assistant.rewards.RewardsList import RewardsList
 from brownie import *
@@ -26,6 +36,9 @@ gas_strategy = GasNowStrategy("fast")
 
 console = Console()
 
+# Shared by the propose / approve loops, so an unchanged content hash is served from disk
+rewardsCache = None
+
 
 def sum_rewards(sources, cycle, badgerTree):
     """
@@ -53,7 +66,7 @@ def sum_rewards(sources, cycle, badgerTree):
     return totals
 
 
-def calc_geyser_rewards(badger, periodStartBlock, endBlock, cycle):
+def calc_geyser_rewards(badger, periodStartBlock, endBlock, cycle, state=None):
     """
     Calculate rewards for each geyser, and sum them
     userRewards = (userShareSeconds / totalShareSeconds) / tokensReleased
@@ -65,7 +78,7 @@ def calc_geyser_rewards(badger, periodStartBlock, endBlock, cycle):
     for key, geyser in badger.geysers.items():
         #if key != "native.badger":
         #      continue
-        geyserRewards = calc_geyser_stakes(key, geyser, periodStartBlock, endBlock)
+        geyserRewards = calc_geyser_stakes(key, geyser, periodStartBlock, endBlock, state)
         rewardsByGeyser[key] = geyserRewards
     return sum_rewards(rewardsByGeyser, cycle, badger.badgerTree)
 
@@ -360,7 +373,49 @@ def hash(value):
     return web3.toHex(web3.keccak(text=value))
 
 
-def fetch_pending_rewards_tree(badger, print_output=False):
+def verify_local_tree(fileName, merkle, proofSample=0.01):
+    """
+    Verify-only: recompute the root of a local content file from its claims and compare it to the chain
+    """
+    result = verify_content_file(fileName, expectedRoot=merkle["root"], proofSample=proofSample)
+    print_verification(result)
+    return result
+
+
+def verify_rewards_tree(badger, pending=False, proofSample=0.01):
+    if pending:
+        merkle = fetchPendingMerkleData(badger)
+    else:
+        merkle = fetchCurrentMerkleData(badger)
+
+    fileName = "rewards-1-" + str(merkle["contentHash"]) + ".json"
+
+    if not os.path.exists(fileName):
+        fileName = fetch_rewards_file(fileName, merkle["contentHash"])
+
+    return verify_local_tree(fileName, merkle, proofSample)
+
+
+def get_rewards_cache():
+    global rewardsCache
+    if rewardsCache is None:
+        rewardsCache = RewardsCache(rewards_config.cacheDir, rewards_config.cacheMaxBytes)
+    return rewardsCache
+
+
+def fetch_rewards_file(fileName, contentHash):
+    """
+    Local path of a content file, only downloaded when it is not already cached
+    """
+    return get_rewards_cache().fetch(fileName, contentHash, download_bucket_to_file)
+
+
+def load_rewards_file(fileName, contentHash):
+    with open(fetch_rewards_file(fileName, contentHash)) as f:
+        return (json.load(f), f.name)
+
+
+def fetch_pending_rewards_tree(badger, print_output=False, verify=False):
     # TODO Files should be hashed and signed by keeper to prevent tampering
     # TODO How will we upload addresses securely?
     # We will check signature before posting
@@ -372,11 +427,14 @@ def fetch_pending_rewards_tree(badger, print_output=False):
             "[green]===== Loading Pending Rewards " + pastFile + " =====[/green]"
         )
 
-    currentTree = json.loads(download_bucket(pastFile))
+    (currentTree, localFile) = load_rewards_file(pastFile, merkle["contentHash"])
 
     # Invariant: File shoulld have same root as latest
     assert currentTree["merkleRoot"] == merkle["root"]
 
+    if verify:
+        assert verify_local_tree(localFile, merkle)["valid"]
+
     lastUpdatePublish = merkle["blockNumber"]
     lastUpdate = int(currentTree["endBlock"])
 
@@ -393,7 +451,7 @@ def fetch_pending_rewards_tree(badger, print_output=False):
     return currentTree
 
 
-def fetch_current_rewards_tree(badger, print_output=False):
+def fetch_current_rewards_tree(badger, print_output=False, verify=False):
     # TODO Files should be hashed and signed by keeper to prevent tampering
     # TODO How will we upload addresses securely?
     # We will check signature before posting
@@ -405,7 +463,7 @@ def fetch_current_rewards_tree(badger, print_output=False):
         "[bold yellow]===== Loading Past Rewards " + pastFile + " =====[/bold yellow]"
     )
 
-    currentTree = json.loads(download_bucket(pastFile))
+    (currentTree, localFile) = load_rewards_file(pastFile, merkle["contentHash"])
 
     # Invariant: File shoulld have same root as latest
     console.print(merkle)
@@ -414,6 +472,9 @@ def fetch_current_rewards_tree(badger, print_output=False):
 
     assert currentTree["merkleRoot"] == merkle["root"]
 
+    if verify:
+        assert verify_local_tree(localFile, merkle)["valid"]
+
     lastUpdateOnChain = merkle["blockNumber"]
     lastUpdate = int(currentTree["endBlock"])
 
@@ -426,7 +487,14 @@ def fetch_current_rewards_tree(badger, print_output=False):
     return currentTree
 
 
-def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards):
+def timed(state, name):
+    """
+    Stage timer when running with warm state (rewards_service), no-op otherwise
+    """
+    return state.metrics.stage(name) if state else nullcontext()
+
+
+def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards, state=None):
     blockDuration = endBlock - startBlock
 
     nextCycle = getNextCycle(badger)
@@ -435,17 +503,20 @@ def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards):
     #sushiRewards = calc_sushi_rewards(badger,startBlock,endBlock,nextCycle,retroactive=False)
     #farmRewards = fetch_current_harvest_rewards(badger,startBlock, endBlock,nextCycle)
 
-    geyserRewards = calc_geyser_rewards(badger, startBlock, endBlock, nextCycle)
-    rewardsLogger.save("rewards")
+    with timed(state, "geyser_rewards"):
+        geyserRewards = calc_geyser_rewards(badger, startBlock, endBlock, nextCycle, state)
+        rewardsLogger.save("rewards")
 
     #newRewards = combine_rewards([geyserRewards,farmRewards,sushiRewards],nextCycle,badger.badgerTree)
-    cumulativeRewards = process_cumulative_rewards(pastRewards, geyserRewards)
+    with timed(state, "cumulative_rewards"):
+        cumulativeRewards = process_cumulative_rewards(pastRewards, geyserRewards)
 
     # Take metadata from geyserRewards
     console.print("Processing to merkle tree")
-    merkleTree = rewards_to_merkle_tree(
-        cumulativeRewards, startBlock, endBlock, {}
-    )
+    with timed(state, "merkle_tree"):
+        merkleTree = rewards_to_merkle_tree(
+            cumulativeRewards, startBlock, endBlock, {}
+        )
 
     # Publish data
     rootHash = hash(merkleTree["merkleRoot"])
@@ -467,18 +538,22 @@ def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards):
     with open(contentFileName, "w") as outfile:
         json.dump(merkleTree, outfile,indent=4)
 
+    # Companion index for single-claim lookups
+    write_proof_index(merkleTree, contentFileName)
+
     with open(contentFileName) as f:
         after_file = json.load(f)
 
     # Sanity check new rewards file
-    
-    verify_rewards(
-        badger,
-        startBlock,
-        endBlock,
-        pastRewards,
-        after_file,
-    )
+    with timed(state, "verify_rewards"):
+        verify_rewards(
+            badger,
+            startBlock,
+            endBlock,
+            pastRewards,
+            after_file,
+            contentFileName=contentFileName,
+        )
 
     return {
         "contentFileName": contentFileName,
@@ -487,7 +562,7 @@ def generate_rewards_in_range(badger, startBlock, endBlock, pastRewards):
     }
 
 
-def rootUpdater(badger, startBlock, endBlock, pastRewards, test=False):
+def rootUpdater(badger, startBlock, endBlock, pastRewards, test=False, state=None):
     """
     Root Updater Role
     - Check how much time has passed since the last published update
@@ -520,29 +595,101 @@ def rootUpdater(badger, startBlock, endBlock, pastRewards, test=False):
         )
         return False
 
-    rewards_data = generate_rewards_in_range(badger, startBlock, endBlock, pastRewards)
+    rewards_data = generate_rewards_in_range(badger, startBlock, endBlock, pastRewards, state)
 
     console.print("===== Root Updater Complete =====")
     if not test:
-        
-        badgerTree.proposeRoot(
-            rewards_data["merkleTree"]["merkleRoot"],
-            rewards_data["rootHash"],
-            rewards_data["merkleTree"]["cycle"],
-            rewards_data["merkleTree"]["startBlock"],
-            rewards_data["merkleTree"]["endBlock"],
-            {"from": badger.keeper, "gas_price": gas_strategy},
-        )
-        upload(rewards_data["contentFileName"], publish=False)
+        with timed(state, "publish"):
+            badgerTree.proposeRoot(
+                rewards_data["merkleTree"]["merkleRoot"],
+                rewards_data["rootHash"],
+                rewards_data["merkleTree"]["cycle"],
+                rewards_data["merkleTree"]["startBlock"],
+                rewards_data["merkleTree"]["endBlock"],
+                {"from": badger.keeper, "gas_price": gas_strategy},
+            )
+            upload(rewards_data["contentFileName"], publish=False)
 
     return True
 
 
-def guardian(badger: BadgerSystem, startBlock, endBlock, pastRewards, test=False):
+def verify_pending_root(badger: BadgerSystem, startBlock, endBlock, pastRewards, state=None):
+    """
+    Recompute the proposed cycle on top of the last approved tree and compare it to the pending root.
+    With a warm (guardian owned) state only the delta since the last approved cycle is processed
+    """
+    start = time.time()
+    pending = fetchPendingMerkleData(badger)
+    nextCycle = getNextCycle(badger)
+
+    with timed(state, "guardian_geyser_rewards"):
+        geyserRewards = calc_geyser_rewards(badger, startBlock, endBlock, nextCycle, state)
+
+    with timed(state, "guardian_merkle_tree"):
+        cumulativeRewards = process_cumulative_rewards(pastRewards, geyserRewards)
+        merkleTree = rewards_to_merkle_tree(cumulativeRewards, startBlock, endBlock, {})
+
+    rootHash = hash(merkleTree["merkleRoot"])
+    match = merkleTree["merkleRoot"] == str(pending["root"]) and str(rootHash) == str(
+        pending["contentHash"]
+    )
+
+    # Written to the guardian's own directory, uploaded only if approved
+    contentFileName = content_hash_to_filename(rootHash)
+    if state:
+        contentFileName = state.path(contentFileName)
+    with open(contentFileName, "w") as outfile:
+        json.dump(merkleTree, outfile, indent=4)
+
+    with open(contentFileName) as f:
+        after_file = json.load(f)
+
+    # Sanity check the recomputed rewards file before it can be approved
+    with timed(state, "verify_rewards"):
+        verify_rewards(
+            badger,
+            startBlock,
+            endBlock,
+            pastRewards,
+            after_file,
+            contentFileName=contentFileName,
+        )
+
+    result = {
+        "cycle": nextCycle,
+        "startBlock": startBlock,
+        "endBlock": endBlock,
+        "root": merkleTree["merkleRoot"],
+        "pendingRoot": str(pending["root"]),
+        "contentHash": str(rootHash),
+        "pendingContentHash": str(pending["contentHash"]),
+        "match": match,
+        "time": time.time() - start,
+    }
+
+    color = "green" if match else "red"
+    console.print(
+        "[{}]===== Cycle {} verification: {} in {:.1f}s =====[/{}]".format(
+            color, nextCycle, "MATCH" if match else "MISMATCH", result["time"], color
+        )
+    )
+    console.print(result)
+
+    if state:
+        state.metrics.set_gauge("guardian_last_verification_seconds", result["time"])
+        state.metrics.set_gauge("guardian_last_verified_cycle", nextCycle)
+        state.trees = {str(rootHash): merkleTree}
+        with open(state.path("verifications.jsonl"), "a") as f:
+            f.write(json.dumps(result) + "\n")
+
+    return (result, merkleTree, contentFileName)
+
+
+def guardian(badger: BadgerSystem, startBlock, endBlock, pastRewards, test=False, state=None):
     """
     Guardian Role
     - Check if there is a new proposed root
-    - If there is, run the rewards script at the same block height to verify the results
+    - If there is, independently recompute the cycle at the same block range and compare with the pending root
     - If there is a discrepency, notify admin
     (In case of a one-off failure, Script will be attempted again at the guardianInterval)
     """
@@ -562,28 +709,36 @@ def guardian(badger: BadgerSystem, startBlock, endBlock, pastRewards, test=False
         console.print("[bold yellow]===== Result: No Pending Root =====[/bold yellow]")
         return False
 
-    rewards_data = generate_rewards_in_range(badger, startBlock, endBlock, pastRewards)
+    (result, merkleTree, contentFileName) = verify_pending_root(
+        badger, startBlock, endBlock, pastRewards, state
+    )
 
     console.print("===== Guardian Complete =====")
 
+    if not result["match"]:
+        console.print("[bold red]===== Result: Pending root does not match, not approving =====[/bold red]")
+        return False
+
     if not test:
-        upload(rewards_data["contentFileName"]),
-        badgerTree.approveRoot(
-            rewards_data["merkleTree"]["merkleRoot"],
-            rewards_data["rootHash"],
-            rewards_data["merkleTree"]["cycle"],
-            rewards_data["merkleTree"]["startBlock"],
-            rewards_data["merkleTree"]["endBlock"],
-            {"from": badger.guardian, "gas_price": gas_strategy},
-        )
-        
+        with timed(state, "publish"):
+            upload(contentFileName)
+            badgerTree.approveRoot(
+                merkleTree["merkleRoot"],
+                result["contentHash"],
+                merkleTree["cycle"],
+                merkleTree["startBlock"],
+                merkleTree["endBlock"],
+                {"from": badger.guardian, "gas_price": gas_strategy},
+            )
+
+    return True
 
 
 def run_action(badger, args, test):
     if args["action"] == "rootUpdater":
-        return rootUpdater(badger, args["startBlock"], args["endBlock"], args["pastRewards"], test)
+        return rootUpdater(badger, args["startBlock"], args["endBlock"], args["pastRewards"], test, args.get("state"))
     if args["action"] == "guardian":
-        return guardian(badger, args["startBlock"], args["endBlock"], args["pastRewards"], test)
+        return guardian(badger, args["startBlock"], args["endBlock"], args["pastRewards"], test, args.get("state"))
     return False
 
 
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+
+from eth_utils import encode_hex, keccak
+from rich.console import Console
+
+console = Console()
+
+"""
+Local cache for rewards content files
+
+Content files are named by their content hash (keccak of the merkle root), so a given name never changes
+once published. Each cached file has a sidecar (<name>.meta) recording its sha256, size, cycle and root:
+- On write, the file's merkleRoot must hash to the expected content hash
+- On read, the sha256 is recomputed and the root re-checked; a corrupt entry is dropped and fetched again
+- When the cache grows past its size bound, the lowest cycles are evicted first
+"""
+
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def content_hash_of_root(merkleRoot):
+    """
+    Same hash rewards_assistant uses to name content files
+    """
+    return encode_hex(keccak(text=merkleRoot))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RewardsCache:
+    def __init__(self, directory, maxBytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, fileName):
+        return os.path.join(self.directory, os.path.basename(fileName))
+
+    def meta_path(self, fileName):
+        return self.path(fileName) + ".meta"
+
+    def _read_meta(self, fileName):
+        try:
+            with open(self.meta_path(fileName)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def remove(self, fileName):
+        for path in [self.meta_path(fileName), self.path(fileName)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get(self, fileName, contentHash):
+        """
+        Return the path of a verified cached file, or None on a miss
+        """
+        meta = self._read_meta(fileName)
+        if meta is None or not os.path.exists(self.path(fileName)):
+            return None
+
+        valid = (
+            meta["contentHash"] == str(contentHash)
+            and content_hash_of_root(meta["merkleRoot"]) == str(contentHash)
+            and os.path.getsize(self.path(fileName)) == meta["size"]
+            and file_sha256(self.path(fileName)) == meta["sha256"]
+        )
+        if not valid:
+            console.print("[red]Cached {} failed integrity check, dropping[/red]".format(fileName))
+            self.remove(fileName)
+            return None
+
+        # Track use for eviction tie-breaks
+        os.utime(self.meta_path(fileName))
+        return self.path(fileName)
+
+    def put(self, fileName, contentHash, sourcePath):
+        """
+        Move a downloaded file into the cache, after checking it matches its content hash
+        """
+        with open(sourcePath) as f:
+            tree = json.load(f)
+
+        if content_hash_of_root(tree["merkleRoot"]) != str(contentHash):
+            os.remove(sourcePath)
+            raise Exception(
+                "{} root {} does not match content hash {}".format(
+                    fileName, tree["merkleRoot"], contentHash
+                )
+            )
+
+        meta = {
+            "contentHash": str(contentHash),
+            "merkleRoot": tree["merkleRoot"],
+            "cycle": int(tree["cycle"]),
+            "size": os.path.getsize(sourcePath),
+            "sha256": file_sha256(sourcePath),
+        }
+
+        os.replace(sourcePath, self.path(fileName))
+        with open(self.meta_path(fileName) + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path(fileName) + ".tmp", self.meta_path(fileName))
+
+        self.evict(keep=fileName)
+        return self.path(fileName)
+
+    def fetch(self, fileName, contentHash, download):
+        """
+        Return a local path for the content file, calling download(fileName, path) only on a miss
+        """
+        path = self.get(fileName, contentHash)
+        if path is not None:
+            console.print("Using cached rewards file " + path)
+            return path
+
+        tmpPath = self.path(fileName) + ".download"
+        download(fileName, tmpPath)
+        return self.put(fileName, contentHash, tmpPath)
+
+    def entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".meta"):
+                continue
+            fileName = name[: -len(".meta")]
+            meta = self._read_meta(fileName)
+            if meta is None:
+                continue
+            meta["fileName"] = fileName
+            meta["lastUsed"] = os.path.getmtime(self.meta_path(fileName))
+            entries.append(meta)
+        return entries
+
+    def size(self):
+        return sum(entry["size"] for entry in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Drop the oldest cycles until the cache fits its size bound
+        """
+        entries = sorted(self.entries(), key=lambda entry: (entry["cycle"], entry["lastUsed"]))
+        total = sum(entry["size"] for entry in entries)
+
+        for entry in entries:
+            if total <= self.maxBytes:
+                break
+            if keep is not None and entry["fileName"] == os.path.basename(keep):
+                continue
+            self.remove(entry["fileName"])
+            total -= entry["size"]
+            console.print("Evicted cached rewards file {} (cycle {})".format(entry["fileName"], entry["cycle"]))
@@ -12,6 +12,8 @@ import json
 import brownie
 from config.badger_config import badger_config, globalStartTime
 from helpers.utils import val
+from assistant.rewards.rewards_diff import ClaimColumns, diff_content_files, print_diff
+from assistant.rewards.tree_verifier import print_proof_verification, verify_proofs
 
 console = Console()
 
@@ -20,6 +22,16 @@ digg_token = "0x798D1bE841a82a273720CE31c822C61a67a601C3"
 farm_token = "0xa0246c9032bC3A600820415aE600c6388619A14D"
 xSushi_token = "0x8798249c2E607446EfB7Ad49eC89dD1865Ff4272"
 
+# Geyser unlocks are read at the period's block timestamps, so the file's increase can drift slightly
+emissionTolerance = 0.01
+
+token_names = {
+    badger_token: "badger",
+    digg_token: "digg",
+    farm_token: "farm",
+    xSushi_token: "xSushi",
+}
+
 tokens_to_check = [
     badger_token,
     digg_token,
@@ -55,61 +67,43 @@ def get_distributed_in_range(key, geyser, startBlock, endBlock):
 
 
 def getExpectedDistributionInRange(badger: BadgerSystem, startBlock, endBlock):
-    distributions = {}
-    for key, geyser in badger.geysers.items():
-        if key == "native.badger":
-            dists = get_distributed_in_range(key, geyser, startBlock, endBlock)
-            distributions[key] = dists
-
-    console.log(distributions)
-
-    # TODO: Only Badger for now
+    """
+    Tokens unlocked by every geyser over the range, keyed by token address
+    """
     totals = {}
-    totals[digg_token] = 0
-    totals[badger_token] = 0
-
-    for key, gains in distributions.items():
-        totals[badger_token] += gains[badger_token]
-        totals[digg_token] += gains[digg_token]
+    for key, geyser in badger.geysers.items():
+        distributions = get_distributed_in_range(key, geyser, startBlock, endBlock)
+        console.log(key, distributions)
+        for token, amount in distributions.items():
+            totals[token] = totals.get(token, 0) + amount
 
     return totals
 
-def sum_claims(claims):
-    total = 0
-    for user, claim in claims.items():
-        total += int(claim["cumulativeAmounts"][0])
-    return total
+def sum_claims(claims, token=badger_token):
+    return ClaimColumns.from_claims(claims.items()).total(token)
 
 def sum_digg_claims(claims):
-    total = 0
-    for user, claim in claims.items():
-        # print(claim["cumulativeAmounts"])
-        total += int(claim["cumulativeAmounts"][1])
-    return total
+    return sum_claims(claims, digg_token)
 
 def diff_rewards(
-    badger: BadgerSystem, before_file, after_file,
+    badger: BadgerSystem, before_file, after_file, expected=None, tolerance=emissionTolerance,
 ):
-    a = before_file["claims"]
-    b = after_file["claims"]
-
-    table = []
-    # Each users' cumulative claims must only increase
-    for user, claim in b.items():
-        afterClaim = int(b[user]["cumulativeAmounts"][0])
-        beforeClaim = 0
-        if user in a:
-            beforeClaim = int(a[user]["cumulativeAmounts"][0])
-        diff = afterClaim - beforeClaim
-
-        proportionGained = afterClaim / beforeClaim
-        assert proportionGained > 0.98
-        assert proportionGained < 1.25
-
-        table.append(
-            [user, val(beforeClaim), val(afterClaim), val(diff), proportionGained,]
-        )
-    print(tabulate(table, headers=["user", "a", "b", "diff", "% gained"],))
+    """
+    Columnar diff of two trees: cumulative amounts must only increase, and token totals must match the files (and expected emissions, if given)
+    """
+    diff = diff_content_files(before_file, after_file)
+    print_diff(diff, names=token_names)
+
+    assert len(diff.regressions()) == 0
+    assert len(diff.token_total_mismatches()) == 0
+    if expected:
+        mismatches = diff.emission_mismatches(expected, tolerance)
+        for (token, amount, delta) in mismatches:
+            console.print(
+                "[red]{} emitted {}, expected {}[/red]".format(token_names.get(token, token), delta, amount)
+            )
+        assert len(mismatches) == 0
+    return diff
 
 def get_expected_total_rewards(periodEndTime):
     startTime = 1611489600
@@ -139,10 +133,19 @@ def print_token_diff_table(name, before, after, sanity_diff, decimals=18):
 
     assert diff <= sanity_diff
 
-def verify_rewards(badger: BadgerSystem, startBlock, endBlock, before_data, after_data):
+def verify_rewards(badger: BadgerSystem, startBlock, endBlock, before_data, after_data, contentFileName=None):
+    """
+    Sanity check a new rewards file against the previous one; with contentFileName, every proof in it
+    must also fold up to its merkleRoot
+    """
     before = before_data["claims"]
     after = after_data["claims"]
 
+    if contentFileName:
+        proofs = verify_proofs(contentFileName, expectedRoot=after_data["merkleRoot"])
+        print_proof_verification(proofs)
+        assert proofs["valid"]
+
     print(startBlock, endBlock)
 
     periodStartTime = web3.eth.getBlock(int(startBlock))["timestamp"]
@@ -250,54 +253,9 @@ def compare_rewards(
 
     assert sum_after >= sum_before
     assert sum_after <= sanitySum
-    # assert sum_after - (sum_before + expectedGains[badger_token]) < 10000
-    table = []
-    # Each users' cumulative claims must only increase
-    for user, claim in after.items():
-        afterClaim = int(after[user]["cumulativeAmounts"][0])
-        beforeClaim = 0
-
-        if user in before:
-            beforeClaim = int(before[user]["cumulativeAmounts"][0])
-        diff = afterClaim - beforeClaim
-
-        assert afterClaim >= beforeClaim
-        assert diff >= 0
-
-        if beforeClaim == 0:
-            proportionGained = 1
-        elif diff > 0:
-            proportionGained = afterClaim / beforeClaim
-        else:
-            proportionGained = "+"
-
-        if user in metadata:
-            shareSeconds = metadata[user]["shareSeconds"]
-            # shareSecondsInRange = metadata[user]["shareSecondsInRange"]
-            # shareSecondsBefore = shareSeconds - shareSecondsInRange
-            # proportionInRange = shareSecondsInRange / shareSeconds
-        else:
-            shareSeconds = 0
-            # shareSecondsInRange = 0
-            # shareSecondsBefore = 0
-            # proportionInRange = 0
-
-        table.append(
-            [user, val(beforeClaim), val(afterClaim), val(diff), proportionGained,]
-        )
-        assert afterClaim >= beforeClaim
-    # print(
-    #     tabulate(
-    #         table,
-    #         headers=[
-    #             "user",
-    #             "before gains",
-    #             "after gains",
-    #             "diff",
-    #             "% gained"
-    #         ],
-    #     )
-    # )
+
+    # Each users' cumulative claims must only increase, and per-token increases must match the geyser emissions
+    diff_rewards(badger, before_file, after_file, expected=expectedGains)
 
 
 def push_rewards(badger: BadgerSystem, afterContentHash):
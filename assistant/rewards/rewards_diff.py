@@ -0,0 +1,239 @@
+import time
+
+from rich.console import Console
+from tabulate import tabulate
+
+from assistant.rewards.rewards_stream import ContentFileStream
+
+console = Console()
+
+"""
+Columnar diff of two rewards content files
+
+Claims are loaded into one column of cumulative amounts per token address, aligned by user, so the
+checks are single passes over plain int lists rather than nested dict walks per claim. Amounts are
+uint256 wei values, which is why the columns stay Python ints instead of fixed width arrays.
+"""
+
+PERCENTILES = [50, 90, 99, 99.9, 100]
+
+
+class ClaimColumns:
+    """
+    users[i] has cumulative amount columns[token][i] for each token address
+    """
+
+    def __init__(self, users, columns, tokenTotals=None):
+        self.users = users
+        self.columns = columns
+        self.tokenTotals = tokenTotals or {}
+        self.userIndex = {user: i for i, user in enumerate(users)}
+
+    @classmethod
+    def from_claims(cls, claims, tokenTotals=None):
+        users = []
+        columns = {}
+        for i, (user, claim) in enumerate(claims):
+            users.append(user)
+            for token, amount in zip(claim["tokens"], claim["cumulativeAmounts"]):
+                if token not in columns:
+                    columns[token] = [0] * i
+                columns[token].append(int(amount))
+            # Tokens this user has no entry for
+            for column in columns.values():
+                if len(column) == i:
+                    column.append(0)
+        return cls(users, columns, tokenTotals)
+
+    def total(self, token):
+        return sum(self.columns.get(token, []))
+
+    def column(self, token, users):
+        """
+        Amounts for the given users (0 for users not in this file)
+        """
+        column = self.columns.get(token)
+        if column is None:
+            return [0] * len(users)
+        index = self.userIndex
+        return [column[index[user]] if user in index else 0 for user in users]
+
+
+def load_claim_columns(source):
+    """
+    Source is a content file name (streamed) or an already loaded rewards tree
+    """
+    if isinstance(source, str):
+        stream = ContentFileStream(source)
+        columns = ClaimColumns.from_claims(stream.claims())
+        columns.tokenTotals = stream.header.get("tokenTotals", {})
+        return columns
+    return ClaimColumns.from_claims(source["claims"].items(), source.get("tokenTotals"))
+
+
+def percentile(sortedValues, p):
+    if len(sortedValues) == 0:
+        return 0
+    rank = min(len(sortedValues) - 1, int(len(sortedValues) * p / 100))
+    return sortedValues[rank]
+
+
+class RewardsDiff:
+    def __init__(self, before, after):
+        start = time.time()
+        self.before = before
+        self.after = after
+
+        # Users dropped from the after file are kept so their amounts show up as regressions
+        self.users = list(after.users) + [user for user in before.users if user not in after.userIndex]
+        self.tokens = sorted(set(before.columns.keys()) | set(after.columns.keys()))
+
+        self.beforeColumns = {}
+        self.afterColumns = {}
+        self.deltas = {}
+        for token in self.tokens:
+            self.beforeColumns[token] = before.column(token, self.users)
+            self.afterColumns[token] = after.column(token, self.users)
+            self.deltas[token] = [b - a for a, b in zip(self.beforeColumns[token], self.afterColumns[token])]
+
+        self.time = time.time() - start
+
+    # ===== Invariants =====
+
+    def regressions(self):
+        """
+        (user, token, before, after) for every cumulative amount that decreased
+        """
+        found = []
+        for token in self.tokens:
+            for i, delta in enumerate(self.deltas[token]):
+                if delta < 0:
+                    found.append((self.users[i], token, self.beforeColumns[token][i], self.afterColumns[token][i]))
+        return found
+
+    def totals(self):
+        return {
+            token: {
+                "before": sum(self.beforeColumns[token]),
+                "after": sum(self.afterColumns[token]),
+                "delta": sum(self.deltas[token]),
+            }
+            for token in self.tokens
+        }
+
+    def token_total_mismatches(self):
+        """
+        Tokens whose tokenTotals entry disagrees with the sum of their column
+        """
+        mismatches = []
+        for columns in [self.before, self.after]:
+            for token, total in columns.tokenTotals.items():
+                if int(total) != columns.total(token):
+                    mismatches.append((token, int(total), columns.total(token)))
+        return mismatches
+
+    def emission_mismatches(self, expected, tolerance=0.01):
+        """
+        Tokens whose total increase is outside expected * (1 +/- tolerance)
+        """
+        totals = self.totals()
+        mismatches = []
+        for token, amount in expected.items():
+            delta = totals[token]["delta"] if token in totals else 0
+            if abs(delta - amount) > amount * tolerance:
+                mismatches.append((token, amount, delta))
+        return mismatches
+
+    # ===== Outliers =====
+
+    def distribution(self, token):
+        """
+        Percentiles of the per-user increase for a token
+        """
+        increases = sorted(delta for delta in self.deltas[token] if delta > 0)
+        return {p: percentile(increases, p) for p in PERCENTILES}, len(increases)
+
+    def outliers(self, token, p=99.9, limit=20):
+        """
+        Largest increases above the pth percentile, and users gaining more than the pth percentile relative to their previous amount
+        """
+        deltas = self.deltas[token]
+        before = self.beforeColumns[token]
+
+        threshold = percentile(sorted(delta for delta in deltas if delta > 0), p)
+        absolute = sorted(
+            (i for i, delta in enumerate(deltas) if delta > 0 and delta >= threshold),
+            key=lambda i: -deltas[i],
+        )[:limit]
+
+        # New users have no previous amount to compare against
+        ratios = [(deltas[i] / before[i], i) for i in range(len(deltas)) if before[i] > 0 and deltas[i] > 0]
+        ratioThreshold = percentile(sorted(ratio for ratio, i in ratios), p)
+        relative = sorted(
+            ((ratio, i) for ratio, i in ratios if ratio >= ratioThreshold), reverse=True
+        )[:limit]
+
+        return {
+            "threshold": threshold,
+            "absolute": [(self.users[i], before[i], deltas[i]) for i in absolute],
+            "ratioThreshold": ratioThreshold,
+            "relative": [(self.users[i], before[i], deltas[i], ratio) for ratio, i in relative],
+        }
+
+    def new_users(self, token):
+        before = self.beforeColumns[token]
+        after = self.afterColumns[token]
+        return sum(1 for a, b in zip(before, after) if a == 0 and b > 0)
+
+
+def diff_content_files(before, after):
+    """
+    Before / after are content file names or loaded rewards trees
+    """
+    return RewardsDiff(load_claim_columns(before), load_claim_columns(after))
+
+
+def print_diff(diff, names=None, p=99.9, limit=10):
+    names = names or {}
+    totals = diff.totals()
+
+    table = []
+    for token in diff.tokens:
+        (dist, numIncreased) = diff.distribution(token)
+        table.append(
+            [
+                names.get(token, token),
+                totals[token]["before"],
+                totals[token]["after"],
+                totals[token]["delta"],
+                numIncreased,
+                diff.new_users(token),
+            ]
+            + [dist[q] for q in PERCENTILES]
+        )
+    print(
+        tabulate(
+            table,
+            headers=["token", "before", "after", "delta", "increased", "new users"]
+            + ["p{}".format(q) for q in PERCENTILES],
+        )
+    )
+
+    for token in diff.tokens:
+        outliers = diff.outliers(token, p, limit)
+        if len(outliers["absolute"]) == 0:
+            continue
+        console.print("\n[bold]{} outliers above p{}[/bold]".format(names.get(token, token), p))
+        print(tabulate(outliers["absolute"], headers=["user", "before", "increase"]))
+        if len(outliers["relative"]) > 0:
+            print(tabulate(outliers["relative"], headers=["user", "before", "increase", "ratio"]))
+
+    regressions = diff.regressions()
+    color = "green" if len(regressions) == 0 else "red"
+    console.print(
+        "\n[{}]{} users, {} tokens, {} regressions ({:.2f}s)[/{}]".format(
+            color, len(diff.users), len(diff.tokens), len(regressions), diff.time, color
+        )
+    )
+    for regression in regressions[:limit]:
+        console.print("[red]Regression[/red]", regression)
@@ -0,0 +1,82 @@
+import json
+
+"""
+Readers for the JSON Lines logs written by RewardsLogger
+
+Record types:
+- shareSeconds: vault, user, amount
+- token: vault, user, token, amount
+- multiplier: vault, user, multiplier
+- epoch: vault, epoch, user, shareSeconds, token, amount
+- unlockSchedule: token, schedule
+- distribution: vault, distribution
+"""
+
+
+def read_log(path, **filters):
+    """
+    Yield records matching every given field, e.g. read_log(path, type="token", vault="native.badger")
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if all(record.get(key) == value for key, value in filters.items()):
+                yield record
+
+
+def aggregate_log(path, by, field="amount", **filters):
+    """
+    Sum a field over matching records, grouped by the tuple of the given fields
+    """
+    totals = {}
+    counts = {}
+    for record in read_log(path, **filters):
+        key = tuple(record.get(name) for name in by)
+        totals[key] = totals.get(key, 0) + record[field]
+        counts[key] = counts.get(key, 0) + 1
+    return totals, counts
+
+
+def summarize_log(path):
+    """
+    Rebuild the summary RewardsLogger used to keep in memory
+    """
+    userData = {}
+    epochData = {}
+    distributionInfo = {}
+    unlockSchedules = {}
+
+    for record in read_log(path):
+        recordType = record["type"]
+
+        if recordType in ["shareSeconds", "token", "multiplier"]:
+            user = userData.setdefault(record["vault"], {}).setdefault(record["user"], {})
+            if recordType == "shareSeconds":
+                user["shareSeconds"] = user.get("shareSeconds", 0) + record["amount"]
+            elif recordType == "token":
+                totals = user.setdefault("totals", {})
+                totals[record["token"]] = totals.get(record["token"], 0) + record["amount"]
+            else:
+                user["multiplier"] = record["multiplier"]
+
+        elif recordType == "epoch":
+            epoch = epochData.setdefault(record["vault"], {}).setdefault(record["epoch"], {})
+            epoch[record["user"]] = {
+                "shareSeconds": record["shareSeconds"],
+                "totals": {record["token"]: record["amount"]},
+            }
+
+        elif recordType == "unlockSchedule":
+            unlockSchedules[record["token"]] = record["schedule"]
+
+        elif recordType == "distribution":
+            distributionInfo[record["vault"]] = record["distribution"]
+
+    return {
+        "userData": userData,
+        "distributionInfo": distributionInfo,
+        "unlockSchedules": unlockSchedules,
+        "retroactiveData": epochData,
+    }
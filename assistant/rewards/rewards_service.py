@@ -0,0 +1,152 @@
+import json
+import os
+import time
+
+from brownie import chain, web3
+from rich.console import Console
+
+from assistant.rewards.rewards_assistant import (
+    content_hash_to_filename,
+    fetch_current_rewards_tree,
+    fetchCurrentMerkleData,
+    run_action,
+)
+from assistant.rewards.rewards_state import RewardsState
+from config.rewards_config import rewards_config
+from helpers.rpc_metrics import MetricsServer, RpcMetrics
+from scripts.rewards.rewards_utils import get_last_proposed_range
+
+console = Console()
+
+"""
+Long-lived rewards process for the root updater / guardian roles
+
+Instead of sleeping a fixed interval and recomputing everything, the service:
+- polls for new blocks, and only reads the tree when the next update can be due
+  (lastPublishTimestamp + rootUpdateMinInterval for the root updater, a new proposal for the guardian)
+- keeps block times, geyser events, geyser checkpoints and the last tree in a RewardsState
+- serves per-stage timings and RPC counts at http://127.0.0.1:<metricsPort>/metrics
+
+The guardian keeps its own state directory (rewards_config.guardianStateDir): events, checkpoints and the
+trees it approved are built independently of the root updater, and persist across restarts.
+"""
+
+
+class RewardsService:
+    def __init__(self, badger, action, metricsPort=8900, pollInterval=5, test=False):
+        assert action in ["rootUpdater", "guardian"]
+        self.badger = badger
+        self.action = action
+        self.pollInterval = pollInterval
+        self.test = test
+
+        self.metrics = RpcMetrics().install(web3)
+        if action == "guardian":
+            self.state = RewardsState.load(rewards_config.guardianStateDir, self.metrics)
+        else:
+            self.state = RewardsState(self.metrics)
+        self.server = MetricsServer(self.metrics, metricsPort)
+
+        self.lastBlock = 0
+        self.nextDueTime = 0
+        self.lastProposalHash = None
+
+    # ===== Triggers =====
+
+    def wait_for_block(self):
+        while True:
+            block = web3.eth.getBlock("latest")
+            if block["number"] > self.lastBlock:
+                self.lastBlock = block["number"]
+                self.metrics.set_gauge("block", block["number"])
+                return block
+            time.sleep(self.pollInterval)
+
+    def root_update_due(self, block):
+        # Skip the tree read until the cached due time has passed
+        if block["timestamp"] < self.nextDueTime:
+            return False
+        lastPublish = self.badger.badgerTree.lastPublishTimestamp()
+        self.nextDueTime = lastPublish + rewards_config.rootUpdateMinInterval
+        return block["timestamp"] >= self.nextDueTime
+
+    def proposal_due(self, block):
+        tree = self.badger.badgerTree
+        if not tree.hasPendingRoot():
+            return False
+        return str(tree.pendingMerkleContentHash()) != self.lastProposalHash
+
+    def is_due(self, block):
+        if self.action == "rootUpdater":
+            return self.root_update_due(block)
+        return self.proposal_due(block)
+
+    # ===== Run =====
+
+    def load_tree(self, contentHash):
+        # Prefer a tree this role built itself
+        ownFile = self.state.path(content_hash_to_filename(contentHash))
+        if self.state.stateDir and os.path.exists(ownFile):
+            with open(ownFile) as f:
+                return json.load(f)
+        if self.action == "guardian":
+            # No tree of its own (first run, new host): only trust the published file once its root, rebuilt
+            # from every claim, matches the approved root on chain
+            return fetch_current_rewards_tree(self.badger, verify=True)
+        return fetch_current_rewards_tree(self.badger)
+
+    def current_tree(self):
+        merkle = fetchCurrentMerkleData(self.badger)
+        return self.state.tree(merkle["contentHash"], lambda: self.load_tree(merkle["contentHash"]))
+
+    def cycle_range(self):
+        if self.action == "rootUpdater":
+            return (self.badger.badgerTree.lastPublishEndBlock() + 1, chain.height)
+        # Same maxStartBlockAge sanity checks as approve_root, but only the tree's block range is read: the
+        # guardian never depends on the proposer's content file
+        return get_last_proposed_range(self.badger)
+
+    def run_once(self):
+        with self.metrics.stage("cycle"):
+            with self.metrics.stage("load_tree"):
+                pastRewards = self.current_tree()
+            (startBlock, endBlock) = self.cycle_range()
+
+            if self.action == "guardian":
+                self.lastProposalHash = str(self.badger.badgerTree.pendingMerkleContentHash())
+
+            result = run_action(
+                self.badger,
+                {
+                    "action": self.action,
+                    "startBlock": startBlock,
+                    "endBlock": endBlock,
+                    "pastRewards": pastRewards,
+                    "state": self.state,
+                },
+                test=self.test,
+            )
+
+        # Re-read the publish time on the next block
+        self.nextDueTime = 0
+        self.state.save()
+        return result
+
+    def run(self):
+        self.server.start()
+        console.print(
+            "[green]Rewards service ({}) serving metrics on port {}[/green]".format(
+                self.action, self.server.port
+            )
+        )
+        while True:
+            block = self.wait_for_block()
+            try:
+                if self.is_due(block):
+                    self.run_once()
+                    self.metrics.set_gauge("last_run_block", block["number"])
+            except Exception as e:
+                console.print("[red]Error[/red]", e)
+                self.metrics.set_gauge("errors", self.metrics.gauges.get("errors", 0) + 1)
+                # Retry a failed proposal check on the next block
+                self.lastProposalHash = None
@@ -0,0 +1,166 @@
+import copy
+import os
+import pickle
+
+from brownie import web3
+from rich.console import Console
+
+from assistant.rewards.BadgerGeyserMock import BadgerGeyserMock
+from assistant.rewards.calc_stakes import (
+    end_user_accounting,
+    fetch_geyser_events,
+    process_user_actions,
+)
+from helpers.rpc_batch import get_block_timestamps
+from helpers.rpc_metrics import RpcMetrics
+
+console = Console()
+
+"""
+State kept warm between rewards runs by a long-lived process
+
+- BlockTimeIndex: block number -> timestamp
+- GeyserEventCache: Staked / Unstaked events per geyser, only new blocks are fetched each run
+- GeyserCheckpoints: geyser mock state after every action up to the previous period start
+
+Mock state after processing actions with timestamp <= T (for T <= the period start) does not depend on the
+period: share seconds in range are only accrued after the start time. So a checkpoint taken at one period's
+start can be resumed for any later period, replaying only the newer actions.
+"""
+
+# Blocks this close to the head are refetched every run in case of reorgs
+REORG_DEPTH = 20
+
+
+class BlockTimeIndex:
+    def __init__(self):
+        self.timestamps = {}
+
+    def timestamp(self, block):
+        block = int(block)
+        if block not in self.timestamps:
+            self.timestamps[block] = web3.eth.getBlock(block)["timestamp"]
+        return self.timestamps[block]
+
+    def prefetch(self, blocks):
+        """
+        Fetch every missing block in one JSON-RPC batch
+        """
+        missing = [int(block) for block in blocks if int(block) not in self.timestamps]
+        if missing:
+            self.timestamps.update(get_block_timestamps(missing))
+
+
+class GeyserEventCache:
+    def __init__(self, reorgDepth=REORG_DEPTH):
+        self.reorgDepth = reorgDepth
+        # geyser address -> {"Staked": [], "Unstaked": [], "lastBlock": int}
+        self.geysers = {}
+
+    def get_events(self, geyser, startBlock, endBlock):
+        """
+        Events in [startBlock, endBlock]; startBlock must stay the same between calls for a geyser
+        """
+        cached = self.geysers.get(geyser.address)
+        if cached is None or cached["startBlock"] != startBlock:
+            cached = {"startBlock": startBlock, "lastBlock": startBlock - 1, "Staked": [], "Unstaked": []}
+
+        events = {"Staked": list(cached["Staked"]), "Unstaked": list(cached["Unstaked"])}
+        if endBlock > cached["lastBlock"]:
+            fresh = fetch_geyser_events(geyser, cached["lastBlock"] + 1, endBlock)
+            for name in ["Staked", "Unstaked"]:
+                events[name].extend(fresh[name])
+
+        # Only blocks past the reorg window are kept
+        safeBlock = max(cached["lastBlock"], endBlock - self.reorgDepth)
+        self.geysers[geyser.address] = {
+            "startBlock": startBlock,
+            "lastBlock": safeBlock,
+            "Staked": [event for event in events["Staked"] if event["blockNumber"] <= safeBlock],
+            "Unstaked": [event for event in events["Unstaked"] if event["blockNumber"] <= safeBlock],
+        }
+
+        return {
+            name: [event for event in events[name] if event["blockNumber"] <= endBlock]
+            for name in ["Staked", "Unstaked"]
+        }
+
+
+class GeyserCheckpoints:
+    def __init__(self):
+        # geyser key -> (timestamp, mock)
+        self.checkpoints = {}
+
+    def mock_for_period(self, key, actions, periodStartTime, periodEndTime):
+        """
+        Equivalent to processing every action from scratch for the period (calc_stakes.process_actions)
+        """
+        checkpoint = self.checkpoints.get(key)
+        if checkpoint is not None and checkpoint[0] <= periodStartTime:
+            (after, geyserMock) = (checkpoint[0], copy.deepcopy(checkpoint[1]))
+            console.print("Resuming {} from checkpoint at {}".format(key, after))
+        else:
+            (after, geyserMock) = (None, BadgerGeyserMock(key))
+
+        geyserMock.set_current_period(periodStartTime, periodEndTime)
+
+        # Actions up to the period start, then checkpoint before anything in range is accrued
+        for user, userData in actions.items():
+            process_user_actions(geyserMock, user, userData, after=after, until=periodStartTime)
+        self.checkpoints[key] = (periodStartTime, copy.deepcopy(geyserMock))
+
+        for user, userData in actions.items():
+            process_user_actions(geyserMock, user, userData, after=periodStartTime)
+
+        for user in list(geyserMock.users.keys()):
+            end_user_accounting(geyserMock, user)
+
+        return geyserMock
+
+
+class RewardsState:
+    def __init__(self, metrics=None, stateDir=None):
+        self.blockTimes = BlockTimeIndex()
+        self.events = GeyserEventCache()
+        self.checkpoints = GeyserCheckpoints()
+        self.metrics = metrics or RpcMetrics()
+
+        # Persist between restarts when set; each role should use its own directory
+        self.stateDir = stateDir
+
+        # Last tree loaded, by content hash
+        self.trees = {}
+
+    @classmethod
+    def load(cls, stateDir, metrics=None):
+        state = cls(metrics, stateDir)
+        path = os.path.join(stateDir, "state.pickle")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                (state.blockTimes, state.events, state.checkpoints) = pickle.load(f)
+            console.print("Loaded rewards state from " + path)
+        return state
+
+    def save(self):
+        if self.stateDir is None:
+            return
+        os.makedirs(self.stateDir, exist_ok=True)
+        path = os.path.join(self.stateDir, "state.pickle")
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump((self.blockTimes, self.events, self.checkpoints), f)
+        os.replace(path + ".tmp", path)
+
+    def path(self, fileName):
+        if self.stateDir is None:
+            return os.path.basename(fileName)
+        os.makedirs(self.stateDir, exist_ok=True)
+        return os.path.join(self.stateDir, os.path.basename(fileName))
+
+    def tree(self, contentHash, load):
+        """
+        Keep the last parsed tree; load() is only called when the content hash changes
+        """
+        contentHash = str(contentHash)
+        if contentHash not in self.trees:
+            self.trees = {contentHash: load()}
+        return self.trees[contentHash]
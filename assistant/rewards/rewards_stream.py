@@ -0,0 +1,135 @@
+import json
+
+"""
+Incremental reader for rewards content files
+
+Content files are one JSON object with a large "claims" map. The reader walks the top level object and
+decodes one claim at a time, so only the current claim (plus a read buffer) is held in memory.
+"""
+
+_decoder = json.JSONDecoder()
+
+WHITESPACE = " \t\n\r"
+
+
+class ContentFileStream:
+    def __init__(self, source, chunkSize=1 << 16):
+        """
+        Source is a file name or a text file object
+        """
+        if isinstance(source, str):
+            self.file = open(source)
+            self.ownsFile = True
+        else:
+            self.file = source
+            self.ownsFile = False
+
+        self.chunkSize = chunkSize
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+        # Every top level key other than claims, filled in as the stream is read
+        self.header = {}
+
+    # ===== Buffer handling =====
+
+    def _read_more(self, minimum=0):
+        if self.eof:
+            return False
+        chunk = self.file.read(max(self.chunkSize, minimum))
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop consumed input so the buffer only holds the value being decoded
+        self.buffer = self.buffer[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read_more():
+                return
+
+    def _peek(self):
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise Exception("Unexpected end of content file")
+        return self.buffer[self.pos]
+
+    def _expect(self, char):
+        found = self._peek()
+        if found != char:
+            raise Exception("Expected '{}' in content file, found '{}'".format(char, found))
+        self.pos += 1
+
+    def _value(self):
+        self._skip_whitespace()
+        while True:
+            try:
+                (value, end) = _decoder.raw_decode(self.buffer, self.pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow reads geometrically so large values are not re-parsed too often
+            self._read_more(minimum=len(self.buffer))
+
+    # ===== Public =====
+
+    def claims(self):
+        """
+        Yield (user, claim) pairs in file order
+        """
+        try:
+            self._expect("{")
+            if self._peek() == "}":
+                return
+            while True:
+                key = self._value()
+                self._expect(":")
+
+                if key == "claims":
+                    for entry in self._claim_entries():
+                        yield entry
+                else:
+                    self.header[key] = self._value()
+
+                separator = self._peek()
+                self.pos += 1
+                if separator == "}":
+                    return
+                if separator != ",":
+                    raise Exception("Malformed content file near '{}'".format(separator))
+        finally:
+            self.close()
+
+    def _claim_entries(self):
+        self._expect("{")
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            user = self._value()
+            self._expect(":")
+            yield (user, self._value())
+
+            separator = self._peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise Exception("Malformed claims near '{}'".format(separator))
+
+    def close(self):
+        if self.ownsFile:
+            self.file.close()
+
+
+def iter_claims(source):
+    return ContentFileStream(source).claims()
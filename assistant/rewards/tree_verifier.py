@@ -0,0 +1,285 @@
+import random
+import time
+from multiprocessing import Pool
+
+from eth_abi import encode_abi
+from eth_utils import encode_hex, keccak
+from rich.console import Console
+
+from assistant.rewards.rewards_stream import ContentFileStream, iter_claims
+
+console = Console()
+
+"""
+Verify-only pass over a rewards content file
+
+Rather than rebuilding a MerkleTree (which keeps every layer in memory), claims are streamed from the
+file, each node is re-encoded and checked against the stored "node", and the root is folded from the
+sorted leaf hashes keeping a single pending hash per tree level.
+"""
+
+
+def encode_claim_node(claim):
+    """
+    Same encoding as RewardsList.to_node_entry
+    """
+    return encode_abi(
+        ["uint", "address", "uint", "address[]", "uint[]"],
+        (
+            int(claim["index"], 16),
+            claim["user"],
+            int(claim["cycle"], 16),
+            claim["tokens"],
+            [int(amount) for amount in claim["cumulativeAmounts"]],
+        ),
+    )
+
+
+def combined_hash(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return keccak(b"".join(sorted([a, b])))
+
+
+class StreamingMerkleRoot:
+    """
+    Folds sorted leaves into the root produced by merkle_tree.MerkleTree, one pending hash per level.
+    An unpaired last element on a layer is carried up unchanged, matching MerkleTree.get_next_layer
+    """
+
+    def __init__(self):
+        self.levels = []
+        self.count = 0
+        self.last = None
+
+    def add(self, leaf):
+        # MerkleTree de-duplicates and sorts its elements
+        if self.last is not None:
+            assert leaf >= self.last, "Leaves must be added in sorted order"
+            if leaf == self.last:
+                return
+        self.last = leaf
+        self.count += 1
+
+        node = leaf
+        level = 0
+        while True:
+            if level == len(self.levels):
+                self.levels.append(node)
+                return
+            if self.levels[level] is None:
+                self.levels[level] = node
+                return
+            node = combined_hash(self.levels[level], node)
+            self.levels[level] = None
+            level += 1
+
+    def root(self):
+        carry = None
+        for pending in self.levels:
+            if pending is not None and carry is not None:
+                carry = combined_hash(pending, carry)
+            elif pending is not None:
+                carry = pending
+        return carry
+
+
+def verify_proof(leaf, proof, root):
+    node = leaf
+    for sibling in proof:
+        node = combined_hash(node, bytes.fromhex(sibling[2:]))
+    return node == root
+
+
+def _verify_proof_chunk(args):
+    (root, entries) = args
+    failures = []
+    for (user, leaf, proof) in entries:
+        if not verify_proof(leaf, proof, root):
+            failures.append(user)
+    return (len(entries), failures)
+
+
+def _proof_chunks(source, root, sample, seed, chunkSize):
+    rng = random.Random(seed)
+    chunk = []
+    for user, claim in iter_claims(source):
+        if sample < 1 and rng.random() >= sample:
+            continue
+        leaf = keccak(hexstr=claim["node"])
+        chunk.append((user, leaf, claim["proof"]))
+        if len(chunk) == chunkSize:
+            yield (root, chunk)
+            chunk = []
+    if len(chunk) > 0:
+        yield (root, chunk)
+
+
+def check_proofs(fileName, root, sample=1, seed=0, processes=None, chunkSize=2000):
+    """
+    Validate a sample (0 -> 1) of the file's proofs against root in parallel, returning (numChecked, badProofs)
+    """
+    numProofsChecked = 0
+    badProofs = []
+    with Pool(processes) as pool:
+        chunks = _proof_chunks(fileName, root, sample, seed, chunkSize)
+        for (checked, failures) in pool.imap_unordered(_verify_proof_chunk, chunks):
+            numProofsChecked += checked
+            badProofs.extend(failures)
+    return (numProofsChecked, badProofs)
+
+
+def read_content_header(fileName):
+    """
+    Top level keys before the claims (merkleRoot, cycle, ...) without reading the claims themselves
+    """
+    stream = ContentFileStream(fileName)
+    claims = stream.claims()
+    next(claims, None)
+    claims.close()
+    return stream.header
+
+
+def verify_content_file(
+    fileName,
+    expectedRoot=None,
+    proofSample=0.01,
+    processes=None,
+    seed=0,
+    chunkSize=2000,
+):
+    """
+    Verify a rewards content file without building the full tree:
+    - Every claim's node must match its re-encoded data
+    - The root folded from all leaves must match the file's merkleRoot (and expectedRoot if given)
+    - proofSample (0 -> 1) of the claims have their proofs validated in parallel against that root
+    """
+    start = time.time()
+
+    stream = ContentFileStream(fileName)
+    leaves = []
+    badNodes = []
+    for user, claim in stream.claims():
+        encoded = encode_claim_node(claim)
+        if encode_hex(encoded) != claim["node"]:
+            badNodes.append(user)
+        leaves.append(keccak(encoded))
+
+    # Leaves are 32 bytes each; the layers above them are never materialised
+    leaves.sort()
+    folder = StreamingMerkleRoot()
+    for leaf in leaves:
+        folder.add(leaf)
+    numClaims = len(leaves)
+    del leaves
+
+    root = folder.root()
+    computedRoot = encode_hex(root) if root is not None else None
+    fileRoot = stream.header.get("merkleRoot")
+
+    rootTime = time.time() - start
+
+    numProofsChecked = 0
+    badProofs = []
+    if proofSample > 0 and root is not None:
+        (numProofsChecked, badProofs) = check_proofs(fileName, root, proofSample, seed, processes, chunkSize)
+
+    result = {
+        "fileName": fileName,
+        "cycle": stream.header.get("cycle"),
+        "numClaims": numClaims,
+        "fileRoot": fileRoot,
+        "computedRoot": computedRoot,
+        "expectedRoot": expectedRoot,
+        "badNodes": badNodes,
+        "numProofsChecked": numProofsChecked,
+        "badProofs": badProofs,
+        "rootTime": rootTime,
+        "totalTime": time.time() - start,
+    }
+    result["valid"] = (
+        len(badNodes) == 0
+        and len(badProofs) == 0
+        and computedRoot == fileRoot
+        and (expectedRoot is None or computedRoot == str(expectedRoot))
+    )
+    return result
+
+
+def verify_proofs(fileName, expectedRoot=None, processes=None, chunkSize=2000):
+    """
+    Check every claim's proof against the file's merkleRoot, without re-encoding nodes or rebuilding the root:
+    each leaf is keccak(node), folded up its proof with the sorted pair rule
+    """
+    start = time.time()
+    header = read_content_header(fileName)
+    if "merkleRoot" not in header:
+        raise Exception("{} has no merkleRoot before its claims".format(fileName))
+
+    root = bytes.fromhex(header["merkleRoot"][2:])
+    (numProofsChecked, badProofs) = check_proofs(fileName, root, 1, 0, processes, chunkSize)
+
+    fileRoot = header["merkleRoot"]
+    elapsed = time.time() - start
+
+    result = {
+        "fileName": fileName,
+        "cycle": header.get("cycle"),
+        "fileRoot": fileRoot,
+        "expectedRoot": expectedRoot,
+        "numProofsChecked": numProofsChecked,
+        "badProofs": badProofs,
+        "totalTime": elapsed,
+        "proofsPerSecond": numProofsChecked / elapsed if elapsed > 0 else 0,
+    }
+    result["valid"] = len(badProofs) == 0 and (
+        expectedRoot is None or fileRoot == str(expectedRoot)
+    )
+    return result
+
+
+def print_proof_verification(result, limit=10):
+    color = "green" if result["valid"] else "red"
+    console.print(
+        "[{}]===== Proofs {}: {} =====[/{}]".format(
+            color, result["fileName"], "PASS" if result["valid"] else "FAIL", color
+        )
+    )
+    console.print(
+        {
+            "cycle": result["cycle"],
+            "fileRoot": result["fileRoot"],
+            "expectedRoot": result["expectedRoot"],
+            "passed": result["numProofsChecked"] - len(result["badProofs"]),
+            "failed": len(result["badProofs"]),
+            "totalTime": "{:.2f}s".format(result["totalTime"]),
+            "proofsPerSecond": int(result["proofsPerSecond"]),
+        }
+    )
+    for user in result["badProofs"][:limit]:
+        console.print("[red]Invalid proof[/red]", user)
+
+
+def print_verification(result):
+    color = "green" if result["valid"] else "red"
+    console.print(
+        "[{}]===== Verify {}: {} =====[/{}]".format(
+            color, result["fileName"], "OK" if result["valid"] else "FAILED", color
+        )
+    )
+    console.print(
+        {
+            "cycle": result["cycle"],
+            "numClaims": result["numClaims"],
+            "fileRoot": result["fileRoot"],
+            "computedRoot": result["computedRoot"],
+            "expectedRoot": result["expectedRoot"],
+            "badNodes": len(result["badNodes"]),
+            "proofsChecked": result["numProofsChecked"],
+            "badProofs": len(result["badProofs"]),
+            "rootTime": "{:.2f}s".format(result["rootTime"]),
+            "totalTime": "{:.2f}s".format(result["totalTime"]),
+        }
+    )
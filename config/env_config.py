@@ -7,6 +7,10 @@ class EnvConfig:
     def __init__(self):
         self.aws_access_key_id = decouple.config("AWS_ACCESS_KEY_ID", default="")
         self.aws_secret_access_key = decouple.config("AWS_SECRET_ACCESS_KEY", default="")
+        # Serve S3 reads and writes from a local directory instead of AWS (testing)
+        self.s3_local_root = decouple.config("S3_LOCAL_ROOT", default="")
+        # Gzip rewards files on upload; off until every consumer of the buckets accepts Content-Encoding: gzip
+        self.s3_gzip_uploads = decouple.config("S3_GZIP_UPLOADS", default=False, cast=bool)
         self.debug = debug
 
 env_config = EnvConfig()
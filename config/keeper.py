@@ -40,6 +40,7 @@ run_intervals = {
         "harvest": days(1),
         "tend": hours(12),
         "earn": minutes(10),
+        "rebase": minutes(1),
     },
     "bsc": {
         "harvest": minutes(30),
@@ -48,6 +49,29 @@ run_intervals = {
     }
 }
 
+# Random offset of up to +/- this much on each run, so jobs sharing an interval don't all fire together
+run_jitter = {
+    "eth": {
+        "harvest": hours(1),
+        "tend": minutes(30),
+        "earn": minutes(1),
+        "rebase": 0,
+    },
+    "bsc": {
+        "harvest": minutes(3),
+        "tend": minutes(2),
+        "earn": minutes(1),
+    }
+}
+
+# Per Sett intervals, overriding run_intervals for single (sett, action) jobs
+job_intervals = {
+    "eth": {
+        # "native.renCrv": {"harvest": hours(12)},
+    },
+    "bsc": {},
+}
+
 earn_default_percentage_threshold = 0.01
 btc_threshold = Wei("3 ether")
 
@@ -69,6 +93,8 @@ class KeeperConfig:
         self.debug = False
         self.setts_to_skip = {}
         self.run_intervals = run_intervals
+        self.run_jitter = run_jitter
+        self.job_intervals = job_intervals
         self.earn_default_percentage_threshold = earn_default_percentage_threshold
         self.earn_threshold_value_override = earn_threshold_value_override
 
@@ -96,6 +122,15 @@ class KeeperConfig:
         else:
             raise Exception("Run interval not found for {}".format(chain))
 
+    def get_job_interval(self, chain, action, key):
+        override = self.job_intervals.get(chain, {}).get(key, {})
+        if action in override:
+            return override[action]
+        return self.get_run_interval(chain, action)
+
+    def get_jitter(self, chain, action):
+        return self.run_jitter.get(chain, {}).get(action, 0)
+
     def get_skipped_setts(self, chain, action):
         if chain in self.setts_to_skip.keys():
             return self.setts_to_skip[chain][action]
@@ -113,6 +148,10 @@ class KeeperConfig:
         chain = network_manager.get_active_network()
         return self.get_run_interval(chain, action)
 
+    def get_active_chain_actions(self):
+        chain = network_manager.get_active_network()
+        return list(self.run_intervals[chain].keys())
+
 
 keeper_config = KeeperConfig()
 keeper_config.add_skipped_setts(setts_to_skip)
@@ -5,6 +5,11 @@ class RewardsConfig:
         self.globalStakingStartBlock = 11252068
         self.rootUpdateMinInterval = hours(0.9)
         self.maxStartBlockAge = 3200
+        # Local cache of content hash addressed rewards files
+        self.cacheDir = "rewards-cache"
+        self.cacheMaxBytes = 2 * 1024 * 1024 * 1024
+        # Guardian's own incremental state, never shared with the root updater
+        self.guardianStateDir = "guardian-state"
         self.debug = False
 
 
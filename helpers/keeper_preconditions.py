@@ -0,0 +1,28 @@
+from config.keeper import keeper_config
+from helpers.time_utils import hours
+
+"""
+When a keeper action is worth sending, shared by the one-shot keeper scripts and KeeperService
+"""
+
+
+def earn_preconditions(key, vaultBalance, strategyBalance):
+    # Always allow earn on first run
+    if strategyBalance == 0:
+        return True
+    # Earn if deposits have accumulated over a static threshold
+    if keeper_config.has_earn_threshold_override_active_chain(
+        key
+    ) and vaultBalance >= keeper_config.get_active_chain_earn_threshold_override(key):
+        return True
+    # Earn if deposits have accumulated over % threshold
+    if vaultBalance / strategyBalance > keeper_config.earn_default_percentage_threshold:
+        return True
+    else:
+        return False
+
+
+def rebase_preconditions(lastRebase, inRebaseWindow, now):
+    # Rebase if sufficient time has passed since last rebase and we are in the window.
+    # Give adequate time between TX attempts
+    return now - lastRebase > hours(2) and inRebaseWindow
@@ -0,0 +1,400 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from brownie import accounts, chain, rpc, web3
+from rich.console import Console
+from tabulate import tabulate
+
+from config.keeper import keeper_config
+from helpers.keeper_preconditions import earn_preconditions, rebase_preconditions
+from helpers.multicall import AsyncMulticall, Call, func
+from helpers.multicall.async_multicall import AsyncRpc
+from helpers.network import network_manager
+from helpers.rpc_metrics import MetricsServer, RpcMetrics
+from helpers.sett.SystemSnapshotManager import SystemSnapshotManager
+from helpers.sett.snapshot_store import open_default_store
+from helpers.time_utils import hours
+
+console = Console()
+
+"""
+One long-running keeper for harvest, tend, earn and rebase
+
+Every (sett, action) pair is a KeeperJob with its own interval (keeper_config.get_job_interval) and jitter.
+The service keeps one connected BadgerSystem and one SystemSnapshotManager, so sett metadata is read once
+and cached. Each poll:
+- the preconditions of every due job are read concurrently, one AsyncMulticall per job over a shared
+  AsyncRpc session, all at the same block
+- jobs whose preconditions hold go on a queue, and one submitter thread sends their transactions in order,
+  so the keeper's nonces never race
+- jobs that are not ready are rescheduled for their next interval
+
+Per-job check latency, queue wait and run time, and the next-run schedule, are printed every statusInterval
+and served with the RPC counts (web3 and AsyncRpc requests alike) at http://127.0.0.1:<metricsPort>/metrics.
+
+    KeeperService(badger, actions=["harvest", "earn"]).run()
+"""
+
+JOB_ACTIONS = ["harvest", "tend", "earn", "rebase"]
+# Rebase is a system job, not a sett one
+REBASE_KEY = "digg"
+gasLimits = {"harvest": 2000000, "tend": 1000000, "earn": 2000000}
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "-"
+    if abs(seconds) < 1:
+        return "{:.0f}ms".format(seconds * 1000)
+    if abs(seconds) < 120:
+        return "{:.1f}s".format(seconds)
+    if abs(seconds) < hours(2):
+        return "{:.0f}m".format(seconds / 60)
+    return "{:.1f}h".format(seconds / 3600)
+
+
+class KeeperJob:
+    def __init__(self, key, action, interval, jitter=0):
+        self.key = key
+        self.action = action
+        self.interval = interval
+        self.jitter = min(jitter, interval)
+        self.name = "{} {}".format(action, key)
+        # Precondition reads, built once from the cached metadata
+        self.calls = []
+
+        self.enabled = True
+        self.queued = False
+        self.nextRun = 0
+        self.enqueued = 0
+        self.lastResult = None
+        self.stats = {
+            "checks": 0,
+            "runs": 0,
+            "skips": 0,
+            "failures": 0,
+            "lastCheck": None,
+            "lastWait": None,
+            "lastRun": None,
+            "totalRun": 0,
+        }
+
+    def schedule(self, now, rng, first=False):
+        if first:
+            # Spread the first runs over the jitter window instead of all at startup
+            self.nextRun = now + rng.uniform(0, self.jitter)
+        else:
+            self.nextRun = now + self.interval + rng.uniform(-self.jitter, self.jitter)
+
+    def due(self, now):
+        return self.enabled and not self.queued and now >= self.nextRun
+
+
+class KeeperService:
+    def __init__(
+        self,
+        badger,
+        actions=None,
+        pollInterval=15,
+        statusInterval=300,
+        retryInterval=60,
+        concurrency=8,
+        checkTimeout=30,
+        metricsPort=8901,
+        cacheFile=None,
+        seed=None,
+    ):
+        """
+        actions: subset of JOB_ACTIONS to run, default every action configured for the active chain
+        retryInterval: when a precondition read fails, check again after this long instead of a full interval
+        """
+        self.badger = badger
+        self.chain = network_manager.get_active_network()
+        self.actions = actions or keeper_config.get_active_chain_actions()
+        self.pollInterval = pollInterval
+        self.statusInterval = statusInterval
+        self.retryInterval = retryInterval
+        self.concurrency = concurrency
+        self.checkTimeout = checkTimeout
+        self.rng = random.Random(seed)
+
+        self.metrics = RpcMetrics().install(web3)
+        self.server = MetricsServer(self.metrics, metricsPort) if metricsPort else None
+
+        self.jobs = self.build_jobs()
+        settKeys = sorted(set(job.key for job in self.jobs if job.action != "rebase"))
+        self.system = None
+        if settKeys:
+            self.system = SystemSnapshotManager(
+                badger, keys=settKeys, cacheFile=cacheFile, store=open_default_store()
+            )
+            # Metadata for every sett in one pass, snapshot managers are built on their first run
+            self.system.discover()
+        for job in self.jobs:
+            job.calls = self.precondition_calls(job)
+
+        self.queue = None
+        self.submitter = None
+        self.nextStatus = 0
+
+    # ===== Jobs =====
+
+    def build_jobs(self):
+        jobs = []
+        for action in self.actions:
+            assert action in JOB_ACTIONS
+            jitter = keeper_config.get_jitter(self.chain, action)
+            if action == "rebase":
+                # BadgerSystem always has a digg attribute, None without a digg system
+                if getattr(self.badger, "digg", None) is not None:
+                    interval = keeper_config.get_run_interval(self.chain, action)
+                    jobs.append(KeeperJob(REBASE_KEY, action, interval, jitter))
+                continue
+
+            skip = keeper_config.get_skipped_setts(self.chain, action)
+            for key in self.badger.getAllSettIds():
+                if key in skip:
+                    continue
+                interval = keeper_config.get_job_interval(self.chain, action, key)
+                jobs.append(KeeperJob(key, action, interval, jitter))
+        return jobs
+
+    def precondition_calls(self, job):
+        if job.action == "rebase":
+            policy = self.badger.digg.uFragmentsPolicy.address
+            return [
+                Call(policy, ["lastRebaseTimestampSec()(uint256)"], [["lastRebase", None]]),
+                Call(policy, ["inRebaseWindow()(bool)"], [["inRebaseWindow", None]]),
+            ]
+
+        metadata = self.system.metadata[job.key]
+        sett = self.badger.getSett(job.key).address
+        strategy = self.badger.getStrategy(job.key).address
+        calls = [Call(strategy, [func.sett.keeper], [["strategyKeeper", None]])]
+        if job.action == "tend":
+            calls.append(Call(strategy, [func.strategy.isTendable], [["isTendable", None]]))
+        if job.action == "earn":
+            # Pre safety checks, the static ones come from the metadata
+            assert metadata["want"] == metadata["strategyWant"]
+            calls += [
+                Call(metadata["want"], [func.erc20.balanceOf, sett], [["vaultBalance", None]]),
+                Call(strategy, [func.strategy.balanceOf], [["strategyBalance", None]]),
+                Call(sett, [func.sett.keeper], [["settKeeper", None]]),
+                Call(sett, [func.sett.controller], [["controller", None]]),
+                Call(strategy, [func.sett.controller], [["strategyController", None]]),
+                Call(
+                    metadata["controller"],
+                    ["strategies(address)(address)", metadata["want"]],
+                    [["controllerStrategy", None]],
+                ),
+            ]
+        return calls
+
+    def ready(self, job, data, timestamp):
+        """
+        (ready, reason)
+        """
+        if job.action == "rebase":
+            if rebase_preconditions(data["lastRebase"], data["inRebaseWindow"], timestamp):
+                return (True, None)
+            return (False, "no rebase")
+
+        if job.action == "tend" and not data["isTendable"]:
+            # Setts that are not tendable are skipped for good
+            job.enabled = False
+            return (False, "not tendable")
+
+        if job.action == "earn":
+            metadata = self.system.metadata[job.key]
+            strategy = self.badger.getStrategy(job.key).address
+            if (
+                data["controller"].lower() != metadata["controller"].lower()
+                or data["strategyController"].lower() != data["controller"].lower()
+                or data["controllerStrategy"].lower() != strategy.lower()
+            ):
+                return (False, "controller / strategy mismatch")
+            if not earn_preconditions(job.key, data["vaultBalance"], data["strategyBalance"]):
+                return (False, "below earn threshold")
+        return (True, None)
+
+    # ===== Execution (submitter thread) =====
+
+    def execute(self, job, data):
+        if job.action == "rebase":
+            tx = self.badger.digg.orchestrator.rebase({"from": self.badger.deployer})
+            if rpc.is_active():
+                chain.mine()
+            console.print("[bold yellow]===== 📈 Rebase! 📉=====[/bold yellow]", tx.events)
+            return
+
+        snap = self.system.manager(job.key)
+        strategy = self.badger.getStrategy(job.key)
+        rewardsManager = getattr(self.badger, "badgerRewardsManager", None)
+        viaManager = rewardsManager is not None and data["strategyKeeper"].lower() == rewardsManager.address.lower()
+        overrides = {"gas_limit": gasLimits[job.action]}
+        if job.action in ["harvest", "earn"]:
+            overrides["allow_revert"] = True
+
+        before = snap.snap()
+        if job.action == "harvest":
+            overrides["from"] = accounts.at(self.badger.keeper)
+            if viaManager:
+                rewardsManager.harvest(strategy, overrides)
+            else:
+                strategy.harvest(overrides)
+        elif job.action == "tend":
+            overrides["from"] = accounts.at(self.badger.keeper)
+            if viaManager:
+                rewardsManager.tend(strategy, overrides)
+            else:
+                strategy.tend(overrides)
+        elif job.action == "earn":
+            overrides["from"] = accounts.at(data["settKeeper"])
+            snap.sett.earn(overrides)
+
+        if rpc.is_active():
+            chain.mine()
+        after = snap.snap()
+        snap.printCompare(before, after)
+
+    # ===== Scheduling =====
+
+    async def check(self, rpc, job, block, timestamp):
+        start = time.time()
+        job.stats["checks"] += 1
+        try:
+            multi = AsyncMulticall(job.calls, require_success=True, block_identifier=block, timeout=self.checkTimeout)
+            data = await multi.call_async(rpc)
+            (ready, reason) = self.ready(job, data, timestamp)
+        except Exception as e:
+            console.print("[red]{}: precondition check failed[/red]".format(job.name), e)
+            job.lastResult = "check failed"
+            job.nextRun = time.time() + self.retryInterval
+            return
+        finally:
+            job.stats["lastCheck"] = time.time() - start
+
+        if ready:
+            job.queued = True
+            job.enqueued = time.time()
+            await self.queue.put((job, data))
+        else:
+            job.stats["skips"] += 1
+            job.lastResult = reason
+            job.schedule(time.time(), self.rng)
+
+    async def tick(self, rpc):
+        now = time.time()
+        due = sorted([job for job in self.jobs if job.due(now)], key=lambda job: job.nextRun)
+        if len(due) == 0:
+            return
+
+        # Every due job is checked against the same block
+        block = await rpc.request("eth_getBlockByNumber", ["latest", False])
+        (number, timestamp) = (int(block["number"], 16), int(block["timestamp"], 16))
+        self.metrics.set_gauge("block", number)
+        with self.metrics.stage("checks"):
+            await asyncio.gather(*[self.check(rpc, job, number, timestamp) for job in due])
+        self.metrics.set_gauge("queue_depth", self.queue.qsize())
+
+    async def submit_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            (job, data) = await self.queue.get()
+            start = time.time()
+            job.stats["lastWait"] = start - job.enqueued
+            console.print("\n[bold green]===== {} =====[/bold green]\n".format(job.name))
+            try:
+                with self.metrics.stage(job.action):
+                    await loop.run_in_executor(self.submitter, self.execute, job, data)
+                job.stats["runs"] += 1
+                job.lastResult = "ok"
+            except Exception as e:
+                console.print("[red]{}: failed[/red]".format(job.name), e)
+                job.stats["failures"] += 1
+                job.lastResult = "failed"
+                self.metrics.set_gauge("errors", self.metrics.gauges.get("errors", 0) + 1)
+            finally:
+                job.stats["lastRun"] = time.time() - start
+                job.stats["totalRun"] += job.stats["lastRun"]
+                job.queued = False
+                job.schedule(time.time(), self.rng)
+                self.queue.task_done()
+
+    # ===== Status =====
+
+    def print_schedule(self):
+        now = time.time()
+        table = []
+        for job in sorted(self.jobs, key=lambda job: (not job.enabled, job.nextRun)):
+            stats = job.stats
+            if not job.enabled:
+                nextRun = "disabled"
+            elif job.queued:
+                nextRun = "queued"
+            else:
+                nextRun = format_duration(max(job.nextRun - now, 0))
+            table.append(
+                [
+                    job.name,
+                    format_duration(job.interval),
+                    job.lastResult or "-",
+                    format_duration(stats["lastCheck"]),
+                    format_duration(stats["lastWait"]),
+                    format_duration(stats["lastRun"]),
+                    stats["runs"],
+                    stats["skips"],
+                    stats["failures"],
+                    nextRun,
+                ]
+            )
+        console.print(
+            "[green]=== Keeper schedule ({} jobs, {} queued) ===[/green]".format(len(self.jobs), self.queue.qsize())
+        )
+        print(
+            tabulate(
+                table,
+                headers=["job", "interval", "last", "check", "wait", "run", "runs", "skips", "failed", "next"],
+            )
+        )
+
+    # ===== Run =====
+
+    async def run_async(self):
+        self.queue = asyncio.Queue()
+        # One thread: transactions go out one at a time, and brownie is only used from there once running
+        self.submitter = ThreadPoolExecutor(max_workers=1)
+        now = time.time()
+        for job in self.jobs:
+            job.schedule(now, self.rng, first=True)
+
+        async with AsyncRpc(web3.provider.endpoint_uri, self.concurrency, metrics=self.metrics) as rpc:
+            submitter = asyncio.ensure_future(self.submit_loop())
+            try:
+                while True:
+                    try:
+                        await self.tick(rpc)
+                    except Exception as e:
+                        console.print("[red]Error[/red]", e)
+                    if time.time() >= self.nextStatus:
+                        self.print_schedule()
+                        self.nextStatus = time.time() + self.statusInterval
+                    await asyncio.sleep(self.pollInterval)
+            finally:
+                submitter.cancel()
+                self.submitter.shutdown(wait=True)
+
+    def run(self):
+        if self.server:
+            self.server.start()
+        console.print(
+            "[green]Keeper service: {} jobs ({}) on {}{}[/green]".format(
+                len(self.jobs),
+                ", ".join(self.actions),
+                self.chain,
+                ", metrics on port {}".format(self.server.port) if self.server else "",
+            )
+        )
+        asyncio.run(self.run_async())
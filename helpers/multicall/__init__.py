@@ -4,7 +4,8 @@ https://github.com/banteg/multicall.py
 """
 __version__ = "0.1.1"
 
-from helpers.multicall.signature import Signature
+from helpers.multicall.signature import Signature, get_signature
 from helpers.multicall.call import Call
-from helpers.multicall.multicall import Multicall
+from helpers.multicall.multicall import Multicall, CallError, multicall_at_blocks
 from helpers.multicall.functions import func, as_wei
+from helpers.multicall.async_multicall import AsyncMulticall, run_multicalls
@@ -0,0 +1,185 @@
+import asyncio
+import time
+
+import aiohttp
+from brownie import web3
+from hexbytes import HexBytes
+
+from helpers.multicall.call import Call
+from helpers.multicall.constants import MULTICALL2_ADDRESSES, MULTICALL_ADDRESSES
+from helpers.multicall.multicall import (
+    AGGREGATE,
+    TRY_AGGREGATE,
+    Multicall,
+    chunk_calls,
+    is_execution_error,
+    known_deployment,
+    record_deployment,
+)
+from helpers.rpc_batch import RpcError
+
+"""
+Multicall over raw aiohttp JSON-RPC, so independent aggregates (per-sett snapshots, whale balances, geyser
+schedules) run concurrently instead of one after another
+
+    results = run_multicalls({"native.badger": AsyncMulticall(calls), ...}, concurrency=8)
+
+Chunking, decoding and CallError handling are shared with Multicall. AsyncRpc limits the requests in flight;
+each AsyncMulticall can have its own timeout, and pending aggregates are cancelled when the run is abandoned.
+"""
+
+
+class AsyncRpc:
+    def __init__(self, url=None, concurrency=8, timeout=60, metrics=None):
+        """
+        metrics: optional RpcMetrics, requests bypass the web3 middleware so they are recorded here
+        """
+        self.url = url or web3.provider.endpoint_uri
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.metrics = metrics
+        self.ids = 0
+        self.chainId = None
+
+    async def __aenter__(self):
+        # Created inside the running loop
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *args):
+        await self.session.close()
+
+    async def request(self, method, params):
+        self.ids += 1
+        payload = {"jsonrpc": "2.0", "id": self.ids, "method": method, "params": params}
+        async with self.semaphore:
+            start = time.time()
+            try:
+                async with self.session.post(self.url, json=payload) as response:
+                    response.raise_for_status()
+                    body = await response.json(content_type=None)
+            finally:
+                if self.metrics:
+                    self.metrics.record_rpc(method, time.time() - start)
+        if "error" in body:
+            raise RpcError(method, body["error"])
+        return body["result"]
+
+    async def eth_call(self, target, data, block):
+        result = await self.request("eth_call", [{"to": target, "data": "0x" + bytes(data).hex()}, hex(block)])
+        return HexBytes(result)
+
+    async def block_number(self):
+        return int(await self.request("eth_blockNumber", []), 16)
+
+    async def chain_id(self):
+        if self.chainId is None:
+            self.chainId = int(await self.request("eth_chainId", []), 16)
+        return self.chainId
+
+    async def has_code(self, address, block):
+        return len(HexBytes(await self.request("eth_getCode", [address, hex(block)]))) > 0
+
+
+class AsyncMulticall(Multicall):
+    def __init__(self, calls, timeout=None, **kwargs):
+        super().__init__(calls, **kwargs)
+        self.timeout = timeout
+
+    # ===== Chunk execution =====
+
+    async def aggregate_async(self, rpc, calls):
+        aggregate = Call(self.multicall, AGGREGATE)
+        data = aggregate.signature.encode_data([[[call.target, call.data] for call in calls]])
+        block, outputs = aggregate.decode_output(await rpc.eth_call(aggregate.target, data, self.block))
+        return [(True, output) for output in outputs]
+
+    async def try_aggregate_async(self, rpc, calls):
+        tryAggregate = Call(self.multicall2, TRY_AGGREGATE)
+        data = tryAggregate.signature.encode_data([False, [[call.target, call.data] for call in calls]])
+        return list(tryAggregate.decode_output(await rpc.eth_call(tryAggregate.target, data, self.block)))
+
+    async def bisect_async(self, rpc, calls):
+        try:
+            return await self.aggregate_async(rpc, calls)
+        except Exception as e:
+            if not is_execution_error(e):
+                raise
+            if len(calls) == 1:
+                return [(False, str(e))]
+            middle = len(calls) // 2
+            (left, right) = await asyncio.gather(
+                self.bisect_async(rpc, calls[:middle]), self.bisect_async(rpc, calls[middle:])
+            )
+            return left + right
+
+    async def direct_async(self, rpc, calls):
+        async def call_one(call):
+            try:
+                return (True, await rpc.eth_call(call.target, call.data, self.block))
+            except Exception as e:
+                if not is_execution_error(e):
+                    raise
+                return (False, str(e))
+
+        return list(await asyncio.gather(*[call_one(call) for call in calls]))
+
+    async def run_chunk_async(self, rpc, calls):
+        if self.multicall2:
+            return await self.try_aggregate_async(rpc, calls)
+        if self.multicall:
+            return await self.bisect_async(rpc, calls)
+        return await self.direct_async(rpc, calls)
+
+    # ===== Run =====
+
+    async def resolve(self, rpc):
+        if self.block_identifier is None or self.block_identifier == "latest":
+            self.block = await rpc.block_number()
+        else:
+            self.block = int(self.block_identifier)
+
+        chainId = await rpc.chain_id()
+        deployed = []
+        for address in [MULTICALL2_ADDRESSES.get(chainId), MULTICALL_ADDRESSES.get(chainId)]:
+            known = known_deployment(chainId, address, self.block)
+            if known is None:
+                known = record_deployment(chainId, address, self.block, await rpc.has_code(address, self.block))
+            deployed.append(address if known else None)
+        (self.multicall2, self.multicall) = deployed
+
+    async def run(self, rpc):
+        self.errors = []
+        await self.resolve(rpc)
+        chunks = chunk_calls(self.calls, self.maxGas, self.maxCalldata, self.maxCalls)
+        outputs = await asyncio.gather(*[self.run_chunk_async(rpc, chunk) for chunk in chunks])
+        return self.merge(chunks, outputs)
+
+    async def call_async(self, rpc):
+        if self.timeout:
+            return await asyncio.wait_for(self.run(rpc), self.timeout)
+        return await self.run(rpc)
+
+
+async def gather_multicalls(multicalls, url=None, concurrency=8, return_exceptions=False):
+    """
+    Run a list or dict of AsyncMulticalls concurrently; results come back in the same shape
+    """
+    keys = list(multicalls.keys()) if isinstance(multicalls, dict) else None
+    items = list(multicalls.values()) if keys is not None else list(multicalls)
+
+    async with AsyncRpc(url, concurrency) as rpc:
+        results = await asyncio.gather(
+            *[multicall.call_async(rpc) for multicall in items], return_exceptions=return_exceptions
+        )
+
+    return dict(zip(keys, results)) if keys is not None else results
+
+
+def run_multicalls(multicalls, url=None, concurrency=8, return_exceptions=False):
+    """
+    Sync wrapper for scripts: blocks until every aggregate has finished, failed or timed out
+    """
+    url = url or web3.provider.endpoint_uri
+    return asyncio.run(gather_multicalls(multicalls, url, concurrency, return_exceptions))
@@ -1,23 +1,37 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/call.py
+from functools import lru_cache
+
 from eth_utils import to_checksum_address
 from brownie import web3
-from helpers.multicall import Signature
+from helpers.multicall.signature import get_signature
+
+
+@lru_cache(maxsize=4096)
+def checksum(address):
+    return to_checksum_address(address)
 
 
 class Call:
-    def __init__(self, target, function, returns=None):
-        self.target = to_checksum_address(target)
+    def __init__(self, target, function, returns=None, gas=None):
+        self.target = checksum(target)
         if isinstance(function, list):
             self.function, *self.args = function
         else:
             self.function = function
             self.args = None
-        self.signature = Signature(self.function)
+        self.signature = get_signature(self.function)
         self.returns = returns
+        # Optional gas estimate, used to size multicall chunks
+        self.gas = gas
+        (self._data, self._dataArgs) = (None, None)
 
     @property
     def data(self):
-        return self.signature.encode_data(self.args)
+        # Encoded once, and again only if the args change
+        if self._data is None or self._dataArgs != self.args:
+            self._data = self.signature.encode_data(self.args)
+            self._dataArgs = list(self.args) if self.args is not None else None
+        return self._data
 
     def decode_output(self, output):
         decoded = self.signature.decode_data(output)
@@ -29,8 +43,8 @@ class Call:
         else:
             return decoded if len(decoded) > 1 else decoded[0]
 
-    def __call__(self, args=None):
+    def __call__(self, args=None, block_identifier=None):
         args = args or self.args
         calldata = self.signature.encode_data(args)
-        output = web3.eth.call({"to": self.target, "data": calldata})
+        output = web3.eth.call({"to": self.target, "data": calldata}, block_identifier)
         return self.decode_output(output)
@@ -21,3 +21,19 @@ MULTICALL_ADDRESSES = {
     Network.Forknet: "0xeefBa1e63905eF1D7ACbA5a8513c70307C1cE441",
     Network.BSC: "0xec8c00da6ce45341fb8c31653b598ca0d8251804",
 }
+
+# Multicall2 adds tryAggregate, so a reverting call no longer fails the whole batch
+MULTICALL2_ADDRESSES = {
+    Network.Mainnet: "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696",
+    Network.Kovan: "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696",
+    Network.Rinkeby: "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696",
+    Network.Görli: "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696",
+    Network.Forknet: "0x5BA1e12693Dc8F9c48aAD8770482f4739bEeD696",
+}
+
+# Gas assumed for a call with no estimate, plus 16 per calldata byte
+DEFAULT_CALL_GAS = 100000
+# Stay well below the default eth_call gas cap
+DEFAULT_CHUNK_GAS = 25000000
+DEFAULT_CHUNK_CALLDATA = 128 * 1024
+DEFAULT_CHUNK_CALLS = 500
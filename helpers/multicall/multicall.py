@@ -1,16 +1,177 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/multicall.py
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from brownie import web3
 
 from helpers.multicall import Call
-from helpers.multicall.constants import MULTICALL_ADDRESSES
+from helpers.multicall.constants import (
+    DEFAULT_CALL_GAS,
+    DEFAULT_CHUNK_CALLDATA,
+    DEFAULT_CHUNK_CALLS,
+    DEFAULT_CHUNK_GAS,
+    MULTICALL2_ADDRESSES,
+    MULTICALL_ADDRESSES,
+)
 from helpers.console_utils import console
+from helpers.rpc_batch import RpcError, get_rpc_batch
+
+try:
+    from web3.exceptions import ContractLogicError
+except ImportError:
+    # Older web3 raises ValueError with the node's error object
+    ContractLogicError = None
+
+"""
+Calls are split into chunks by estimated gas, calldata size and count, and chunks are sent in parallel.
+With Multicall2 each chunk uses tryAggregate; with Multicall a reverting chunk is bisected down to the failing
+calls; with neither deployed, calls are sent one by one.
+A failed call returns a CallError for each of its result keys instead of failing the whole batch.
+Only reverts fail a call this way; transport errors (timeouts, rate limits, dropped connections) are raised.
+Results are merged in call order.
+
+Every chunk runs at the same block: a block_identifier of None / "latest" is resolved to a number once, and the
+block used is kept on multi.block. multicall_at_blocks runs one call set across many blocks concurrently.
+"""
+
+
+AGGREGATE = "aggregate((address,bytes)[])(uint256,bytes[])"
+TRY_AGGREGATE = "tryAggregate(bool,(address,bytes)[])((bool,bytes)[])"
+
+# Node error messages for a call that executed and failed, as opposed to one that never ran
+executionErrors = ["revert", "execution", "invalid opcode", "invalid jump", "out of gas", "stack"]
+
+
+def is_execution_error(error):
+    """
+    True if the call reverted (or otherwise failed in the EVM); False for transport / node errors
+    """
+    if ContractLogicError is not None and isinstance(error, ContractLogicError):
+        return True
+    if isinstance(error, RpcError):
+        # Transport failures in a batch carry a string instead of the node's error object
+        details = error.error
+    elif isinstance(error, ValueError) and error.args:
+        details = error.args[0]
+    else:
+        return False
+    if not isinstance(details, dict):
+        return False
+    message = str(details.get("message", "")).lower()
+    return any(word in message for word in executionErrors)
+
+
+# (chainId, address) -> [highest block known without code, lowest block known with code]
+deployments = {}
+
+
+def known_deployment(chainId, address, block):
+    """
+    Contracts are never removed once deployed, so the deployment block is bracketed as blocks are checked.
+    None if the block is not bracketed yet
+    """
+    if address is None:
+        return False
+    bounds = deployments.setdefault((chainId, address), [-1, None])
+    if bounds[1] is not None and block >= bounds[1]:
+        return True
+    if block <= bounds[0]:
+        return False
+    return None
+
+
+def record_deployment(chainId, address, block, hasCode):
+    bounds = deployments.setdefault((chainId, address), [-1, None])
+    if hasCode:
+        bounds[1] = block if bounds[1] is None else min(bounds[1], block)
+    else:
+        bounds[0] = max(bounds[0], block)
+    return hasCode
+
+
+def is_deployed(chainId, address, block):
+    known = known_deployment(chainId, address, block)
+    if known is not None:
+        return known
+    return record_deployment(chainId, address, block, len(web3.eth.getCode(address, block)) > 0)
+
+
+def multicall_deployments(chainId, block):
+    return tuple(
+        address if is_deployed(chainId, address, block) else None
+        for address in [MULTICALL2_ADDRESSES.get(chainId), MULTICALL_ADDRESSES.get(chainId)]
+    )
+
+
+def resolve_block(block_identifier=None):
+    if block_identifier is None or block_identifier == "latest":
+        return web3.eth.blockNumber
+    return int(block_identifier)
+
+
+class CallError:
+    """
+    Sentinel for a call that reverted or could not be decoded
+    """
+
+    def __init__(self, call, reason):
+        self.target = call.target
+        self.function = call.function
+        self.args = call.args
+        self.reason = reason
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "CallError({}.{}{}: {})".format(self.target, self.function, self.args or "", self.reason)
+
+
+def estimate_gas(call):
+    return (call.gas or DEFAULT_CALL_GAS) + 16 * len(call.data)
+
+
+def chunk_calls(calls, maxGas=DEFAULT_CHUNK_GAS, maxCalldata=DEFAULT_CHUNK_CALLDATA, maxCalls=DEFAULT_CHUNK_CALLS):
+    """
+    Split calls (in order) so each chunk stays within the gas, calldata and count limits
+    """
+    chunks = []
+    chunk = []
+    (gas, size) = (0, 0)
+    for call in calls:
+        (callGas, callSize) = (estimate_gas(call), len(call.data))
+        if chunk and (gas + callGas > maxGas or size + callSize > maxCalldata or len(chunk) >= maxCalls):
+            chunks.append(chunk)
+            chunk = []
+            (gas, size) = (0, 0)
+        chunk.append(call)
+        gas += callGas
+        size += callSize
+    if chunk:
+        chunks.append(chunk)
+    return chunks
 
 
 class Multicall:
-    def __init__(self, calls: List[Call]):
+    def __init__(
+        self,
+        calls: List[Call],
+        require_success=False,
+        maxGas=DEFAULT_CHUNK_GAS,
+        maxCalldata=DEFAULT_CHUNK_CALLDATA,
+        maxCalls=DEFAULT_CHUNK_CALLS,
+        workers=4,
+        block_identifier=None,
+    ):
         self.calls = calls
+        self.block_identifier = block_identifier
+        self.block = None
+        self.require_success = require_success
+        self.maxGas = maxGas
+        self.maxCalldata = maxCalldata
+        self.maxCalls = maxCalls
+        self.workers = workers
+        self.errors = []
 
     def printCalls(self):
         for call in self.calls:
@@ -18,14 +179,131 @@ class Multicall:
                 {"target": call.target, "function": call.function, "args": call.args}
             )
 
+    # ===== Chunk execution =====
+
+    def aggregate(self, calls):
+        aggregate = Call(self.multicall, AGGREGATE)
+        block, outputs = aggregate([[[call.target, call.data] for call in calls]], self.block)
+        return [(True, output) for output in outputs]
+
+    def try_aggregate(self, calls):
+        tryAggregate = Call(self.multicall2, TRY_AGGREGATE)
+        return list(tryAggregate([False, [[call.target, call.data] for call in calls]], self.block))
+
+    def bisect(self, calls):
+        """
+        aggregate() reverts if any call does, so split until the failing calls are isolated
+        """
+        try:
+            return self.aggregate(calls)
+        except Exception as e:
+            if not is_execution_error(e):
+                raise
+            if len(calls) == 1:
+                return [(False, str(e))]
+            middle = len(calls) // 2
+            return self.bisect(calls[:middle]) + self.bisect(calls[middle:])
+
+    def direct(self, calls):
+        """
+        No multicall contract on this chain (e.g. a fresh dev chain): one eth_call each, batched over HTTP
+        """
+        batch = get_rpc_batch()
+        if batch:
+            futures = [batch.eth_call({"to": call.target, "data": "0x" + call.data.hex()}, self.block) for call in calls]
+            batch.flush()
+            outputs = []
+            for future in futures:
+                try:
+                    outputs.append((True, future.result()))
+                except Exception as e:
+                    if not is_execution_error(e):
+                        raise
+                    outputs.append((False, str(e)))
+            return outputs
+
+        outputs = []
+        for call in calls:
+            try:
+                outputs.append((True, web3.eth.call({"to": call.target, "data": call.data}, self.block)))
+            except Exception as e:
+                if not is_execution_error(e):
+                    raise
+                outputs.append((False, str(e)))
+        return outputs
+
+    def run_chunk(self, calls):
+        if self.multicall2:
+            return self.try_aggregate(calls)
+        if self.multicall:
+            return self.bisect(calls)
+        return self.direct(calls)
+
+    def decode(self, call, success, output):
+        if success:
+            try:
+                return call.decode_output(output)
+            except Exception as e:
+                reason = "decode failed: {}".format(e)
+        else:
+            reason = output if isinstance(output, str) else "reverted: 0x{}".format(bytes(output).hex())
+
+        error = CallError(call, reason)
+        self.errors.append(error)
+        if self.require_success:
+            raise Exception(repr(error))
+        return {name: error for name, handler in call.returns or []}
+
+    def execute(self):
+        """
+        Decoded output of every call, in call order
+        """
+        self.errors = []
+        self.block = resolve_block(self.block_identifier)
+        (self.multicall2, self.multicall) = multicall_deployments(web3.eth.chainId, self.block)
+        chunks = chunk_calls(self.calls, self.maxGas, self.maxCalldata, self.maxCalls)
+
+        if len(chunks) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as executor:
+                outputs = list(executor.map(self.run_chunk, chunks))
+        else:
+            outputs = [self.run_chunk(chunk) for chunk in chunks]
+
+        return self.decode_all(chunks, outputs)
+
     def __call__(self):
-        aggregate = Call(
-            MULTICALL_ADDRESSES[web3.eth.chainId],
-            "aggregate((address,bytes)[])(uint256,bytes[])",
-        )
-        args = [[[call.target, call.data] for call in self.calls]]
-        block, outputs = aggregate(args)
         result = {}
-        for call, output in zip(self.calls, outputs):
-            result.update(call.decode_output(output))
+        for decoded in self.execute():
+            result.update(decoded)
+        return result
+
+    def decode_all(self, chunks, outputs):
+        decoded = []
+        for chunk, chunkOutputs in zip(chunks, outputs):
+            for call, (success, output) in zip(chunk, chunkOutputs):
+                decoded.append(self.decode(call, success, output))
+
+        if self.errors:
+            console.print("[yellow]Multicall: {} of {} calls failed[/yellow]".format(len(self.errors), len(self.calls)))
+        return decoded
+
+    def merge(self, chunks, outputs):
+        result = {}
+        for decoded in self.decode_all(chunks, outputs):
+            result.update(decoded)
         return result
+
+
+def multicall_at_blocks(calls: List[Call], blocks, workers=8, **kwargs):
+    """
+    Run the same calls at every block (e.g. every cycle end block), several blocks at a time.
+    Returns {block: result}; needs an archive node for old blocks
+    """
+
+    def run(block):
+        return Multicall(calls, block_identifier=block, **kwargs)()
+
+    blocks = list(blocks)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(blocks)))) as executor:
+        results = list(executor.map(run, blocks))
+    return dict(zip(blocks, results))
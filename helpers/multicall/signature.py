@@ -1,6 +1,9 @@
 # Credit: https://github.com/banteg/multicall.py/blob/master/multicall/signature.py
 
-from eth_abi import encode_single, decode_single
+from functools import lru_cache
+
+from eth_abi.decoding import ContextFramesBytesIO
+from eth_abi.registry import registry
 from eth_utils import function_signature_to_4byte_selector
 
 
@@ -25,6 +28,14 @@ def parse_signature(signature):
     return parts
 
 
+@lru_cache(maxsize=1024)
+def get_signature(signature):
+    """
+    Shared Signature per signature string: parsed, hashed and given codecs once
+    """
+    return Signature(signature)
+
+
 class Signature:
     def __init__(self, signature):
         self.signature = signature
@@ -33,13 +44,25 @@ class Signature:
         self.output_types = self.parts[2]
         self.function = "".join(self.parts[:2])
         self.fourbyte = function_signature_to_4byte_selector(self.function)
+        # Resolved from the eth_abi registry up front rather than on every encode / decode
+        self.encoder = registry.get_encoder(self.input_types)
+        self.decoder = registry.get_decoder(self.output_types)
+        # Calldata by args, so rebuilt calls with the same args are not encoded again
+        self.encode_cached = lru_cache(maxsize=4096)(self.encode)
+
+    def encode(self, args):
+        return self.fourbyte + self.encoder(args)
 
     def encode_data(self, args=None):
-        return (
-            self.fourbyte + encode_single(self.input_types, args)
-            if args
-            else self.fourbyte
-        )
+        if not args:
+            return self.fourbyte
+        key = tuple(args)
+        try:
+            hash(key)
+        except TypeError:
+            # list arguments
+            return self.encode(args)
+        return self.encode_cached(key)
 
     def decode_data(self, output):
-        return decode_single(self.output_types, output)
+        return self.decoder(ContextFramesBytesIO(output))
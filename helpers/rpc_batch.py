@@ -0,0 +1,238 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from brownie import web3
+from hexbytes import HexBytes
+from requests.adapters import HTTPAdapter
+
+from helpers.rpc_metrics import record_external
+
+"""
+JSON-RPC batching over a pooled keep-alive HTTP session
+
+Requests are queued and sent as JSON-RPC batch arrays (maxBatch requests per HTTP request, several HTTP
+requests in flight at once) when the batch is flushed:
+
+    with RpcBatch(url) as batch:
+        blocks = [batch.get_block(number) for number in numbers]
+    timestamps = [block.result()["timestamp"] for block in blocks]
+
+result() on a queued request flushes the batch first, so futures can also be used without the context manager.
+"""
+
+# Hex quantity fields returned as ints
+blockQuantities = ["number", "timestamp", "gasLimit", "gasUsed", "difficulty", "size"]
+logQuantities = ["blockNumber", "logIndex", "transactionIndex"]
+
+
+def to_quantity(value):
+    return value if isinstance(value, str) else hex(value)
+
+
+def to_block_param(block):
+    if block is None:
+        return "latest"
+    return to_quantity(block)
+
+
+def format_block(block):
+    if block is None:
+        return None
+    for field in blockQuantities:
+        if field in block and block[field] is not None:
+            block[field] = int(block[field], 16)
+    return block
+
+
+def format_log(log):
+    """
+    Raw log into the shape web3 event.processLog() expects
+    """
+    for field in logQuantities:
+        log[field] = int(log[field], 16)
+    log["topics"] = [HexBytes(topic) for topic in log["topics"]]
+    for field in ["blockHash", "transactionHash"]:
+        log[field] = HexBytes(log[field])
+    return log
+
+
+class RpcError(Exception):
+    def __init__(self, method, error):
+        super().__init__("{}: {}".format(method, error))
+        self.method = method
+        self.error = error
+
+
+class RpcFuture:
+    def __init__(self, batch, method, params, formatter=None):
+        self.batch = batch
+        self.method = method
+        self.params = params
+        self.formatter = formatter
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def set(self, response):
+        try:
+            if "error" in response:
+                self.error = RpcError(self.method, response["error"])
+            else:
+                result = response.get("result")
+                self.value = self.formatter(result) if self.formatter else result
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def result(self):
+        if not self.done.is_set():
+            self.batch.flush()
+            # May have been taken by a flush on another thread
+            self.done.wait()
+        if self.error:
+            raise self.error
+        return self.value
+
+
+class RpcBatch:
+    def __init__(self, url=None, maxBatch=100, workers=4, timeout=60):
+        self.url = url or web3.provider.endpoint_uri
+        self.maxBatch = maxBatch
+        self.workers = workers
+        self.timeout = timeout
+
+        # Keep-alive connections, one per worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.pending = []
+        self.requestCount = 0
+        self.httpCount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def close(self):
+        self.session.close()
+
+    # ===== Requests =====
+
+    def request(self, method, params, formatter=None):
+        future = RpcFuture(self, method, params, formatter)
+        with self.lock:
+            self.pending.append(future)
+        return future
+
+    def eth_call(self, tx, block=None):
+        return self.request("eth_call", [tx, to_block_param(block)], HexBytes)
+
+    def get_block(self, block, full=False):
+        return self.request("eth_getBlockByNumber", [to_block_param(block), full], format_block)
+
+    def get_balance(self, address, block=None):
+        return self.request("eth_getBalance", [address, to_block_param(block)], lambda value: int(value, 16))
+
+    def get_logs(self, filter):
+        filter = dict(filter)
+        for field in ["fromBlock", "toBlock"]:
+            if field in filter:
+                filter[field] = to_block_param(filter[field])
+        return self.request("eth_getLogs", [filter], lambda logs: [format_log(log) for log in logs])
+
+    # ===== Transport =====
+
+    def send(self, futures):
+        payload = []
+        byId = {}
+        for future in futures:
+            requestId = next(self.ids)
+            byId[requestId] = future
+            payload.append({"jsonrpc": "2.0", "id": requestId, "method": future.method, "params": future.params})
+
+        start = time.time()
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            for future in futures:
+                future.set({"error": str(e)})
+            return
+        finally:
+            # Not seen by the web3 middleware; the HTTP round trip is split across the batch
+            share = (time.time() - start) / len(futures)
+            for future in futures:
+                record_external(future.method, share)
+
+        # A node that rejects the whole batch answers with a single error object
+        if isinstance(body, dict):
+            body = [dict(body, id=requestId) for requestId in byId.keys()]
+
+        for item in body:
+            future = byId.pop(item.get("id"), None)
+            if future:
+                future.set(item)
+        for future in byId.values():
+            future.set({"error": "missing from batch response"})
+
+    def flush(self):
+        with self.lock:
+            (pending, self.pending) = (self.pending, [])
+        if len(pending) == 0:
+            return
+
+        chunks = [pending[i : i + self.maxBatch] for i in range(0, len(pending), self.maxBatch)]
+        self.requestCount += len(pending)
+        self.httpCount += len(chunks)
+
+        if len(chunks) == 1 or self.workers == 1:
+            for chunk in chunks:
+                self.send(chunk)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(chunks))) as executor:
+                list(executor.map(self.send, chunks))
+
+    # ===== Helpers =====
+
+    def get_blocks(self, blocks):
+        futures = {block: self.get_block(block) for block in blocks}
+        self.flush()
+        return {block: future.result() for block, future in futures.items()}
+
+    def call_all(self, txs, block=None):
+        futures = [self.eth_call(tx, block) for tx in txs]
+        self.flush()
+        return [future.result() for future in futures]
+
+
+rpcBatches = {}
+
+
+def get_rpc_batch(url=None):
+    """
+    Shared batch (and connection pool) per endpoint, None if the active provider is not HTTP
+    """
+    url = url or getattr(web3.provider, "endpoint_uri", None)
+    if url is None or not str(url).startswith("http"):
+        return None
+    if url not in rpcBatches:
+        rpcBatches[url] = RpcBatch(url)
+    return rpcBatches[url]
+
+
+def get_block_timestamps(blocks):
+    batch = get_rpc_batch()
+    if batch is None:
+        return {block: web3.eth.getBlock(block)["timestamp"] for block in blocks}
+    return {block: data["timestamp"] for block, data in batch.get_blocks(blocks).items()}
@@ -0,0 +1,173 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+"""
+RPC call counting and stage timings for long-running processes
+
+RpcMetrics.install(web3) adds a middleware counting requests by method, one per instance. Requests that bypass
+web3 (RpcBatch) are passed to every installed instance with record_external(). stage() times a block of work
+and records the RPC calls made inside it. MetricsServer serves a snapshot locally:
+- /metrics: Prometheus text format
+- /metrics.json: the same data as JSON
+"""
+
+# Instances installed on a provider
+installed = []
+installedLock = threading.Lock()
+
+
+def record_external(method, duration):
+    """
+    A request sent outside web3, counted by every installed RpcMetrics as if it had gone through the middleware
+    """
+    with installedLock:
+        targets = list(installed)
+    for metrics in targets:
+        metrics.record_rpc(method, duration)
+
+
+class RpcMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rpcCalls = {}
+        self.rpcTime = {}
+        self.stages = {}
+        self.gauges = {}
+        self.started = time.time()
+        self.name = None
+
+    # ===== RPC =====
+
+    def middleware(self, make_request, w3):
+        def count_request(method, params):
+            start = time.time()
+            try:
+                return make_request(method, params)
+            finally:
+                self.record_rpc(method, time.time() - start)
+
+        return count_request
+
+    def install(self, w3, name=None):
+        """
+        Each instance is its own middleware layer, so several can count the same provider
+        """
+        self.name = name or "rpc_metrics_{}".format(id(self))
+        if self.name not in w3.middleware_onion:
+            w3.middleware_onion.add(self.middleware, self.name)
+        with installedLock:
+            if self not in installed:
+                installed.append(self)
+        return self
+
+    def uninstall(self, w3):
+        if self.name in w3.middleware_onion:
+            w3.middleware_onion.remove(self.name)
+        with installedLock:
+            if self in installed:
+                installed.remove(self)
+
+    def record_rpc(self, method, duration):
+        with self.lock:
+            self.rpcCalls[method] = self.rpcCalls.get(method, 0) + 1
+            self.rpcTime[method] = self.rpcTime.get(method, 0) + duration
+
+    def total_rpc_calls(self):
+        with self.lock:
+            return sum(self.rpcCalls.values())
+
+    # ===== Stages =====
+
+    @contextmanager
+    def stage(self, name):
+        start = time.time()
+        startCalls = self.total_rpc_calls()
+        try:
+            yield
+        finally:
+            duration = time.time() - start
+            calls = self.total_rpc_calls() - startCalls
+            with self.lock:
+                stage = self.stages.setdefault(
+                    name, {"count": 0, "totalTime": 0, "lastTime": 0, "rpcCalls": 0, "lastRpcCalls": 0}
+                )
+                stage["count"] += 1
+                stage["totalTime"] += duration
+                stage["lastTime"] = duration
+                stage["rpcCalls"] += calls
+                stage["lastRpcCalls"] = calls
+
+    def set_gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    # ===== Output =====
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "uptime": time.time() - self.started,
+                "rpcCalls": dict(self.rpcCalls),
+                "rpcTime": dict(self.rpcTime),
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "gauges": dict(self.gauges),
+            }
+
+    def prometheus(self, prefix="badger"):
+        data = self.snapshot()
+        lines = ["{}_uptime_seconds {}".format(prefix, data["uptime"])]
+        for method, count in sorted(data["rpcCalls"].items()):
+            lines.append('{}_rpc_calls_total{{method="{}"}} {}'.format(prefix, method, count))
+            lines.append('{}_rpc_seconds_total{{method="{}"}} {}'.format(prefix, method, data["rpcTime"][method]))
+        for name, stage in sorted(data["stages"].items()):
+            for field in ["count", "totalTime", "lastTime", "rpcCalls", "lastRpcCalls"]:
+                lines.append('{}_stage_{}{{stage="{}"}} {}'.format(prefix, field, name, stage[field]))
+        for name, value in sorted(data["gauges"].items()):
+            lines.append("{}_{} {}".format(prefix, name, value))
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """
+    Serves an RpcMetrics snapshot from a background thread
+    """
+
+    def __init__(self, metrics, port=8900, host="127.0.0.1"):
+        self.metrics = metrics
+        metricsRef = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = metricsRef.prometheus().encode()
+                    contentType = "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body = json.dumps(metricsRef.snapshot()).encode()
+                    contentType = "application/json"
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", contentType)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,11 +1,11 @@
 from brownie import (
+    Contract,
     Controller,
     interface,
     chain,
 )
 from tabulate import tabulate
 from rich.console import Console
-from helpers.multicall import Multicall
 from helpers.registry import registry
 from helpers.sett.resolvers import (
     SettCoreResolver,
@@ -20,7 +20,9 @@ from helpers.sett.resolvers import (
     StrategySushiDiggWbtcLpOptimizerResolver,
     StrategyDiggLpMetaFarmResolver,
 )
-from helpers.utils import digg_shares_to_initial_fragments, val
+from helpers.multicall import Call
+from helpers.sett.snapshot_plan import DIGG_SHARES, RAW, SnapSchema, SnapshotPlanCache, diff_snaps, key_format
+from helpers.utils import val
 from scripts.systems.badger_system import BadgerSystem
 
 console = Console()
@@ -56,56 +58,106 @@ def is_curve_gauge_variant(name):
     )
 
 
+def read_sett_metadata(badger: BadgerSystem, key):
+    sett = badger.getSett(key)
+    strategy = badger.getStrategy(key)
+    controller = Controller.at(sett.controller())
+    return {
+        "controller": controller.address,
+        "strategy": strategy.address,
+        "want": sett.token(),
+        "strategyWant": strategy.want(),
+        "name": strategy.getName(),
+        "governance": strategy.governance(),
+        "governanceRewards": controller.rewards(),
+        "strategist": strategy.strategist(),
+    }
+
+
 class Snap:
-    def __init__(self, data, block, entityKeys):
-        self.data = data
+    def __init__(self, data, block, entityKeys, schema=None):
         self.block = block
         self.entityKeys = entityKeys
 
+        # Values in schema order; keys outside the schema (e.g. from set()) are kept aside
+        self.schema = schema or SnapSchema(data.keys())
+        self.values = [data.get(key) for key in self.schema.keys]
+        self.extra = {key: value for key, value in data.items() if key not in self.schema.index}
+
+    @property
+    def data(self):
+        data = dict(zip(self.schema.keys, self.values))
+        data.update(self.extra)
+        return data
+
     # ===== Getters =====
 
+    def lookup(self, key):
+        index = self.schema.index.get(key)
+        if index is not None:
+            return self.values[index]
+        return self.extra[key]
+
     def balances(self, tokenKey, accountKey):
-        return self.data["balances." + tokenKey + "." + accountKey]
+        return self.lookup("balances." + tokenKey + "." + accountKey)
 
     def shares(self, tokenKey, accountKey):
-        return self.data["shares." + tokenKey + "." + accountKey]
+        return self.lookup("shares." + tokenKey + "." + accountKey)
 
     def get(self, key):
-        if key not in self.data.keys():
+        if key not in self.schema.index and key not in self.extra:
             raise Exception("Key {} not found in snap data".format(key))
-        return self.data[key]
+        return self.lookup(key)
 
     # ===== Setters =====
 
     def set(self, key, value):
-        self.data[key] = value
+        index = self.schema.index.get(key)
+        if index is not None:
+            self.values[index] = value
+        else:
+            self.extra[key] = value
 
 
 class SnapshotManager:
-    def __init__(self, badger: BadgerSystem, key):
+    def __init__(self, badger: BadgerSystem, key, metadata=None):
         self.badger = badger
         self.key = key
         self.sett = badger.getSett(key)
         self.strategy = badger.getStrategy(key)
-        self.controller = Controller.at(self.sett.controller())
-        self.want = interface.IERC20(self.sett.token())
-        self.resolver = self.init_resolver(self.strategy.getName())
+
+        # Addresses and names read from chain; SystemSnapshotManager passes them in for every sett at once
+        if metadata is None:
+            metadata = read_sett_metadata(badger, key)
+        self.metadata = metadata
+
+        self.controller = Contract.from_abi("Controller", metadata["controller"], Controller.abi)
+        self.want = interface.IERC20(metadata["want"])
+        self.resolver = self.init_resolver(metadata["name"])
         self.snaps = {}
         self.settSnaps = {}
         self.entities = {}
+        self.plans = SnapshotPlanCache(self.add_snap_calls)
+        # Optional snapshot_store.SnapshotStore, every recorded snap is appended to it
+        self.store = None
+        # Optional SimulationMetrics, snaps are timed as a phase
+        self.metrics = None
 
-        assert self.want == self.strategy.want()
+        assert self.want == metadata["strategyWant"]
 
         # Common entities for all strategies
         self.addEntity("sett", self.sett.address)
         self.addEntity("strategy", self.strategy.address)
         self.addEntity("controller", self.controller.address)
-        self.addEntity("governance", self.strategy.governance())
-        self.addEntity("governanceRewards", self.controller.rewards())
-        self.addEntity("strategist", self.strategy.strategist())
-
-        destinations = self.resolver.get_strategy_destinations()
-        for key, dest in destinations.items():
+        self.addEntity("governance", metadata["governance"])
+        self.addEntity("governanceRewards", metadata["governanceRewards"])
+        self.addEntity("strategist", metadata["strategist"])
+
+        if "destinations" not in metadata:
+            metadata["destinations"] = {
+                key: str(dest) for key, dest in self.resolver.get_strategy_destinations().items()
+            }
+        for key, dest in metadata["destinations"].items():
             self.addEntity(key, dest)
 
     def add_snap_calls(self, entities):
@@ -116,31 +168,44 @@ class SnapshotManager:
         calls = self.resolver.add_strategy_snap(calls, entities=entities)
         return calls
 
-    def snap(self, trackedUsers=None):
-        print("snap")
-        snapBlock = chain.height
-        entities = self.entities
-
+    def snap_plan(self, trackedUsers=None):
+        # Tracked users only apply to this snap, they are not added to the manager's entities
+        entities = dict(self.entities)
         if trackedUsers:
-            for key, user in trackedUsers.items():
-                entities[key] = user
-
-        calls = self.add_snap_calls(entities)
+            entities.update(trackedUsers)
+        return self.plans.get(entities)
 
-        multi = Multicall(calls)
-        # multi.printCalls()
+    def snap_calls(self, trackedUsers=None):
+        return self.snap_plan(trackedUsers).calls
 
-        data = multi()
+    def record_snap(self, data, snapBlock, entityKeys=None, schema=None):
         self.snaps[snapBlock] = Snap(
             data,
             snapBlock,
-            [x[0] for x in entities.items()],
+            entityKeys or [x[0] for x in self.entities.items()],
+            schema,
         )
-
+        if self.store:
+            self.store.record(self.key, self.snaps[snapBlock])
         return self.snaps[snapBlock]
 
+    def snap(self, trackedUsers=None):
+        if self.metrics:
+            with self.metrics.phase("snap"):
+                return self._snap(trackedUsers)
+        return self._snap(trackedUsers)
+
+    def _snap(self, trackedUsers):
+        plan = self.snap_plan(trackedUsers)
+        (data, snapBlock) = plan.execute()
+        return self.record_snap(data, snapBlock, plan.entityKeys, plan.schema)
+
+    def printPlans(self):
+        self.plans.print_report(self.key)
+
     def addEntity(self, key, entity):
         self.entities[key] = entity
+        self.plans.invalidate()
 
     def init_sett_resolver(self, version):
         print("init_sett_resolver", version)
@@ -265,34 +330,31 @@ class SnapshotManager:
                 before, after, {"user": user, "amount": userBalance}, tx
             )
 
+    def digg_initial_shares_per_fragment(self, block=None):
+        """
+        Read once: the digg contract's constant used to scale shares to initial fragments
+        """
+        if not hasattr(self, "initialSharesPerFragment"):
+            if self.metadata["name"] == "StrategyDiggRewards":
+                digg = self.metadata["strategyWant"]
+            else:
+                digg = self.strategy.digg()
+            self.initialSharesPerFragment = Call(digg, "_initialSharesPerFragment()(uint256)")(
+                block_identifier=block
+            )
+        return self.initialSharesPerFragment
+
+    def format_value(self, valueFormat, value, block=None):
+        if type(value) is not int or valueFormat == RAW:
+            return value
+        if valueFormat == DIGG_SHARES:
+            # UFragments.sharesToScaledShares, for negative diffs as well
+            scaled = abs(value) // self.digg_initial_shares_per_fragment(block) * 10 ** 9
+            return val(scaled if value >= 0 else -scaled)
+        return val(value, decimals=valueFormat[1])
+
     def format(self, key, value):
-        if type(value) is int:
-            if "stakingRewards.staked" or "stakingRewards.earned" in key:
-                return val(value)
-            # Ether-scaled balances
-            # TODO: Handle based on token decimals
-            if ".digg" in key and "shares" not in key:
-                return val(value, decimals=9)
-            if (
-                "balance" in key
-                or key == "sett.available"
-                or key == "sett.pricePerFullShare"
-                or key == "sett.totalSupply"
-            ):
-                return val(value)
-            # DIGG Shares
-            if "shares" in key or "diggFaucet.earned" in key:
-                # We expect to have a known digg instance in the strategy in this case
-                name = self.strategy.getName()
-                digg = ""
-
-                if name == "StrategyDiggRewards":
-                    digg = interface.IDigg(self.strategy.want())
-                else:
-                    digg = interface.IDigg(self.strategy.digg())
-
-                return digg_shares_to_initial_fragments(digg, value)
-        return value
+        return self.format_value(key_format(key), value)
 
     def diff(self, a, b):
         if type(a) is int and type(b) is int:
@@ -309,21 +371,16 @@ class SnapshotManager:
             )
         )
 
-        for key, item in before.data.items():
-
-            a = item
-            b = after.get(key)
-
-            # Don't add items that don't change
-            if a != b:
-                table.append(
-                    [
-                        key,
-                        self.format(key, a),
-                        self.format(key, b),
-                        self.format(key, self.diff(a, b)),
-                    ]
-                )
+        # Don't add items that don't change
+        for key, valueFormat, a, b in diff_snaps(before, after):
+            table.append(
+                [
+                    key,
+                    self.format_value(valueFormat, a, before.block),
+                    self.format_value(valueFormat, b, after.block),
+                    self.format_value(valueFormat, self.diff(a, b), after.block),
+                ]
+            )
 
         print(
             tabulate(
@@ -364,10 +421,12 @@ class SnapshotManager:
         table = []
         console.print("[green]=== Status Report: {} Sett ===[green]".format(self.key))
 
-        for key, item in snap.data.items():
+        for key, valueFormat, item in zip(snap.schema.keys, snap.schema.formats, snap.values):
             # Don't display 0 balances:
             if "balances" in key and item == 0:
                 continue
+            table.append([key, self.format_value(valueFormat, item, snap.block)])
+        for key, item in snap.extra.items():
             table.append([key, self.format(key, item)])
 
         table.append(["---------------", "--------------------"])
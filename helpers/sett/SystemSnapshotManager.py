@@ -0,0 +1,170 @@
+import json
+import os
+import time
+
+from rich.console import Console
+
+from helpers.multicall import Call, Multicall, func
+from helpers.sett.SnapshotManager import SnapshotManager
+from scripts.systems.badger_system import BadgerSystem
+
+console = Console()
+
+"""
+Snapshots of every sett in the system at once
+
+Sett metadata (controller, want, strategy name, permissioned accounts) is read for all setts in one multicall,
+plus one for the controllers' rewards addresses, and cached; resolver destinations are added to the cache
+as managers are built. With a cacheFile the metadata survives between runs; cached entries are keyed to the
+strategy they were read from and dropped once the controller points the want at a different strategy.
+
+snap() runs every sett's snapshot plan as one chunked multicall at a single block and returns a Snap per sett.
+"""
+
+settMetadataCalls = [
+    ("sett", "controller", func.sett.controller),
+    ("sett", "want", "token()(address)"),
+    ("strategy", "strategyWant", "want()(address)"),
+    ("strategy", "name", func.strategy.getName),
+    ("strategy", "governance", func.sett.governance),
+    ("strategy", "strategist", func.sett.strategist),
+]
+
+
+class SystemSnapshotManager:
+    def __init__(self, badger: BadgerSystem, keys=None, skip=None, cacheFile=None, store=None):
+        self.badger = badger
+        # Optional snapshot_store.SnapshotStore shared by every manager
+        self.store = store
+        self.keys = [
+            key for key in (keys or list(badger.sett_system.vaults.keys())) if key not in (skip or [])
+        ]
+        self.cacheFile = cacheFile
+        self.metadata = self.load_cache()
+        self.revalidated = False
+        self.managers = {}
+        self.snaps = {}
+
+    # ===== Metadata =====
+
+    def load_cache(self):
+        if self.cacheFile and os.path.exists(self.cacheFile):
+            with open(self.cacheFile) as f:
+                return json.load(f)
+        return {}
+
+    def save_cache(self):
+        if self.cacheFile:
+            with open(self.cacheFile, "w") as f:
+                json.dump(self.metadata, f, indent=4)
+
+    def revalidate(self):
+        """
+        Drop cached metadata whose strategy is no longer the sett's, checked against controller.strategies(want)
+        """
+        cached = [key for key in self.keys if key in self.metadata]
+        if len(cached) == 0:
+            return
+        calls = [
+            Call(
+                self.metadata[key]["controller"],
+                ["strategies(address)(address)", self.metadata[key]["want"]],
+                [[key, None]],
+            )
+            for key in cached
+        ]
+        current = Multicall(calls, require_success=True)()
+
+        for key in cached:
+            strategy = self.badger.getStrategy(key).address
+            cachedStrategy = self.metadata[key].get("strategy", "")
+            if cachedStrategy.lower() != strategy.lower() or current[key].lower() != strategy.lower():
+                console.print("[yellow]Strategy for {} changed, re-reading its metadata[/yellow]".format(key))
+                del self.metadata[key]
+
+    def discover(self):
+        """
+        Read metadata for every sett not yet cached, in two multicalls
+        """
+        if not self.revalidated:
+            self.revalidate()
+            self.revalidated = True
+
+        missing = [key for key in self.keys if key not in self.metadata]
+        if len(missing) == 0:
+            return self.metadata
+
+        calls = []
+        for key in missing:
+            contracts = {"sett": self.badger.getSett(key), "strategy": self.badger.getStrategy(key)}
+            for contract, field, signature in settMetadataCalls:
+                calls.append(Call(contracts[contract].address, [signature], [[(key, field), None]]))
+        data = Multicall(calls, require_success=True)()
+
+        controllers = sorted(set(data[(key, "controller")] for key in missing))
+        rewards = Multicall(
+            [Call(controller, ["rewards()(address)"], [[controller, None]]) for controller in controllers],
+            require_success=True,
+        )()
+
+        for key in missing:
+            metadata = {field: data[(key, field)] for contract, field, signature in settMetadataCalls}
+            metadata["governanceRewards"] = rewards[metadata["controller"]]
+            metadata["strategy"] = self.badger.getStrategy(key).address
+            self.metadata[key] = metadata
+
+        self.save_cache()
+        return self.metadata
+
+    def manager(self, key):
+        if key not in self.managers:
+            self.discover()
+            self.managers[key] = SnapshotManager(self.badger, key, self.metadata[key])
+            self.managers[key].store = self.store
+            # Resolver destinations are looked up once, then cached with the rest
+            self.save_cache()
+        return self.managers[key]
+
+    def init_managers(self):
+        self.discover()
+        for key in self.keys:
+            self.manager(key)
+        return self.managers
+
+    # ===== Snapshots =====
+
+    def snap(self, trackedUsers=None, block_identifier=None):
+        """
+        One Snap per sett, all read at the same block
+        """
+        self.init_managers()
+        plans = {key: self.managers[key].snap_plan(trackedUsers) for key in self.keys}
+
+        calls = []
+        for key in self.keys:
+            calls.extend(plans[key].calls)
+
+        start = time.time()
+        multi = Multicall(calls, block_identifier=block_identifier)
+        decoded = multi.execute()
+        console.print(
+            "[grey]System snap: {} setts, {} calls at block {} in {:.2f}s[/grey]".format(
+                len(self.keys), len(calls), multi.block, time.time() - start
+            )
+        )
+
+        # Results come back in call order, each plan's calls are contiguous
+        snaps = {}
+        offset = 0
+        for key in self.keys:
+            plan = plans[key]
+            data = {}
+            for result in decoded[offset : offset + len(plan.calls)]:
+                data.update(result)
+            offset += len(plan.calls)
+            snaps[key] = self.managers[key].record_snap(data, multi.block, plan.entityKeys, plan.schema)
+
+        self.snaps[multi.block] = snaps
+        if self.store:
+            self.store.flush()
+        return snaps
@@ -0,0 +1,268 @@
+import hashlib
+import json
+import time
+
+from brownie import history
+from rich.console import Console
+
+from .actors.ChainActor import MineAction, SleepAction
+from .actors.DiggActor import RebaseAction
+from .actors.SettKeeperActor import SettEarnAction
+from .actors.StrategyKeeperActor import SettHarvestAction, SettTendAction
+from .actors.UserActor import DepositAction, DepositAndWithdrawAction, WithdrawAction
+from .ProvisionCache import ProvisionCache
+from .SimulationManager import SimulationManager
+
+console = Console()
+
+"""
+Recording and replay of simulation action traces
+
+A trace is a JSONL file: a header line (sett, seeds, provisioned users, starting snap) then one line per
+action with its type, params, tx hashes, duration, error and the snap after it. An action's pre snap is the
+previous line's snap. Snap values are stored in schema order, and the schema keys only when they change.
+
+    simulation.run(ActionTrace("traces/native.badger-42.jsonl"))
+
+TraceReplayer rebuilds the actions from their params (including the values actions drew at random, e.g. sleep
+durations), so a trace replays without its seed's random stream. It keeps a chain checkpoint every
+checkpointEvery actions and moves to any prefix from the nearest one at or before it, which bisect() uses to
+find the smallest failing prefix.
+"""
+
+ACTIONS = {
+    action.__name__: action
+    for action in [
+        DepositAction,
+        DepositAndWithdrawAction,
+        WithdrawAction,
+        SettEarnAction,
+        SettHarvestAction,
+        SettTendAction,
+        MineAction,
+        SleepAction,
+        RebaseAction,
+    ]
+}
+
+
+class ActionTrace:
+    def __init__(self, path, snaps=True):
+        """
+        snaps: record the snap after every action (one multicall per action)
+        """
+        self.path = path
+        self.snaps = snaps
+        self.schema = None
+        self.file = None
+        self.index = 0
+
+    def write(self, line):
+        self.file.write(json.dumps(line, default=str) + "\n")
+        self.file.flush()
+
+    def snap_line(self, simulation, line):
+        snap = simulation.snap.snap()
+        line["block"] = snap.block
+        line["snap"] = snap.values
+        if snap.schema is not self.schema:
+            line["schema"] = snap.schema.keys
+            self.schema = snap.schema
+
+    def start(self, simulation):
+        self.file = open(self.path, "w")
+        self.index = 0
+        header = {
+            "settId": simulation.settId,
+            "seed": simulation.seed,
+            "provisionSeed": simulation.provisionSeed,
+            "users": [user.address for user in simulation.users],
+            "numActions": len(simulation.actions),
+        }
+        if self.snaps:
+            self.snap_line(simulation, header)
+        self.write(header)
+
+    def run(self, simulation, action):
+        historyStart = len(history)
+        line = {"i": self.index, "type": type(action).__name__}
+        start = time.time()
+        try:
+            action.run()
+        except Exception as e:
+            line["error"] = "{}: {}".format(type(e).__name__, e)
+            raise
+        finally:
+            line["duration"] = round(time.time() - start, 3)
+            line["params"] = action.params()
+            line["txs"] = [tx.txid for tx in history[historyStart:]]
+            if self.snaps:
+                try:
+                    self.snap_line(simulation, line)
+                except Exception as e:
+                    line["snapError"] = str(e)
+            self.write(line)
+            self.index += 1
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def load_trace(path):
+    """
+    (header, entries), each snap expanded to a {key: value} dict
+    """
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+
+    schema = None
+    for line in lines:
+        if "schema" in line:
+            schema = line.pop("schema")
+        if "snap" in line:
+            line["snap"] = dict(zip(schema, line["snap"]))
+    return (lines[0], lines[1:])
+
+
+def trace_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def build_actions(simulation, entries):
+    return [ACTIONS[entry["type"]].fromParams(simulation, entry["params"]) for entry in entries]
+
+
+class TraceReplayer:
+    def __init__(self, badger, snap, path, checkpointEvery=10, cache=None):
+        (self.header, self.entries) = load_trace(path)
+        self.badger = badger
+        self.snap = snap
+        self.checkpointEvery = checkpointEvery
+        self.cache = cache or ProvisionCache(persist=False)
+        self.traceHash = trace_hash(path)
+        self.simulation = None
+        # Number of actions applied to the current chain state
+        self.position = 0
+
+    def checkpoint_key(self, position):
+        return self.cache.key(self.header["settId"], {"trace": self.traceHash, "position": position})
+
+    def setup(self):
+        header = self.header
+        self.simulation = SimulationManager(
+            self.badger, self.snap, header["settId"], header["seed"], provisionSeed=header["provisionSeed"]
+        )
+        self.simulation.provision(self.cache)
+        users = [user.address for user in self.simulation.users]
+        if users != header["users"]:
+            raise Exception("provisioned users differ from the trace: {} != {}".format(users, header["users"]))
+
+        self.simulation.load(build_actions(self.simulation, self.entries))
+        self.position = 0
+        self.cache.save(self.checkpoint_key(0))
+        return self.simulation
+
+    def nearest_checkpoint(self, position):
+        checkpoint = position - position % self.checkpointEvery
+        while self.checkpoint_key(checkpoint) not in self.cache.entries:
+            checkpoint -= self.checkpointEvery
+        return checkpoint
+
+    def move_to(self, position, verify=False):
+        """
+        Apply the first `position` actions, from the nearest checkpoint if going back.
+        Returns (index, error) of the first failing action, or None.
+        """
+        if self.simulation is None:
+            self.setup()
+        if position < self.position:
+            checkpoint = self.nearest_checkpoint(position)
+            self.cache.restore(self.checkpoint_key(checkpoint))
+            self.position = checkpoint
+
+        while self.position < position:
+            index = self.position
+            try:
+                self.simulation.runAction(self.simulation.actions[index])
+            except Exception as e:
+                self.position = index + 1
+                return (index, e)
+            self.position = index + 1
+
+            if verify:
+                self.verify(index)
+            if self.position % self.checkpointEvery == 0:
+                key = self.checkpoint_key(self.position)
+                if key not in self.cache.entries:
+                    self.cache.save(key)
+        return None
+
+    def verify(self, index):
+        recorded = self.entries[index].get("snap")
+        if recorded is None:
+            return
+        replayed = self.snap.snap().data
+        changed = [key for key, value in recorded.items() if key in replayed and replayed[key] != value]
+        if changed:
+            console.print(
+                "[yellow]Action {} ({}) diverges from the trace: {}[/yellow]".format(
+                    index, self.entries[index]["type"], ", ".join(changed[:10])
+                )
+            )
+
+    def replay(self, numActions=None, verify=True):
+        numActions = len(self.entries) if numActions is None else numActions
+        start = time.time()
+        failure = self.move_to(numActions, verify)
+        console.print(
+            "[green]Replayed {} of {} actions in {:.1f}s[/green]".format(
+                self.position, len(self.entries), time.time() - start
+            )
+        )
+        if failure:
+            self.print_failure(*failure)
+        return failure
+
+    def fails(self, position, check):
+        """
+        (failing, position of the first raising action or None)
+        """
+        failure = self.move_to(position)
+        if failure:
+            return (True, failure[0] + 1)
+        return (check is not None and not check(self.simulation), None)
+
+    def bisect(self, check=None):
+        """
+        Smallest prefix length that fails: an action raises, or check(simulation) is False after it
+        """
+        start = time.time()
+        (failing, raised) = self.fails(len(self.entries), check)
+        if not failing:
+            console.print("[green]Trace does not fail[/green]")
+            return None
+
+        (low, high) = (1, raised or len(self.entries))
+        while low < high:
+            middle = (low + high) // 2
+            (failing, raised) = self.fails(middle, check)
+            if failing:
+                high = raised or middle
+            else:
+                low = middle + 1
+
+        entry = self.entries[low - 1]
+        console.print(
+            "[red]Smallest failing prefix: {} actions, last {} {} ({:.1f}s)[/red]".format(
+                low, entry["type"], entry["params"], time.time() - start
+            )
+        )
+        return low
+
+    def print_failure(self, index, error):
+        entry = self.entries[index]
+        console.print("[red]Action {} ({} {}) failed: {}[/red]".format(index, entry["type"], entry["params"], error))
+        if entry.get("error"):
+            console.print("Recorded error: {}".format(entry["error"]))
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+
+from brownie import web3
+from rich.console import Console
+
+console = Console()
+
+"""
+Cache of provisioned chain states, keyed by (sett id, config hash)
+
+Within a session, states are dev node snapshots (evm_snapshot / evm_revert): restore() reverts to the state
+and immediately snapshots it again, since a revert consumes the snapshot. Reverting also discards every
+snapshot taken after it, so entries saved later than the restored one are dropped.
+
+Across sessions, if the node can dump its state (anvil_dumpState / anvil_loadState), save() also writes the
+dump with its metadata to stateDir, and restore() loads it into a fresh node. Keys include whatever makes a
+state valid (e.g. deployed sett address), so a dump from a different deploy is never loaded.
+
+metadata is the Python side of the state (e.g. provisioned user addresses), returned by restore().
+"""
+
+DEFAULT_STATE_DIR = "data/provisioned"
+
+
+def config_hash(config):
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ProvisionCache:
+    def __init__(self, stateDir=DEFAULT_STATE_DIR, persist=True):
+        self.stateDir = stateDir
+        self.persist = persist
+        # key -> {"snapshot": id, "metadata": ...}, in the order saved
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.canDump = None
+
+    def key(self, settId, config):
+        return "{}-{}".format(settId, config_hash(config))
+
+    def path(self, key):
+        return os.path.join(self.stateDir, "{}.json".format(key))
+
+    # ===== Node =====
+
+    def request(self, method, params=None):
+        response = web3.provider.make_request(method, params or [])
+        if "error" in response:
+            raise ValueError("{}: {}".format(method, response["error"]))
+        return response["result"]
+
+    def snapshot(self):
+        return int(self.request("evm_snapshot"), 16)
+
+    def revert(self, snapshotId):
+        if not self.request("evm_revert", [hex(snapshotId)]):
+            raise ValueError("invalid snapshot {}".format(snapshotId))
+
+    def dump_state(self):
+        if self.canDump is False:
+            return None
+        try:
+            state = self.request("anvil_dumpState")
+            self.canDump = True
+            return state
+        except ValueError:
+            # ganache / hardhat
+            self.canDump = False
+            return None
+
+    # ===== Cache =====
+
+    def save(self, key, metadata=None):
+        self.entries[key] = {"snapshot": self.snapshot(), "metadata": metadata}
+
+        if self.persist:
+            state = self.dump_state()
+            if state is not None:
+                os.makedirs(self.stateDir, exist_ok=True)
+                with open(self.path(key), "w") as f:
+                    json.dump({"metadata": metadata, "state": state}, f)
+
+    def restore(self, key):
+        """
+        Metadata of the restored state, None on a miss
+        """
+        if key in self.entries:
+            entry = self.entries[key]
+            self.revert(entry["snapshot"])
+            self.entries = {
+                other: saved for other, saved in self.entries.items() if saved["snapshot"] < entry["snapshot"]
+            }
+            self.entries[key] = {"snapshot": self.snapshot(), "metadata": entry["metadata"]}
+            self.hits += 1
+            return entry["metadata"]
+
+        if self.persist and os.path.exists(self.path(key)):
+            with open(self.path(key)) as f:
+                saved = json.load(f)
+            try:
+                self.request("anvil_loadState", [saved["state"]])
+            except ValueError as e:
+                console.print("[yellow]Could not load provisioned state {}: {}[/yellow]".format(key, e))
+            else:
+                self.entries[key] = {"snapshot": self.snapshot(), "metadata": saved["metadata"]}
+                self.hits += 1
+                return saved["metadata"]
+
+        self.misses += 1
+        return None
+
+    def clear(self):
+        self.entries = {}
@@ -0,0 +1,301 @@
+import itertools
+import random
+import time
+from collections import deque
+
+from rich.console import Console
+
+from .ShadowSett import InvariantViolation, ModelRevert, ShadowSett
+
+console = Console()
+
+"""
+High-volume fuzzing of the Sett shadow model, with on-chain cross-checks
+
+Actions are drawn the way SimulationManager.randomize() draws them (a random actor per action, users toggling
+deposit / withdraw, keepers earning and harvesting, the chain sleeping up to 10 days), but against ShadowSett,
+so a run covers millions of actions in minutes. Each failure keeps its seed, action index and the window of
+actions before it.
+
+cross_check() replays such a window on chain through SimulationManager and compares the model's predicted
+shares and balances with the contracts after every action; windows found by the fuzzer can be confirmed this
+way, and sampled windows keep the model honest.
+"""
+
+DAY = 24 * 3600
+# Sett / strategy totals compared after every action, along with each user's want and shares
+comparedFields = ["totalSupply", "settWant", "strategyBalance"]
+
+
+class FuzzFailure:
+    def __init__(self, seed, index, error, window):
+        self.seed = seed
+        self.index = index
+        self.error = error
+        # [(type, params)] leading up to and including the failing action
+        self.window = window
+
+    def __repr__(self):
+        return "FuzzFailure(seed={}, index={}, error={})".format(self.seed, self.index, self.error)
+
+
+class ShadowFuzzer:
+    def __init__(
+        self,
+        profile,
+        numUsers=10,
+        initialWant=10 ** 24,
+        windowSize=50,
+        checkEvery=100,
+        allowReverts=False,
+    ):
+        """
+        checkEvery: run the O(users) invariants every this many actions (the cheap ones run every action)
+        allowReverts: count ModelRevert as a skipped action instead of a failure
+        """
+        self.profile = profile
+        self.numUsers = numUsers
+        self.initialWant = initialWant
+        self.windowSize = windowSize
+        self.checkEvery = checkEvery
+        self.allowReverts = allowReverts
+        self.failures = []
+        self.stats = {"runs": 0, "actions": 0, "reverts": 0, "time": 0}
+
+    def new_model(self, rng):
+        model = ShadowSett(self.profile)
+        # Wide spread of balances, like BaseProvisioner distributing a random share of what remains
+        remaining = self.initialWant
+        for i in range(self.numUsers):
+            amount = int(rng.random() * remaining)
+            remaining -= amount
+            model.add_user(i, amount)
+        return model
+
+    def actions(self, rng):
+        """
+        Endless (type, params) actions, drawn like SimulationManager.randomize()
+        """
+        draw = rng.random
+        keeperActions = ["SettHarvestAction", "SettTendAction"] if self.profile.tendable else ["SettHarvestAction"]
+        deposited = [False] * self.numUsers
+        # Sett keeper, strategy keeper, chain, then users
+        numActors = 3 + self.numUsers
+        while True:
+            actor = int(draw() * numActors)
+            if actor == 0:
+                yield ("SettEarnAction", {})
+            elif actor == 1:
+                yield (keeperActions[int(draw() * len(keeperActions))], {})
+            elif actor == 2:
+                if draw() < 0.5:
+                    yield ("MineAction", {})
+                else:
+                    yield ("SleepAction", {"duration": int(draw() * rng.randrange(10) * DAY)})
+            else:
+                user = actor - 3
+                if draw() > 0.5:
+                    yield ("DepositAndWithdrawAction", {"user": user})
+                elif deposited[user]:
+                    deposited[user] = False
+                    yield ("WithdrawAction", {"user": user})
+                else:
+                    deposited[user] = True
+                    yield ("DepositAction", {"user": user})
+
+    def sample_window(self, seed, length):
+        return list(itertools.islice(self.actions(random.Random(seed)), length))
+
+    def run(self, seed, numActions):
+        """
+        One seed; returns the FuzzFailure, or None
+        """
+        rng = random.Random(seed)
+        model = self.new_model(rng)
+        apply = model.apply
+        check = model.check
+        window = deque(maxlen=self.windowSize)
+        checkEvery = self.checkEvery
+
+        start = time.time()
+        failure = None
+        index = -1
+        for index, action in zip(range(numActions), self.actions(rng)):
+            window.append(action)
+            try:
+                apply(*action)
+                check(index % checkEvery == 0)
+            except ModelRevert as e:
+                if not self.allowReverts:
+                    failure = FuzzFailure(seed, index, e, list(window))
+                    break
+                self.stats["reverts"] += 1
+            except InvariantViolation as e:
+                failure = FuzzFailure(seed, index, e, list(window))
+                break
+        else:
+            try:
+                check(True)
+            except InvariantViolation as e:
+                failure = FuzzFailure(seed, index, e, list(window))
+
+        self.stats["runs"] += 1
+        self.stats["actions"] += index + 1
+        self.stats["time"] += time.time() - start
+        if failure:
+            self.failures.append(failure)
+        return failure
+
+    def fuzz(self, seeds, numActions):
+        for seed in seeds:
+            self.run(seed, numActions)
+        self.print_report()
+        return self.failures
+
+    def print_report(self):
+        stats = self.stats
+        console.print(
+            "[green]Shadow fuzz: {} runs, {} actions in {:.1f}s ({:.0f} actions/s), {} reverts, {} failures[/green]".format(
+                stats["runs"],
+                stats["actions"],
+                stats["time"],
+                stats["actions"] / stats["time"] if stats["time"] else 0,
+                stats["reverts"],
+                len(self.failures),
+            )
+        )
+        for failure in self.failures[:20]:
+            console.print("[red]seed {} action {}: {}[/red]".format(failure.seed, failure.index, failure.error))
+
+
+# ===== On-chain cross-check =====
+
+
+def read_chain_state(simulation):
+    from helpers.multicall import Call, Multicall, func
+
+    sett = simulation.sett.address
+    want = simulation.want.address
+    strategy = simulation.strategy.address
+    calls = [
+        Call(sett, [func.erc20.totalSupply], [["totalSupply", None]]),
+        Call(want, [func.erc20.balanceOf, sett], [["settWant", None]]),
+        Call(strategy, [func.strategy.balanceOf], [["strategyBalance", None]]),
+        Call(strategy, [func.strategy.balanceOfWant], [["strategyWant", None]]),
+        Call(strategy, [func.strategy.balanceOfPool], [["pool", None]]),
+        Call(sett, ["min()(uint256)"], [["min", None]]),
+    ]
+    for field in ["withdrawalFee", "performanceFeeGovernance", "performanceFeeStrategist"]:
+        calls.append(Call(strategy, [func.strategy[field]], [[field, None]]))
+    for user in simulation.users:
+        calls.append(Call(want, [func.erc20.balanceOf, user.address], [[("want", user.address), None]]))
+        calls.append(Call(sett, [func.erc20.balanceOf, user.address], [[("shares", user.address), None]]))
+    return Multicall(calls, require_success=True)()
+
+
+def model_from_chain(state, simulation, profile):
+    fees = profile.with_fees(
+        state["withdrawalFee"], state["performanceFeeGovernance"], state["performanceFeeStrategist"]
+    )
+    model = ShadowSett(fees, state["min"])
+    for user in simulation.users:
+        model.add_user(user.address, state[("want", user.address)], state[("shares", user.address)])
+    # Shares held outside the simulated users
+    model.shares[None] = state["totalSupply"] - model.totalSupply
+    model.want[None] = 0
+    model.totalSupply = state["totalSupply"]
+    sync_model(model, state)
+    model.initialAssets = model.assets()
+    model.lastPpfs = model.ppfs()
+    return model
+
+
+def sync_model(model, state, simulation=None):
+    model.settWant = state["settWant"]
+    model.strategyWant = state["strategyWant"]
+    model.pool = state["pool"]
+    if simulation is None:
+        return
+    for user in simulation.users:
+        model.want[user.address] = state[("want", user.address)]
+        model.shares[user.address] = state[("shares", user.address)]
+    model.totalSupply = state["totalSupply"]
+    model.shares[None] = model.totalSupply - sum(model.shares[user.address] for user in simulation.users)
+
+
+def compare(model, state, simulation):
+    mismatches = []
+    predicted = {
+        "totalSupply": model.totalSupply,
+        "settWant": model.settWant,
+        "strategyBalance": model.strategyWant + model.pool,
+    }
+    for field in comparedFields:
+        if predicted[field] != state[field]:
+            mismatches.append((field, predicted[field], state[field]))
+    for user in simulation.users:
+        for field, values in [("want", model.want), ("shares", model.shares)]:
+            if values[user.address] != state[(field, user.address)]:
+                mismatches.append(
+                    ("{}.{}".format(field, user.address), values[user.address], state[(field, user.address)])
+                )
+    return mismatches
+
+
+def cross_check(simulation, window, profile):
+    """
+    Run a window of (type, params) actions on chain and in the model, comparing after each action.
+    User params are indexes into simulation.users. Returns [(index, type, mismatches)]; a revert on only one
+    side is a mismatch, and the model is resynced from the chain after it.
+    """
+    from .ActionTrace import build_actions
+
+    users = [user.address for user in simulation.users]
+    entries = [
+        {"type": actionType, "params": dict(params, user=users[params["user"]]) if "user" in params else params}
+        for actionType, params in window
+    ]
+    actions = build_actions(simulation, entries)
+
+    model = model_from_chain(read_chain_state(simulation), simulation, profile)
+    results = []
+    for index, (entry, action) in enumerate(zip(entries, actions)):
+        chainError = None
+        modelError = None
+        try:
+            simulation.runAction(action)
+        except Exception as e:
+            chainError = e
+        try:
+            model.apply(entry["type"], entry["params"])
+        except (ModelRevert, InvariantViolation) as e:
+            modelError = e
+
+        state = read_chain_state(simulation)
+        if chainError or modelError:
+            # A revert both sides predict is not a mismatch
+            if not (chainError and isinstance(modelError, ModelRevert)):
+                mismatch = (
+                    "revert",
+                    str(modelError) if modelError else "ok in model",
+                    str(chainError) if chainError else "ok on chain",
+                )
+                results.append((index, entry["type"], [mismatch]))
+            sync_model(model, state, simulation)
+            continue
+
+        # Yield realized on chain is not something the model predicts
+        if entry["type"] in ["SettHarvestAction", "SettTendAction"]:
+            sync_model(model, state)
+            continue
+        mismatches = compare(model, state, simulation)
+        if mismatches:
+            results.append((index, entry["type"], mismatches))
+            sync_model(model, state, simulation)
+
+    console.print(
+        "[{}]Cross-check: {} actions, {} mismatching[/{}]".format(
+            "green" if not results else "red", len(entries), len(results), "green" if not results else "red"
+        )
+    )
+    return results
@@ -0,0 +1,320 @@
+"""
+Pure-Python shadow of Sett / Controller / BaseStrategy share accounting
+
+Integer math follows Sett.sol and BaseStrategy.sol exactly (floor division, withdrawal fee on the amount
+leaving the strategy, withdrawalMaxDeviationThreshold); require() failures raise ModelRevert. What a strategy
+does with its pool is reduced to a StrategyProfile: whether _withdrawSome uses idle want first, whether it is
+tendable, and a yield rate that accrues with time and is realized (minus performance fees) on harvest.
+
+apply() takes the simulation's action vocabulary (DepositAction, WithdrawAction, SettEarnAction, ...), so
+action entries from ShadowFuzzer, ActionTrace and SimulationManager are interchangeable. check() asserts the
+invariants after every action and raises InvariantViolation.
+"""
+
+MAX = 10000
+YEAR = 365 * 24 * 3600
+PRECISION = 10 ** 18
+
+
+def max_round_trip_loss(ppfs):
+    """
+    Max loss on an immediate deposit + withdraw, as asserted by DepositAndWithdrawAction on chain.
+    Flooring the minted shares loses up to one share's worth (ppfs wei), flooring the withdrawal 1 wei more
+    """
+    return -(-ppfs // PRECISION) + 1
+
+
+class ModelRevert(Exception):
+    pass
+
+
+class InvariantViolation(Exception):
+    def __init__(self, invariant, message):
+        super().__init__("{}: {}".format(invariant, message))
+        self.invariant = invariant
+
+
+class StrategyProfile:
+    def __init__(
+        self,
+        withdrawIdleFirst=True,
+        tendable=False,
+        yieldPerYear=1000,
+        withdrawalFee=0,
+        performanceFeeGovernance=0,
+        performanceFeeStrategist=0,
+        withdrawalMaxDeviationThreshold=50,
+    ):
+        """
+        yieldPerYear: pool growth in bps per year, realized on harvest
+        """
+        self.withdrawIdleFirst = withdrawIdleFirst
+        self.tendable = tendable
+        self.yieldPerYear = yieldPerYear
+        self.withdrawalFee = withdrawalFee
+        self.performanceFeeGovernance = performanceFeeGovernance
+        self.performanceFeeStrategist = performanceFeeStrategist
+        self.withdrawalMaxDeviationThreshold = withdrawalMaxDeviationThreshold
+
+    def with_fees(self, withdrawalFee=0, performanceFeeGovernance=0, performanceFeeStrategist=0):
+        return StrategyProfile(
+            self.withdrawIdleFirst,
+            self.tendable,
+            self.yieldPerYear,
+            withdrawalFee,
+            performanceFeeGovernance,
+            performanceFeeStrategist,
+            self.withdrawalMaxDeviationThreshold,
+        )
+
+
+# _withdrawSome mechanics per strategy, by the names SnapshotManager picks resolvers with
+strategyProfiles = {
+    "StrategyBadgerRewards": StrategyProfile(withdrawIdleFirst=True),
+    "StrategyBadgerLpMetaFarm": StrategyProfile(withdrawIdleFirst=True),
+    "StrategyCurveGauge": StrategyProfile(withdrawIdleFirst=False),
+    "StrategyHarvestMetaFarm": StrategyProfile(withdrawIdleFirst=True, tendable=True),
+    "StrategyPickleMetaFarm": StrategyProfile(withdrawIdleFirst=True, tendable=True),
+    "StrategySushiBadgerWbtc": StrategyProfile(withdrawIdleFirst=True, tendable=True),
+    "StrategySushiLpOptimizer": StrategyProfile(withdrawIdleFirst=True, tendable=True),
+    "StrategyPancakeLpOptimizer": StrategyProfile(withdrawIdleFirst=True, tendable=True),
+}
+
+
+def strategy_profile(name, params=None):
+    """
+    Profile for a strategy name, with fees from its sett_config params (or on-chain values) if given
+    """
+    if "CurveGauge" in name:
+        name = "StrategyCurveGauge"
+    if name not in strategyProfiles:
+        # Digg strategies rebase their want, which is outside this model
+        raise Exception("no shadow model for strategy: {}".format(name))
+    profile = strategyProfiles[name]
+    if params is None:
+        return profile
+    return profile.with_fees(
+        params.get("withdrawalFee", 0),
+        params.get("performanceFeeGovernance", 0),
+        params.get("performanceFeeStrategist", 0),
+    )
+
+
+class ShadowSett:
+    def __init__(self, profile, min=9500):
+        self.profile = profile
+        self.min = min
+
+        self.want = {}
+        self.shares = {}
+        self.totalSupply = 0
+        # Want held by the sett, by the strategy, and deposited in its pool
+        self.settWant = 0
+        self.strategyWant = 0
+        self.pool = 0
+        # Fee recipients (controller rewards, strategist)
+        self.rewards = 0
+        self.strategist = 0
+
+        self.pendingYield = 0
+        self.yieldRealized = 0
+        self.initialAssets = 0
+        self.lastPpfs = PRECISION
+
+    def add_user(self, user, want, shares=0):
+        self.want[user] = want
+        self.shares[user] = shares
+        self.totalSupply += shares
+        self.initialAssets += want
+        return user
+
+    # ===== Views =====
+
+    def balance(self):
+        return self.settWant + self.strategyWant + self.pool
+
+    def available(self):
+        return self.settWant * self.min // MAX
+
+    def ppfs(self):
+        if self.totalSupply == 0:
+            return PRECISION
+        return self.balance() * PRECISION // self.totalSupply
+
+    def assets(self):
+        return sum(self.want.values()) + self.balance() + self.rewards + self.strategist
+
+    # ===== Sett =====
+
+    def deposit(self, user, amount):
+        if amount > self.want[user]:
+            raise ModelRevert("ERC20: transfer amount exceeds balance")
+        pool = self.balance()
+        self.want[user] -= amount
+        self.settWant += amount
+
+        if self.totalSupply == 0:
+            shares = amount
+        else:
+            if pool == 0:
+                raise ModelRevert("SafeMath: division by zero")
+            shares = amount * self.totalSupply // pool
+        if amount > 0 and shares == 0:
+            raise InvariantViolation("depositMintsShares", "deposit of {} minted no shares".format(amount))
+
+        self.shares[user] += shares
+        self.totalSupply += shares
+        return shares
+
+    def withdraw(self, user, shares):
+        if shares > self.shares[user]:
+            raise ModelRevert("ERC20: burn amount exceeds balance")
+        if self.totalSupply == 0:
+            raise ModelRevert("SafeMath: division by zero")
+        r = self.balance() * shares // self.totalSupply
+        self.shares[user] -= shares
+        self.totalSupply -= shares
+
+        b = self.settWant
+        if b < r:
+            toWithdraw = r - b
+            diff = self.strategy_withdraw(toWithdraw)
+            if diff < toWithdraw:
+                r = b + diff
+
+        self.settWant -= r
+        self.want[user] += r
+        return r
+
+    def earn(self):
+        amount = self.available()
+        self.settWant -= amount
+        self.strategyWant += amount
+        self.strategy_deposit()
+
+    # ===== Strategy =====
+
+    def strategy_deposit(self):
+        if self.strategyWant > 0:
+            self.pool += self.strategyWant
+            self.strategyWant = 0
+
+    def strategy_withdraw(self, amount):
+        """
+        BaseStrategy.withdraw(), returns the want sent to the sett
+        """
+        profile = self.profile
+        if profile.withdrawIdleFirst:
+            fromPool = amount - self.strategyWant if amount > self.strategyWant else 0
+        else:
+            fromPool = amount
+        if fromPool > self.pool:
+            raise ModelRevert("pool withdraw exceeds balance")
+        self.pool -= fromPool
+        self.strategyWant += fromPool
+
+        postWithdraw = self.strategyWant
+        if postWithdraw < amount:
+            if amount - postWithdraw > amount * profile.withdrawalMaxDeviationThreshold // MAX:
+                raise ModelRevert("base-strategy/withdraw-exceed-max-deviation-threshold")
+
+        toWithdraw = min(postWithdraw, amount)
+        fee = toWithdraw * profile.withdrawalFee // MAX
+        self.strategyWant -= toWithdraw
+        self.rewards += fee
+        self.settWant += toWithdraw - fee
+        return toWithdraw - fee
+
+    def harvest(self):
+        profile = self.profile
+        gained = self.pendingYield
+        self.pendingYield = 0
+
+        governanceFee = gained * profile.performanceFeeGovernance // MAX
+        strategistFee = gained * profile.performanceFeeStrategist // MAX
+        self.rewards += governanceFee
+        self.strategist += strategistFee
+        self.strategyWant += gained - governanceFee - strategistFee
+        self.yieldRealized += gained
+        self.strategy_deposit()
+        return gained
+
+    def tend(self):
+        self.strategy_deposit()
+
+    def elapse(self, seconds):
+        self.pendingYield += self.pool * self.profile.yieldPerYear * int(seconds) // (MAX * YEAR)
+
+    # ===== Simulation actions =====
+
+    def deposit_half(self, user):
+        return self.deposit(user, self.want[user] // 2)
+
+    def deposit_and_withdraw(self, user):
+        starting = self.want[user]
+        maxLoss = max_round_trip_loss(self.ppfs())
+        # The first depositor into an emptied sett is owed whatever was left in it (e.g. a later harvest)
+        empty = self.totalSupply == 0
+        shares = self.deposit_half(user)
+        self.withdraw(user, shares)
+
+        loss = starting - self.want[user]
+        if loss < 0 and not empty:
+            raise InvariantViolation("roundTripProfit", "deposit + withdraw returned {} more".format(-loss))
+        # Fees are charged only when the withdrawal reaches into the strategy
+        if self.profile.withdrawalFee == 0 and loss > maxLoss:
+            raise InvariantViolation(
+                "roundTripLoss", "deposit + withdraw lost {} wei, max {}".format(loss, maxLoss)
+            )
+
+    def apply(self, actionType, params):
+        if actionType == "DepositAction":
+            self.deposit_half(params["user"])
+        elif actionType == "WithdrawAction":
+            self.withdraw(params["user"], self.shares[params["user"]])
+        elif actionType == "DepositAndWithdrawAction":
+            self.deposit_and_withdraw(params["user"])
+        elif actionType == "SettEarnAction":
+            self.earn()
+        elif actionType == "SettHarvestAction":
+            self.harvest()
+        elif actionType == "SettTendAction":
+            self.tend()
+        elif actionType == "SleepAction":
+            self.elapse(params["duration"])
+        elif actionType == "MineAction":
+            pass
+        else:
+            raise Exception("no shadow model for action: {}".format(actionType))
+
+    # ===== Invariants =====
+
+    def check(self, full=True):
+        """
+        full: also the O(users) sums
+        """
+        ppfs = self.ppfs()
+        if self.totalSupply > 0 and ppfs < self.lastPpfs:
+            raise InvariantViolation("ppfsMonotonic", "pricePerFullShare fell {} -> {}".format(self.lastPpfs, ppfs))
+        if self.totalSupply > 0:
+            self.lastPpfs = ppfs
+        else:
+            # An empty sett starts over at 1:1
+            self.lastPpfs = PRECISION
+
+        if self.settWant < 0 or self.strategyWant < 0 or self.pool < 0:
+            raise InvariantViolation("nonNegative", "negative sett / strategy balance")
+        if not full:
+            return
+
+        if sum(self.shares.values()) != self.totalSupply:
+            raise InvariantViolation(
+                "sharesSum", "shares sum {} != totalSupply {}".format(sum(self.shares.values()), self.totalSupply)
+            )
+        if min(self.want.values(), default=0) < 0:
+            raise InvariantViolation("nonNegative", "negative user balance")
+        if self.assets() != self.initialAssets + self.yieldRealized:
+            raise InvariantViolation(
+                "conservation",
+                "assets {} != initial {} + yield {}".format(self.assets(), self.initialAssets, self.yieldRealized),
+            )
@@ -1,5 +1,6 @@
 import time
 import random
+from contextlib import nullcontext
 from hexbytes import HexBytes
 from brownie import accounts, web3
 from enum import Enum
@@ -52,6 +53,8 @@ class SimulationManager:
         snap: SnapshotManager,
         settId: str,
         seed: int = 0,  # Default seed is 0 or unset, will generate.
+        # Provision users from a seed of their own, so the provisioned state can be shared across seeds.
+        provisionSeed: int = None,
     ):
         self.accounts = accounts[9:]  # Use the 10th account onwards.
         # User accounts (need to be provisioned before running sim).
@@ -59,6 +62,7 @@ class SimulationManager:
 
         self.badger = badger
         self.snap = snap
+        self.settId = settId
         self.sett = badger.getSett(settId)
         self.strategy = badger.getStrategy(settId)
         self.want = badger.getStrategyWant(settId)
@@ -77,6 +81,12 @@ class SimulationManager:
             self.actors.append(DiggActor(self, self.badger.deployer))
         # Ordered valid actions generated by actors.
         self.actions = []
+        # Number of actions run to completion (index of the failing action on error).
+        self.actionsRun = 0
+        # Actor that generated each action (by action id, actors may reuse action instances).
+        self.actionActors = {}
+        # Optional SimulationMetrics (see SimulationMetrics.attach).
+        self.metrics = None
 
         self.state = SimulationManagerState.IDLE
 
@@ -86,12 +96,36 @@ class SimulationManager:
             self.seed = int(time.time())
         console.print(f"initialized simulation manager with seed: {self.seed}")
         random.seed(self.seed)
+        self.provisionSeed = provisionSeed
         self.provisioner = self._initProvisioner(settId)
 
-    def provision(self) -> None:
+    def provision(self, cache=None) -> None:
+        """
+        cache: optional ProvisionCache, provisioned users are restored from it instead of redistributed.
+        """
+        with self._phase("provision"):
+            self._provision(cache)
+
+    def _provision(self, cache) -> None:
         if self.state != SimulationManagerState.IDLE:
             raise Exception(f"invalid state: {self.state}")
 
+        key = None
+        if cache:
+            key = cache.key(self.settId, self.provisionConfig())
+            metadata = cache.restore(key)
+            if metadata:
+                accountsByAddress = {account.address: account for account in self.accounts}
+                self.users = [accountsByAddress[user] for user in metadata["users"]]
+                self._resumeRandom(metadata.get("randomState"))
+                self._provisionUserActors()
+                console.print(f"restored {len(self.users)} provisioned users from cache")
+                self.state = SimulationManagerState.PROVISIONED
+                return
+
+        if self.provisionSeed is not None:
+            random.seed(self.provisionSeed)
+
         accountsUsed = set([])
         while len(self.users) < NUM_USERS:
             idx = int(random.random()*len(self.accounts))
@@ -105,33 +139,93 @@ class SimulationManager:
 
         self.provisioner._distributeTokens(self.users)
         self.provisioner._distributeWant(self.users)
+
+        randomState = None
+        if self.provisionSeed is None:
+            # Actions continue the seed's random stream where provisioning left it.
+            state = random.getstate()
+            randomState = [state[0], list(state[1]), state[2]]
+        if cache:
+            cache.save(key, {"users": [user.address for user in self.users], "randomState": randomState})
+        self._resumeRandom(randomState)
+
         self._provisionUserActors()
         console.print(f"provisioned {len(self.users)} users {len(self.actors)} actors")
 
         self.state = SimulationManagerState.PROVISIONED
 
+    def provisionConfig(self) -> dict:
+        # Everything the provisioned state depends on.
+        return {
+            "sett": self.sett.address,
+            "strategy": self.strategy.address,
+            "numUsers": NUM_USERS,
+            "seed": self.seed if self.provisionSeed is None else None,
+            "provisionSeed": self.provisionSeed,
+        }
+
     def randomize(self, numActions: int) -> None:
         if self.state != SimulationManagerState.PROVISIONED:
             raise Exception(f"invalid state: {self.state}")
 
-        for i in range(0, numActions):
-            # Pick a random actor and generate an action.
-            idx = int(random.random() * len(self.actors))
-            self.actions.append(self.actors[idx].generateAction())
+        with self._phase("randomize"):
+            for i in range(0, numActions):
+                # Pick a random actor and generate an action.
+                idx = int(random.random() * len(self.actors))
+                action = self.actors[idx].generateAction()
+                self.actions.append(action)
+                self.actionActors[id(action)] = self.actors[idx]
 
         console.print(f"randomized {numActions} actions")
 
         self.state = SimulationManagerState.RANDOMIZED
 
-    def run(self) -> None:
+    def load(self, actions) -> None:
+        """
+        Use a given action list (e.g. rebuilt from a trace) instead of randomize().
+        """
+        if self.state != SimulationManagerState.PROVISIONED:
+            raise Exception(f"invalid state: {self.state}")
+        self.actions = list(actions)
+        self.state = SimulationManagerState.RANDOMIZED
+
+    def run(self, trace=None) -> None:
+        """
+        trace: optional ActionTrace recording every action as it runs.
+        """
         if self.state != SimulationManagerState.RANDOMIZED:
             raise Exception(f"invalid state: {self.state}")
         self.state = SimulationManagerState.RUNNING
 
         console.print(f"running {len(self.actions)} actions")
 
-        for action in self.actions:
-            action.run()
+        with self._phase("run"):
+            if trace:
+                trace.start(self)
+            for action in self.actions:
+                self.runAction(action, trace)
+
+    def runAction(self, action, trace=None) -> None:
+        measure = nullcontext()
+        if self.metrics:
+            measure = self.metrics.action(action, self.actionActors.get(id(action)))
+        with measure:
+            if trace:
+                trace.run(self, action)
+            else:
+                action.run()
+        self.actionsRun += 1
+
+    def _phase(self, name):
+        if self.metrics:
+            return self.metrics.phase(name)
+        return nullcontext()
+
+    def user(self, address):
+        for user in self.users:
+            if user.address == address:
+                return user
+        raise Exception(f"not a provisioned user: {address}")
 
     def _initProvisioner(self, settId) -> BaseProvisioner:
         if settId == "native.badger":
@@ -160,6 +254,12 @@ class SimulationManager:
             return SushiWbtcIbBtcLpOptimizerProvisioner(self)
         raise Exception(f"invalid strategy settID (no provisioner): {settId}")
 
+    def _resumeRandom(self, randomState) -> None:
+        if randomState:
+            random.setstate((randomState[0], tuple(randomState[1]), randomState[2]))
+        elif self.provisionSeed is not None:
+            random.seed(self.seed)
+
     def _provisionUserActors(self) -> None:
         # Add all users as actors the sim.
         for user in self.users:
@@ -0,0 +1,175 @@
+import json
+import time
+from contextlib import contextmanager
+
+from brownie import history, web3
+from rich.console import Console
+from tabulate import tabulate
+
+from helpers.rpc_metrics import RpcMetrics
+
+console = Console()
+
+"""
+Throughput and RPC instrumentation for simulations
+
+attach() installs an RpcMetrics middleware on the provider and hooks SimulationManager and its
+SnapshotManager. Each action is then recorded under its type (and the actor that generated it) with wall
+time, RPC calls by method, transactions sent and gas used; snaps and the provision / randomize / run phases
+are timed the same way.
+
+    metrics = SimulationMetrics().attach(simulation)
+    simulation.provision()
+    ...
+    metrics.print_report()
+    metrics.write_report("simulation-report.json")
+
+Reports are plain dicts, merge_reports() adds several together (e.g. one per seed from SimulationRunner).
+Every SimulationMetrics in a process reads the same RpcMetrics middleware and records its own deltas.
+"""
+
+# Installed once per process, see process_rpc_metrics()
+processRpc = None
+
+
+def process_rpc_metrics():
+    global processRpc
+    if processRpc is None:
+        processRpc = RpcMetrics().install(web3)
+    return processRpc
+
+
+def new_entry():
+    return {"count": 0, "failures": 0, "time": 0, "rpcCalls": 0, "rpcByMethod": {}, "txs": 0, "gasUsed": 0}
+
+
+def add_entry(total, entry):
+    for field in ["count", "failures", "time", "rpcCalls", "txs", "gasUsed"]:
+        total[field] += entry[field]
+    for method, count in entry["rpcByMethod"].items():
+        total["rpcByMethod"][method] = total["rpcByMethod"].get(method, 0) + count
+    return total
+
+
+class SimulationMetrics:
+    def __init__(self, rpc=None):
+        self.rpc = rpc or process_rpc_metrics()
+        # "ActionType" -> entry, plus the actor type that generated it
+        self.actions = {}
+        self.actors = {}
+        self.phases = {}
+        self.started = time.time()
+
+    def attach(self, simulation):
+        self.rpc.install(web3)
+        simulation.metrics = self
+        simulation.snap.metrics = self
+        return self
+
+    # ===== Recording =====
+
+    @contextmanager
+    def measure(self, entry):
+        rpcBefore = dict(self.rpc.snapshot()["rpcCalls"])
+        historyStart = len(history)
+        start = time.time()
+        try:
+            yield
+        except Exception:
+            entry["failures"] += 1
+            raise
+        finally:
+            entry["count"] += 1
+            entry["time"] += time.time() - start
+
+            for method, count in self.rpc.snapshot()["rpcCalls"].items():
+                calls = count - rpcBefore.get(method, 0)
+                if calls:
+                    entry["rpcByMethod"][method] = entry["rpcByMethod"].get(method, 0) + calls
+                    entry["rpcCalls"] += calls
+
+            txs = history[historyStart:]
+            entry["txs"] += len(txs)
+            entry["gasUsed"] += sum(tx.gas_used or 0 for tx in txs)
+
+    def action(self, action, actor=None):
+        actionType = type(action).__name__
+        if actor is not None:
+            self.actors[actionType] = type(actor).__name__
+        return self.measure(self.actions.setdefault(actionType, new_entry()))
+
+    def phase(self, name):
+        return self.measure(self.phases.setdefault(name, new_entry()))
+
+    # ===== Reports =====
+
+    def report(self):
+        total = new_entry()
+        for entry in self.actions.values():
+            add_entry(total, entry)
+        return {
+            "duration": time.time() - self.started,
+            "actions": self.actions,
+            "actors": self.actors,
+            "phases": self.phases,
+            "total": total,
+        }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=4)
+
+    def print_report(self, report=None):
+        print_report(report or self.report())
+
+
+def merge_reports(reports):
+    merged = {"duration": 0, "actions": {}, "actors": {}, "phases": {}, "total": new_entry()}
+    for report in reports:
+        merged["duration"] += report["duration"]
+        merged["actors"].update(report["actors"])
+        for group in ["actions", "phases"]:
+            for name, entry in report[group].items():
+                add_entry(merged[group].setdefault(name, new_entry()), entry)
+        add_entry(merged["total"], report["total"])
+    return merged
+
+
+def print_report(report):
+    def row(name, actor, entry):
+        count = max(entry["count"], 1)
+        topMethods = sorted(entry["rpcByMethod"].items(), key=lambda item: -item[1])[:3]
+        return [
+            name,
+            actor,
+            entry["count"],
+            entry["failures"],
+            "{:.2f}s".format(entry["time"]),
+            "{:.0f}ms".format(entry["time"] / count * 1000),
+            "{:.1f}".format(entry["rpcCalls"] / count),
+            "{:.1f}".format(entry["txs"] / count),
+            "{:,.0f}".format(entry["gasUsed"] / count),
+            ", ".join("{} {}".format(method, calls) for method, calls in topMethods),
+        ]
+
+    headers = ["", "actor", "count", "failed", "time", "avg", "rpc/op", "txs/op", "gas/op", "top rpc methods"]
+    table = [
+        row(name, report["actors"].get(name, "-"), entry)
+        for name, entry in sorted(report["actions"].items(), key=lambda item: -item[1]["time"])
+    ]
+    table.append(row("total", "", report["total"]))
+    table += [row("[{}]".format(name), "", entry) for name, entry in report["phases"].items()]
+
+    total = report["total"]
+    console.print("[green]=== Simulation report ===[/green]")
+    print(tabulate(table, headers=headers))
+    console.print(
+        "{} actions in {:.1f}s ({:.2f} actions/s), {} rpc calls, {} txs, {:,} gas".format(
+            total["count"],
+            total["time"],
+            total["count"] / total["time"] if total["time"] else 0,
+            total["rpcCalls"],
+            total["txs"],
+            total["gasUsed"],
+        )
+    )
@@ -0,0 +1,296 @@
+import multiprocessing
+import os
+import time
+import traceback
+
+from rich.console import Console
+from tabulate import tabulate
+
+console = Console()
+
+"""
+Runs many SimulationManager seeds in parallel, one local dev chain per worker process
+
+Each worker launches its own dev node (the brownie network `networkId`, e.g. mainnet-fork, or a hardhat /
+anvil network added to brownie's network config) on its own port, deploys the sett once, snapshots the
+chain, and then runs seeds from the shared queue, reverting to the snapshot before each one. With a
+provisionSeed, users are provisioned once per worker and every seed starts from that cached state
+(ProvisionCache) instead of redistributing tokens. Failures are collected with their seed and failing action
+so they can be reproduced with SimulationManager(seed=seed, provisionSeed=provisionSeed), or from their
+action trace (ActionTrace) when a traceDir is given.
+
+    runner = SimulationRunner("native.badger", workers=4, numActions=30)
+    results = runner.run(range(1, 101))
+    runner.print_report()
+"""
+
+DIGG_SETTS = ["native.digg", "native.uniDiggWbtc", "native.sushiDiggWbtc"]
+BASE_PORT = 8546
+
+# Per worker process state, set by init_worker
+worker = {}
+
+
+def init_worker(ports, projectPath, networkId, settConfig, provisionSeed, traceDir, metrics):
+    # A raising initializer makes Pool respawn workers forever, so failures are kept and reported by run_seed
+    try:
+        setup_worker(ports, projectPath, networkId, settConfig, provisionSeed, traceDir, metrics)
+    except Exception as e:
+        worker["initError"] = "{}: {}".format(type(e).__name__, e)
+        worker["initTraceback"] = traceback.format_exc()
+
+
+def setup_worker(ports, projectPath, networkId, settConfig, provisionSeed, traceDir, metrics):
+    port = ports.get()
+    worker["port"] = port
+
+    from brownie import chain, config, network, project
+
+    project.load(projectPath)
+    config["networks"][networkId].setdefault("cmd_settings", {})["port"] = port
+    network.connect(networkId)
+
+    # Contract containers are only importable once the project is loaded
+    from tests.conftest import badger_single_sett
+
+    start = time.time()
+    badger = badger_single_sett(settConfig, deploy=settConfig.get("deploy", True))
+    console.print(
+        "[grey]Worker {} on port {}: {} ready in {:.1f}s[/grey]".format(
+            os.getpid(), port, settConfig["id"], time.time() - start
+        )
+    )
+
+    from .ProvisionCache import ProvisionCache
+
+    worker.update({"port": port, "badger": badger, "settConfig": settConfig, "provisionSeed": provisionSeed})
+    worker["traceDir"] = traceDir
+    if metrics:
+        from .SimulationMetrics import process_rpc_metrics
+
+        # One provider middleware per worker, each seed measures its own deltas
+        worker["rpc"] = process_rpc_metrics()
+    worker["cache"] = ProvisionCache(persist=False) if provisionSeed is not None else None
+    worker["snapshot"] = chain.snapshot()
+
+
+def run_seed(seed, numActions):
+    result = {
+        "seed": seed,
+        "port": worker.get("port"),
+        "pid": os.getpid(),
+        "actions": 0,
+        "provisionTime": 0,
+        "runTime": 0,
+        "error": None,
+        "traceback": None,
+    }
+    if "initError" in worker:
+        result["initError"] = True
+        result["error"] = worker["initError"]
+        result["traceback"] = worker["initTraceback"]
+        return result
+
+    from brownie import chain
+    from helpers.sett.DiggSnapshotManager import DiggSnapshotManager
+    from helpers.sett.SnapshotManager import SnapshotManager
+    from .ActionTrace import ActionTrace
+    from .SimulationManager import SimulationManager
+    from .SimulationMetrics import SimulationMetrics
+
+    settId = worker["settConfig"]["id"]
+    cache = worker["cache"]
+    simulation = None
+    metrics = None
+    trace = None
+    if worker["traceDir"]:
+        result["trace"] = os.path.join(worker["traceDir"], "{}-{}.jsonl".format(settId, seed))
+        trace = ActionTrace(result["trace"])
+    stage = time.time()
+    try:
+        snapClass = DiggSnapshotManager if settId in DIGG_SETTS else SnapshotManager
+        snap = snapClass(worker["badger"], settId)
+        simulation = SimulationManager(
+            worker["badger"], snap, settId, seed, provisionSeed=worker["provisionSeed"]
+        )
+        if "rpc" in worker:
+            metrics = SimulationMetrics(worker["rpc"]).attach(simulation)
+        # A cached provisioned state is restored by provision() itself
+        if cache is None or cache.key(settId, simulation.provisionConfig()) not in cache.entries:
+            chain.revert()
+            if cache:
+                cache.clear()
+        simulation.provision(cache)
+        simulation.randomize(numActions)
+        result["provisionTime"] = time.time() - stage
+
+        stage = time.time()
+        simulation.run(trace)
+        result["runTime"] = time.time() - stage
+    except Exception as e:
+        if result["provisionTime"] == 0:
+            result["provisionTime"] = time.time() - stage
+        else:
+            result["runTime"] = time.time() - stage
+        result["error"] = "{}: {}".format(type(e).__name__, e)
+        result["traceback"] = traceback.format_exc()
+    finally:
+        if trace:
+            trace.close()
+        if metrics:
+            result["metrics"] = metrics.report()
+        if simulation:
+            result["actions"] = simulation.actionsRun
+            # Failing action, e.g. "WithdrawAction"
+            if result["error"] and simulation.actionsRun < len(simulation.actions):
+                result["failedAction"] = type(simulation.actions[simulation.actionsRun]).__name__
+
+    return result
+
+
+class SimulationRunner:
+    def __init__(
+        self,
+        settId,
+        workers=4,
+        numActions=30,
+        networkId="mainnet-fork",
+        basePort=BASE_PORT,
+        mode="test",
+        deploy=True,
+        projectPath=".",
+        provisionSeed=None,
+        traceDir=None,
+        metrics=False,
+    ):
+        self.settConfig = {"id": settId, "mode": mode, "deploy": deploy}
+        self.workers = workers
+        self.numActions = numActions
+        self.networkId = networkId
+        self.basePort = basePort
+        self.projectPath = os.path.abspath(projectPath)
+        self.provisionSeed = provisionSeed
+        self.traceDir = os.path.abspath(traceDir) if traceDir else None
+        # Per seed SimulationMetrics reports, merged in print_report()
+        self.metrics = metrics
+        self.results = []
+        self.duration = 0
+
+    def run(self, seeds):
+        seeds = list(seeds)
+        if self.traceDir:
+            os.makedirs(self.traceDir, exist_ok=True)
+        if 0 in seeds:
+            raise Exception("seed 0 means unset to SimulationManager, use seeds >= 1")
+
+        # Brownie and the dev nodes don't survive fork(), every worker starts fresh
+        context = multiprocessing.get_context("spawn")
+        ports = context.Manager().Queue()
+        for i in range(self.workers):
+            ports.put(self.basePort + i)
+
+        console.print(
+            "[green]Running {} seeds of {} on {} workers ({} actions each)[/green]".format(
+                len(seeds), self.settConfig["id"], self.workers, self.numActions
+            )
+        )
+
+        start = time.time()
+        self.results = []
+        with context.Pool(
+            self.workers,
+            initializer=init_worker,
+            initargs=(
+                ports,
+                self.projectPath,
+                self.networkId,
+                self.settConfig,
+                self.provisionSeed,
+                self.traceDir,
+                self.metrics,
+            ),
+        ) as pool:
+            pending = [pool.apply_async(run_seed, (seed, self.numActions)) for seed in seeds]
+            for seed, future in zip(seeds, pending):
+                result = future.get()
+                self.results.append(result)
+                if result.get("initError"):
+                    pool.terminate()
+                    console.print(result["traceback"])
+                    raise Exception(
+                        "worker on port {} failed to start: {}".format(result["port"], result["error"])
+                    )
+                if result["error"]:
+                    console.print("[red]seed {} failed: {}[/red]".format(seed, result["error"]))
+
+        self.duration = time.time() - start
+        return self.results
+
+    def metrics_report(self):
+        from .SimulationMetrics import merge_reports
+
+        return merge_reports([result["metrics"] for result in self.results if "metrics" in result])
+
+    def failures(self):
+        return [result for result in self.results if result["error"]]
+
+    def worker_stats(self):
+        stats = {}
+        for result in self.results:
+            entry = stats.setdefault(
+                result["port"], {"seeds": 0, "failures": 0, "actions": 0, "provisionTime": 0, "runTime": 0}
+            )
+            entry["seeds"] += 1
+            entry["failures"] += 1 if result["error"] else 0
+            entry["actions"] += result["actions"]
+            entry["provisionTime"] += result["provisionTime"]
+            entry["runTime"] += result["runTime"]
+        return stats
+
+    def print_report(self):
+        table = []
+        totalActions = 0
+        for port, entry in sorted(self.worker_stats().items()):
+            totalActions += entry["actions"]
+            table.append(
+                [
+                    port,
+                    entry["seeds"],
+                    entry["failures"],
+                    entry["actions"],
+                    "{:.1f}s".format(entry["provisionTime"]),
+                    "{:.1f}s".format(entry["runTime"]),
+                    "{:.2f}".format(entry["actions"] / entry["runTime"] if entry["runTime"] else 0),
+                ]
+            )
+        console.print("[green]=== Simulation: {} ===[/green]".format(self.settConfig["id"]))
+        print(
+            tabulate(
+                table, headers=["port", "seeds", "failures", "actions", "provision", "run", "actions/s"]
+            )
+        )
+        console.print(
+            "{} seeds, {} actions in {:.1f}s ({:.2f} actions/s overall)".format(
+                len(self.results),
+                totalActions,
+                self.duration,
+                totalActions / self.duration if self.duration else 0,
+            )
+        )
+
+        if self.metrics:
+            from .SimulationMetrics import print_report
+
+            print_report(self.metrics_report())
+
+        failures = self.failures()
+        if len(failures) == 0:
+            console.print("[green]No failures[/green]")
+            return
+
+        table = [
+            [result["seed"], result["actions"], result.get("failedAction", "-"), result["error"][:80]]
+            for result in failures
+        ]
+        console.print("[red]=== {} failing seeds ===[/red]".format(len(failures)))
+        print(tabulate(table, headers=["seed", "action #", "action", "error"]))
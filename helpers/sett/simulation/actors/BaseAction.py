@@ -2,3 +2,13 @@
 class BaseAction:
     def run(self):
         raise Exception("unimplemented")
+
+    def params(self) -> dict:
+        '''
+        Everything needed to rebuild this action for replay (see fromParams).
+        '''
+        return {}
+
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls()
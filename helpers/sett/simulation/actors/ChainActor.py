@@ -11,10 +11,26 @@ class MineAction(BaseAction):
 
 
 class SleepAction(BaseAction):
+    def __init__(self, duration=None):
+        # Fixed duration (replay), otherwise drawn on every run.
+        self.duration = duration
+        self.lastDuration = None
+
     def run(self):
-        chain.sleep(days(
-            random.random() * random.randrange(10)
-        ))
+        duration = self.duration
+        if duration is None:
+            duration = days(
+                random.random() * random.randrange(10)
+            )
+        self.lastDuration = duration
+        chain.sleep(duration)
+
+    def params(self) -> dict:
+        return {"duration": self.lastDuration}
+
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(params["duration"])
 
 
 class ChainActor:
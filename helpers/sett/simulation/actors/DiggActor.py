@@ -10,14 +10,26 @@ class RebaseAction(BaseAction):
         self,
         snap: SnapshotManager,
         user: Any,
+        value=None,
     ):
         self.snap = snap
         self.user = user
+        # Fixed rebase value (replay), otherwise drawn on run.
+        self.value = value
 
     def run(self):
-        rebaseValue = random.random() * random.randint(1, 10)
-        # Rebase values are expected to have 18 decimals of precision.
-        self.snap.rebase(rebaseValue * 10**18, {"from": self.user})
+        if self.value is None:
+            rebaseValue = random.random() * random.randint(1, 10)
+            # Rebase values are expected to have 18 decimals of precision.
+            self.value = rebaseValue * 10**18
+        self.snap.rebase(self.value, {"from": self.user})
+
+    def params(self) -> dict:
+        return {"value": self.value}
+
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.badger.deployer, params["value"])
 
 
 class DiggActor:
@@ -16,6 +16,10 @@ class SettEarnAction(BaseAction):
     def run(self):
         self.snap.settEarn({"from": self.keeper})
 
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.settKeeper)
+
 
 class SettKeeperActor:
     def __init__(self, manager: Any, keeper: Any):
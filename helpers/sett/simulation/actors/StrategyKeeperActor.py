@@ -17,6 +17,10 @@ class SettHarvestAction(BaseAction):
     def run(self):
         self.snap.settHarvest({"from": self.keeper})
 
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.strategyKeeper)
+
 
 class SettTendAction(BaseAction):
     def __init__(
@@ -30,6 +34,10 @@ class SettTendAction(BaseAction):
     def run(self):
         self.snap.settTend({"from": self.keeper})
 
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.strategyKeeper)
+
 
 class StrategyKeeperActor:
     def __init__(self, manager: Any, keeper: Any):
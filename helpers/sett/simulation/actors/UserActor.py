@@ -5,6 +5,7 @@ from typing import Any
 from helpers.constants import MaxUint256
 from helpers.sett.SnapshotManager import SnapshotManager
 from .BaseAction import BaseAction
+from ..ShadowSett import max_round_trip_loss
 
 
 class DepositAndWithdrawAction(BaseAction):
@@ -27,6 +28,8 @@ class DepositAndWithdrawAction(BaseAction):
 
         beforeSettBalance = sett.balanceOf(user)
         startingBalance = want.balanceOf(user)
+        # Precision loss grows with the value of one share
+        maxLoss = max_round_trip_loss(sett.getPricePerFullShare())
         depositAmount = startingBalance // 2
         assert startingBalance >= depositAmount
         assert startingBalance >= 0
@@ -51,7 +54,14 @@ class DepositAndWithdrawAction(BaseAction):
         self.snap.settWithdraw(settDeposited, {"from": self.user})
 
         endingBalance = want.balanceOf(user)
-        assert startingBalance - endingBalance <= 2
+        assert startingBalance - endingBalance <= maxLoss
+
+    def params(self) -> dict:
+        return {"user": self.user.address}
+
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.user(params["user"]), manager.sett, manager.want)
 
 
 class DepositAction(BaseAction):
@@ -89,6 +99,13 @@ class DepositAction(BaseAction):
             {"from": user},
         )
 
+    def params(self) -> dict:
+        return {"user": self.user.address}
+
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.user(params["user"]), manager.sett, manager.want)
+
 
 class WithdrawAction(BaseAction):
     def __init__(
@@ -102,6 +119,13 @@ class WithdrawAction(BaseAction):
     def run(self):
         self.snap.settWithdrawAll({"from": self.user})
 
+    def params(self) -> dict:
+        return {"user": self.user.address}
+
+    @classmethod
+    def fromParams(cls, manager, params: dict):
+        return cls(manager.snap, manager.user(params["user"]))
+
 
 class UserActor:
     def __init__(self, manager: Any, user: Any):
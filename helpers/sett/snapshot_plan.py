@@ -0,0 +1,140 @@
+import time
+
+from tabulate import tabulate
+
+from helpers.multicall import Multicall
+from helpers.console_utils import console
+
+"""
+Compiled snapshot plans for SnapshotManager
+
+A plan is the resolver's Call list for one entity set, built once: calldata is encoded at compile time, and
+the decode table records which snap keys each call fills. Plans are cached per entity set (e.g. with and
+without a tracked user) and dropped when the manager's entities change.
+
+Each plan also carries a SnapSchema: the ordered snap keys with their display format resolved once, so Snaps
+store a list of values in schema order and diffs between snaps of one plan compare positions, not keys.
+"""
+
+# Display formats: (kind, decimals)
+RAW = ("raw", 0)
+DIGG_SHARES = ("shares", 18)
+
+
+def key_format(key):
+    if "stakingRewards.staked" in key or "stakingRewards.earned" in key:
+        return ("amount", 18)
+    # TODO: Handle based on token decimals
+    if ".digg" in key and "shares" not in key:
+        return ("amount", 9)
+    if "balance" in key or key in ["sett.available", "sett.pricePerFullShare", "sett.totalSupply"]:
+        return ("amount", 18)
+    if "shares" in key or "diggFaucet.earned" in key:
+        return DIGG_SHARES
+    return RAW
+
+
+class SnapSchema:
+    def __init__(self, keys):
+        self.keys = list(dict.fromkeys(keys))
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.formats = [key_format(key) for key in self.keys]
+
+
+def diff_snaps(before, after):
+    """
+    (key, format, before, after) for every value that changed
+    """
+    if before.schema is after.schema:
+        formats = before.schema.formats
+        return [
+            (key, formats[i], a, b)
+            for i, (key, a, b) in enumerate(zip(before.schema.keys, before.values, after.values))
+            if a != b
+        ] + [
+            (key, key_format(key), a, after.get(key))
+            for key, a in before.extra.items()
+            if a != after.get(key)
+        ]
+
+    changed = []
+    for key, a in before.data.items():
+        b = after.get(key)
+        if a != b:
+            changed.append((key, key_format(key), a, b))
+    return changed
+
+
+def plan_key(entities):
+    return tuple(sorted((key, str(entity)) for key, entity in entities.items()))
+
+
+class SnapshotPlan:
+    def __init__(self, calls, entities, compileTime=0):
+        self.calls = calls
+        # Resolvers may add entities of their own while building calls
+        self.entityKeys = list(entities.keys())
+
+        # Decode table: snap keys filled by each call, in call order
+        self.keys = [[name for name, handler in call.returns or []] for call in calls]
+        self.schema = SnapSchema(key for keys in self.keys for key in keys)
+        for call in calls:
+            call.data
+
+        self.stats = {
+            "calls": len(calls),
+            "keys": sum(len(keys) for keys in self.keys),
+            "compileTime": compileTime,
+            "snaps": 0,
+            "totalTime": 0,
+            "lastTime": 0,
+        }
+
+    def execute(self, block_identifier=None):
+        start = time.time()
+        multi = Multicall(self.calls, block_identifier=block_identifier)
+        data = multi()
+
+        duration = time.time() - start
+        self.stats["snaps"] += 1
+        self.stats["totalTime"] += duration
+        self.stats["lastTime"] = duration
+        return (data, multi.block)
+
+
+class SnapshotPlanCache:
+    def __init__(self, compile):
+        """
+        compile(entities) -> calls
+        """
+        self.compile = compile
+        self.plans = {}
+
+    def get(self, entities):
+        key = plan_key(entities)
+        if key not in self.plans:
+            start = time.time()
+            entities = dict(entities)
+            calls = self.compile(entities)
+            self.plans[key] = SnapshotPlan(calls, entities, time.time() - start)
+        return self.plans[key]
+
+    def invalidate(self):
+        self.plans = {}
+
+    def print_report(self, name=""):
+        table = []
+        for key, plan in self.plans.items():
+            stats = plan.stats
+            table.append(
+                [
+                    ", ".join(entityKey for entityKey, entity in key),
+                    stats["calls"],
+                    "{:.1f}ms".format(stats["compileTime"] * 1000),
+                    stats["snaps"],
+                    "{:.1f}ms".format(stats["lastTime"] * 1000),
+                    "{:.1f}ms".format(stats["totalTime"] / max(stats["snaps"], 1) * 1000),
+                ]
+            )
+        console.print("[green]=== Snapshot Plans: {} ===[/green]".format(name))
+        print(tabulate(table, headers=["entities", "calls", "compile", "snaps", "last", "average"]))
@@ -0,0 +1,177 @@
+import atexit
+import os
+import sqlite3
+import threading
+
+"""
+Append-only SQLite store for sett snapshots
+
+Every numeric snap value is one row (sett, block, timestamp, metric, value), so series for one metric across
+blocks, or across setts, are a single indexed query. Values are uint256, so they are kept exactly as text
+alongside a float copy for analysis. Rows are buffered and written in batches; a (sett, block, metric) row is
+only ever written once.
+Dev and fork chains don't record to the default store: their blocks share numbers with mainnet.
+
+    store = SnapshotStore("data/snapshots.sqlite")
+    store.record("native.badger", snap)
+    store.ppfs_series("native.badger")
+"""
+
+DEFAULT_STORE_PATH = "data/snapshots.sqlite"
+
+schema = """
+CREATE TABLE IF NOT EXISTS snaps (
+    sett TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    timestamp INTEGER,
+    metric TEXT NOT NULL,
+    value TEXT NOT NULL,
+    amount REAL,
+    PRIMARY KEY (sett, metric, block)
+);
+CREATE INDEX IF NOT EXISTS snaps_block ON snaps (block);
+"""
+
+
+class SnapshotStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, batchSize=5000, timestamps=None):
+        """
+        timestamps(blocks) -> {block: timestamp}, used for snaps recorded without one
+        """
+        self.path = path
+        self.batchSize = batchSize
+        self.timestamps = timestamps
+        self.lock = threading.Lock()
+        self.pending = []
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(schema)
+        self.closed = False
+        # Scripts that never close the store still keep their last batch
+        atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # ===== Writes =====
+
+    def record(self, settKey, snap, timestamp=None):
+        rows = []
+        for metric, value in snap.data.items():
+            # bool is an int, but not a series worth keeping
+            if type(value) is not int:
+                continue
+            rows.append([settKey, snap.block, timestamp, metric, str(value), float(value)])
+
+        with self.lock:
+            self.pending.extend(rows)
+            full = len(self.pending) >= self.batchSize
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            (rows, self.pending) = (self.pending, [])
+        if len(rows) == 0:
+            return
+
+        missing = sorted(set(row[1] for row in rows if row[2] is None))
+        if missing:
+            if self.timestamps is None:
+                from helpers.rpc_batch import get_block_timestamps
+
+                self.timestamps = get_block_timestamps
+            blockTimes = self.timestamps(missing)
+            for row in rows:
+                if row[2] is None:
+                    row[2] = blockTimes.get(row[1])
+
+        with self.lock, self.db:
+            self.db.executemany("INSERT OR IGNORE INTO snaps VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.db.close()
+        self.closed = True
+
+    # ===== Queries =====
+
+    def query(self, sql, params=()):
+        self.flush()
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def setts(self):
+        return [row[0] for row in self.query("SELECT DISTINCT sett FROM snaps ORDER BY sett")]
+
+    def metrics(self, settKey):
+        return [row[0] for row in self.query("SELECT DISTINCT metric FROM snaps WHERE sett = ? ORDER BY metric", (settKey,))]
+
+    def series(self, metric, settKey=None, fromBlock=0, toBlock=None):
+        """
+        [(block, timestamp, value)] for one sett, or {sett: [(block, timestamp, value)]} for all setts
+        """
+        sql = "SELECT sett, block, timestamp, value FROM snaps WHERE metric = ? AND block >= ?"
+        params = [metric, fromBlock]
+        if toBlock is not None:
+            sql += " AND block <= ?"
+            params.append(toBlock)
+        if settKey is not None:
+            sql += " AND sett = ?"
+            params.append(settKey)
+        sql += " ORDER BY sett, block"
+
+        bySett = {}
+        for sett, block, timestamp, value in self.query(sql, params):
+            bySett.setdefault(sett, []).append((block, timestamp, int(value)))
+        if settKey is not None:
+            return bySett.get(settKey, [])
+        return bySett
+
+    def ppfs_series(self, settKey=None, fromBlock=0, toBlock=None):
+        return self.series("sett.pricePerFullShare", settKey, fromBlock, toBlock)
+
+    def balance_series(self, tokenKey, entityKey, settKey=None, fromBlock=0, toBlock=None):
+        return self.series("balances.{}.{}".format(tokenKey, entityKey), settKey, fromBlock, toBlock)
+
+    # ===== Analysis =====
+
+    def ppfs_apy(self, settKey, fromBlock=0, toBlock=None):
+        """
+        Annualized price per share growth between the first and last snap in range
+        """
+        series = [
+            point
+            for point in self.ppfs_series(settKey, fromBlock, toBlock)
+            if point[1] is not None and point[2] > 0
+        ]
+        if len(series) < 2:
+            return None
+        (first, last) = (series[0], series[-1])
+        duration = last[1] - first[1]
+        if duration <= 0:
+            return None
+        return (last[2] / first[2]) ** (365 * 24 * 3600 / duration) - 1
+
+
+def open_default_store():
+    """
+    The shared store, or None on a dev / fork chain so simulated values never mix with mainnet history.
+    Set SNAPSHOT_STORE to record fork snaps to a separate file.
+    """
+    path = os.getenv("SNAPSHOT_STORE")
+    if path:
+        return SnapshotStore(path)
+
+    from brownie.network import rpc
+
+    if rpc.is_active():
+        return None
+    return SnapshotStore(DEFAULT_STORE_PATH)
@@ -2,6 +2,7 @@ from brownie import *
 from dotmap import DotMap
 from tabulate import tabulate
 
+from helpers.multicall import Call, Multicall, func
 from helpers.registry import WhaleRegistryAction, registry
 from rich.console import Console
 from scripts.systems.sushiswap_system import SushiswapSystem
@@ -104,10 +105,20 @@ def diff_token_balances(before, after, scale=True):
 
 
 def get_token_balances(tokens, accounts):
+    """
+    Read every token balance for every account in one multicall
+    """
+    calls = [
+        Call(token.address, [func.erc20.balanceOf, account.address], [[(token.address, account.address), None]])
+        for token in tokens
+        for account in accounts
+    ]
+    result = Multicall(calls, require_success=True)()
+
     balances = Balances()
     for token in tokens:
         for account in accounts:
-            balances.set(token, account, token.balanceOf(account))
+            balances.set(token, account, result[(token.address, account.address)])
     return balances
 
 
@@ -0,0 +1,24 @@
+from brownie import *
+from helpers.gas_utils import gas_strategies
+from helpers.keeper_service import KeeperService
+from rich.console import Console
+from scripts.systems.badger_system import connect_badger
+
+console = Console()
+
+gas_strategies.set_default_for_active_chain()
+
+
+def main():
+    badger = connect_badger(load_deployer=True, load_keeper=True)
+
+    if rpc.is_active():
+        """
+        Test: Load up testing accounts with ETH
+        """
+        accounts[0].transfer(badger.deployer, Wei("5 ether"))
+        accounts[0].transfer(badger.keeper, Wei("5 ether"))
+        accounts[0].transfer(badger.guardian, Wei("5 ether"))
+
+    # Harvest, tend, earn and rebase jobs for every sett, on the intervals in config/keeper.py
+    KeeperService(badger, cacheFile="data/keeper-metadata.json").run()
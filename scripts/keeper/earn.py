@@ -2,8 +2,10 @@ from helpers.utils import val
 from brownie import *
 from config.keeper import keeper_config
 from helpers.gas_utils import gas_strategies
+from helpers.keeper_preconditions import earn_preconditions
 from helpers.registry import registry
-from helpers.sett.SnapshotManager import SnapshotManager
+from helpers.sett.SystemSnapshotManager import SystemSnapshotManager
+from helpers.sett.snapshot_store import open_default_store
 from rich.console import Console
 from scripts.systems.badger_system import BadgerSystem, connect_badger
 from tabulate import tabulate
@@ -41,23 +43,9 @@ def get_expected_strategy_deposit_location(badger: BadgerSystem, id):
         return registry.sushi.sushiChef
 
 
-def earn_preconditions(key, vaultBalance, strategyBalance):
-    # Always allow earn on first run
-    if strategyBalance == 0:
-        return True
-    # Earn if deposits have accumulated over a static threshold
-    if keeper_config.has_earn_threshold_override_active_chain(
-        key
-    ) and vaultBalance >= keeper_config.get_active_chain_earn_threshold_override(key):
-        return True
-    # Earn if deposits have accumulated over % threshold
-    if vaultBalance / strategyBalance > keeper_config.earn_default_percentage_threshold:
-        return True
-    else:
-        return False
-
-
 def earn_all(badger: BadgerSystem, skip):
+    # Metadata for every sett in one pass
+    system = SystemSnapshotManager(badger, skip=skip, store=open_default_store())
     keeper = badger.deployer
     for key, vault in badger.sett_system.vaults.items():
         if key in skip:
@@ -82,7 +70,7 @@ def earn_all(badger: BadgerSystem, skip):
             print("Earn: " + key, vault, strategy)
             toEarn = True
 
-            snap = SnapshotManager(badger, key)
+            snap = system.manager(key)
             before = snap.snap()
 
             keeper = accounts.at(vault.keeper())
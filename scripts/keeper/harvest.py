@@ -2,7 +2,8 @@ from brownie import *
 from config.keeper import keeper_config
 from helpers.gas_utils import gas_strategies
 from helpers.registry import registry
-from helpers.sett.SnapshotManager import SnapshotManager
+from helpers.sett.SystemSnapshotManager import SystemSnapshotManager
+from helpers.sett.snapshot_store import open_default_store
 from helpers.utils import tx_wait, val
 from helpers.console_utils import console
 from scripts.systems.badger_system import BadgerSystem, connect_badger
@@ -11,6 +12,8 @@ from tabulate import tabulate
 gas_strategies.set_default_for_active_chain()
 
 def harvest_all(badger: BadgerSystem, skip):
+    # Metadata for every sett in one pass
+    system = SystemSnapshotManager(badger, skip=skip, store=open_default_store())
     for key, vault in badger.sett_system.vaults.items():
         if key in skip:
             continue
@@ -21,7 +24,7 @@ def harvest_all(badger: BadgerSystem, skip):
 
         print("Harvest: " + key)
 
-        snap = SnapshotManager(badger, key)
+        snap = system.manager(key)
         strategy = badger.getStrategy(key)
         keeper = accounts.at(badger.keeper)
 
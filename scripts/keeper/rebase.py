@@ -16,6 +16,7 @@ from helpers.gas_utils import gas_strategies
 from helpers.gnosis_safe import (GnosisSafe, MultisigTxMetadata,
                                  convert_to_test_mode, exec_direct,
                                  get_first_owner)
+from helpers.keeper_preconditions import rebase_preconditions
 from helpers.registry import registry
 from helpers.time_utils import days, hours, to_days, to_timestamp, to_utc_date
 from helpers.utils import val
@@ -61,9 +62,7 @@ def rebase(badger: BadgerSystem, account):
         "time_since_last_rebase": time_since_last_rebase,
     })
 
-    # Rebase if sufficient time has passed since last rebase and we are in the window. 
-    # Give adequate time between TX attempts
-    if (time_since_last_rebase > hours(2) and in_rebase_window):
+    if rebase_preconditions(last_rebase_time, in_rebase_window, now):
         console.print("[bold yellow]===== 📈 Rebase! 📉=====[/bold yellow]")
         tx = digg.orchestrator.rebase({'from': account})
         chain.mine()
@@ -1,4 +1,5 @@
-from helpers.sett.SnapshotManager import SnapshotManager
+from helpers.sett.SystemSnapshotManager import SystemSnapshotManager
+from helpers.sett.snapshot_store import open_default_store
 from config.keeper import keeper_config
 from helpers.utils import tx_wait, val
 from brownie import *
@@ -13,6 +14,8 @@ console = Console()
 
 
 def tend_all(badger: BadgerSystem, skip):
+    # Metadata for every sett in one pass
+    system = SystemSnapshotManager(badger, skip=skip, store=open_default_store())
     table = []
     for key, vault in badger.sett_system.vaults.items():
         if key in skip:
@@ -25,7 +28,7 @@ def tend_all(badger: BadgerSystem, skip):
 
         console.print("\n[bold green]===== Tend: " + key + " =====[/bold green]\n")
 
-        snap = SnapshotManager(badger, key)
+        snap = system.manager(key)
         strategy = badger.getStrategy(key)
         keeper = accounts.at(badger.keeper)
 
@@ -66,7 +66,9 @@ def approve_root(badger: BadgerSystem):
         badgerTree.lastProposeEndBlock(),
     )
 
-    verify_rewards(badger, startBlock, endBlock, publishedRewards, proposedRewards)
+    verify_rewards(
+        badger, startBlock, endBlock, publishedRewards, proposedRewards, contentFileName=contentFileName
+    )
 
     badgerTree.approveRoot(
         proposedRewards["merkleRoot"],
@@ -0,0 +1,45 @@
+import glob
+import json
+import sys
+
+from rich.console import Console
+
+from assistant.rewards.proof_index import ProofIndex, write_proof_index
+
+console = Console()
+
+
+def build_proof_index(contentFileName):
+    """
+    Rebuild the proof index for an existing rewards content file
+    """
+    with open(contentFileName) as f:
+        tree = json.load(f)
+
+    (indexFileName, recordFileName) = write_proof_index(tree, contentFileName)
+
+    # Sanity check: every claim must round trip through the index
+    with ProofIndex(contentFileName) as index:
+        assert len(index) == len(tree["claims"])
+        assert index.merkleRoot == tree["merkleRoot"]
+        for user, claim in tree["claims"].items():
+            indexed = index.get(user)
+            assert indexed["proof"] == claim["proof"]
+            assert indexed["cumulativeAmounts"] == claim["cumulativeAmounts"]
+
+    console.print(
+        "[green]Indexed {} claims from {} -> {}, {}[/green]".format(
+            len(tree["claims"]), contentFileName, indexFileName, recordFileName
+        )
+    )
+
+
+def main(*fileNames):
+    if len(fileNames) == 0:
+        fileNames = sorted(glob.glob("rewards-*.json"))
+    for fileName in fileNames:
+        build_proof_index(fileName)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
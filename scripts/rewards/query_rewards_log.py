@@ -0,0 +1,43 @@
+import json
+import sys
+
+from rich.console import Console
+from tabulate import tabulate
+
+from assistant.rewards.rewards_log import aggregate_log, summarize_log
+
+console = Console()
+
+
+def main(fileName="logs/rewards.jsonl", by="vault,token", recordType="token", limit="50"):
+    """
+    Sum amounts in a rewards log, e.g.
+    query_rewards_log.py logs/rewards.jsonl vault,token token
+    query_rewards_log.py logs/retroactive-farm.jsonl epoch epoch
+    """
+    fields = by.split(",")
+    (totals, counts) = aggregate_log(fileName, fields, type=recordType)
+
+    rows = sorted(totals.items(), key=lambda item: -item[1])[: int(limit)]
+    table = [list(key) + [total, counts[key]] for key, total in rows]
+
+    console.print("{} groups of '{}' records in {}".format(len(totals), recordType, fileName))
+    print(tabulate(table, headers=fields + ["total", "records"]))
+
+
+def summarize(fileName="logs/rewards.jsonl"):
+    """
+    Write the nested userData / retroactiveData summary next to a log, e.g.
+    query_rewards_log.py summarize logs/retroactive-farm.jsonl
+    """
+    summaryName = fileName[: -len(".jsonl")] + ".json" if fileName.endswith(".jsonl") else fileName + ".json"
+    with open(summaryName, "w") as f:
+        json.dump(summarize_log(fileName), f, indent=4)
+    console.print("Wrote summary of {} to {}".format(fileName, summaryName))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "summarize":
+        summarize(*sys.argv[2:])
+    else:
+        main(*sys.argv[1:])
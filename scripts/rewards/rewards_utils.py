@@ -25,10 +25,10 @@ def get_last_published_cycle(badger):
     # Sanity check: Ensure start block is not too close to end block
     return (currentRewards, lastClaimStart, lastClaimEnd)
 
-def get_last_proposed_cycle(badger: BadgerSystem):
-    # Fetch the appropriate file
-    currentRewards = fetch_pending_rewards_tree(badger)
-
+def get_last_proposed_range(badger: BadgerSystem):
+    """
+    Block range of the pending proposal, read from the tree alone (no content file is fetched)
+    """
     lastClaimEnd = badger.badgerTree.lastProposeEndBlock()
     lastClaimStart = badger.badgerTree.lastProposeStartBlock()
 
@@ -39,6 +39,13 @@ def get_last_proposed_cycle(badger: BadgerSystem):
     assert lastClaimEnd > chain.height - rewards_config.maxStartBlockAge
 
     # Sanity check: Ensure start block is not too close to end block
+    return (lastClaimStart, lastClaimEnd)
+
+def get_last_proposed_cycle(badger: BadgerSystem):
+    # Fetch the appropriate file
+    currentRewards = fetch_pending_rewards_tree(badger)
+
+    (lastClaimStart, lastClaimEnd) = get_last_proposed_range(badger)
     return (currentRewards, lastClaimStart, lastClaimEnd)
 
 def calc_next_cycle_range(badger):
@@ -0,0 +1,34 @@
+import glob
+import sys
+
+from rich.console import Console
+
+from assistant.rewards.tree_verifier import print_proof_verification, verify_proofs
+
+console = Console()
+
+
+def main(*fileNames):
+    """
+    Verify every proof in the given content files (default: all local rewards files) without a node
+    """
+    if len(fileNames) == 0:
+        fileNames = sorted(glob.glob("rewards-*.json"))
+
+    failed = []
+    for fileName in fileNames:
+        result = verify_proofs(fileName)
+        print_proof_verification(result)
+        if not result["valid"]:
+            failed.append(fileName)
+
+    console.print(
+        "{} files, {} passed, {} failed".format(
+            len(fileNames), len(fileNames) - len(failed), len(failed)
+        )
+    )
+    assert len(failed) == 0
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -28,6 +28,7 @@ def main():
         after_file = json.load(f)
 
     pendingRewards = after_file
+
     # pendingRewards = fetch_current_rewards_tree(badger)
     currentRewards = fetch_current_rewards_tree(badger)
 
@@ -65,7 +66,14 @@ def main():
     assert badger.badgerTree.getRoleMemberCount(UNPAUSER_ROLE) == 1
 
 
-    verify_rewards(badger, pendingRewards["startBlock"], pendingRewards["endBlock"], currentRewards, pendingRewards)
+    verify_rewards(
+        badger,
+        pendingRewards["startBlock"],
+        pendingRewards["endBlock"],
+        currentRewards,
+        pendingRewards,
+        contentFileName=pendingFile,
+    )
     # push_rewards(badger, pendingContentHash)
 
     # if rpc.is_active():
@@ -0,0 +1,26 @@
+from brownie import *
+from config.badger_config import badger_config
+from rich.console import Console
+from scripts.systems.badger_system import connect_badger
+
+from assistant.rewards.rewards_assistant import verify_rewards_tree
+
+console = Console()
+
+# Fraction of claims to validate proofs for, set to 1 to check every proof
+proof_sample = 0.05
+
+
+def main():
+    """
+    Verify-only: recompute the current (and pending, if any) tree roots from their content files
+    """
+    badger = connect_badger(badger_config.prod_json)
+
+    results = [verify_rewards_tree(badger, pending=False, proofSample=proof_sample)]
+
+    if badger.badgerTree.hasPendingRoot():
+        results.append(verify_rewards_tree(badger, pending=True, proofSample=proof_sample))
+
+    for result in results:
+        assert result["valid"]
@@ -0,0 +1,106 @@
+import time
+from contextlib import contextmanager
+
+from eth_abi import encode_single
+from eth_utils import to_checksum_address
+from rich.console import Console
+from tabulate import tabulate
+
+from helpers.multicall import Call, as_wei, func
+from helpers.multicall import call as call_module
+from helpers.multicall.signature import Signature
+from helpers.sett.snapshot_plan import SnapshotPlan, SnapshotPlanCache
+
+console = Console()
+
+"""
+Snapshot-shaped Call construction, encoding and decoding, without a node
+(entities x tokens balance calls plus sett / strategy reads, as a resolver builds them)
+
+Three ways of preparing each snap are timed:
+- uncached: every Call is rebuilt with its own Signature, so selectors, codecs and calldata are computed each time
+- rebuilt:  every Call is rebuilt, sharing Signatures and their calldata cache
+- plan:     the SnapshotPlanCache plan is compiled once and its Calls are reused for every snap
+"""
+
+
+def build_calls(entities, tokens):
+    calls = []
+    for tokenKey, token in tokens.items():
+        for entityKey, entity in entities.items():
+            calls.append(
+                Call(
+                    token,
+                    [func.erc20.balanceOf, entity],
+                    [["balances." + tokenKey + "." + entityKey, as_wei]],
+                )
+            )
+    for tokenKey, token in tokens.items():
+        calls.append(Call(token, [func.sett.getPricePerFullShare], [[tokenKey + ".ppfs", as_wei]]))
+        calls.append(Call(token, [func.strategy.balanceOfPool], [[tokenKey + ".balanceOfPool", as_wei]]))
+        calls.append(Call(token, [func.erc20.totalSupply], [[tokenKey + ".totalSupply", as_wei]]))
+    return calls
+
+
+@contextmanager
+def uncached():
+    """
+    Calls built inside get a fresh Signature and an unmemoized checksum, as before signatures were shared
+    """
+    (getSignature, checksum) = (call_module.get_signature, call_module.checksum)
+    call_module.get_signature = Signature
+    call_module.checksum = to_checksum_address
+    try:
+        yield
+    finally:
+        (call_module.get_signature, call_module.checksum) = (getSignature, checksum)
+
+
+def time_snaps(prepare, snaps, output):
+    """
+    prepare() -> plan for one snap; returns (build, decode) seconds per snap
+    """
+    timings = {"build": 0, "decode": 0}
+    for i in range(snaps):
+        start = time.time()
+        plan = prepare()
+        timings["build"] += time.time() - start
+
+        start = time.time()
+        for call in plan.calls:
+            call.decode_output(output)
+        timings["decode"] += time.time() - start
+    return (timings["build"] / snaps, timings["decode"] / snaps, len(plan.calls))
+
+
+def main(numEntities=40, numTokens=8, snaps=50):
+    entities = {"entity{}".format(i): "0x{:040x}".format(i + 1) for i in range(int(numEntities))}
+    tokens = {"token{}".format(i): "0x{:040x}".format(0xBADE0000 + i) for i in range(int(numTokens))}
+    output = encode_single("(uint256)", [10 ** 18])
+    snaps = int(snaps)
+
+    def fresh():
+        # SnapshotPlan encodes every call's data and resolves the schema
+        return SnapshotPlan(build_calls(entities, tokens), entities)
+
+    with uncached():
+        results = {"uncached": time_snaps(fresh, snaps, output)}
+    results["rebuilt"] = time_snaps(fresh, snaps, output)
+
+    plans = SnapshotPlanCache(lambda entities: build_calls(entities, tokens))
+    results["plan"] = time_snaps(lambda: plans.get(entities), snaps, output)
+
+    baseline = sum(results["uncached"][:2])
+    table = [
+        [
+            name,
+            "{:.2f}ms".format(build * 1000),
+            "{:.2f}ms".format(decode * 1000),
+            "{:.2f}ms".format((build + decode) * 1000),
+            "{:.1f}x".format(baseline / (build + decode)),
+        ]
+        for name, (build, decode, numCalls) in results.items()
+    ]
+    console.print("{} calls per snap, {} snaps".format(results["plan"][2], snaps))
+    print(tabulate(table, headers=["mode", "build", "decode", "total", "speedup"]))
+    return results
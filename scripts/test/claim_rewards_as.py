@@ -1,6 +1,8 @@
 from helpers.time_utils import days
 import os
 import json
+from assistant.rewards.proof_index import ProofIndex, index_filenames
+from scripts.rewards.build_proof_index import build_proof_index
 from scripts.systems.badger_system import connect_badger
 import warnings
 from tabulate import tabulate
@@ -21,13 +23,15 @@ def main():
     token = badger.token
     tree = badger.badgerTree
 
-    with open(rewardsFile) as f:
-        merkleTree = json.load(f)
+    # Look up claims through the proof index rather than parsing the whole file
+    if not os.path.exists(index_filenames(rewardsFile)[0]):
+        build_proof_index(rewardsFile)
+    proofIndex = ProofIndex(rewardsFile)
 
     users = ["0xe450058b0023047C78Ca50a32356dA27DF984734"]
     for user in users:
         accounts.at(user, force=True)
-        claim = merkleTree["claims"][user]
+        claim = proofIndex.get(user)
         pre = badger.token.balanceOf(user)
         print(pre)
         encoded = tree.claim.encode_input(
@@ -0,0 +1,31 @@
+from rich.console import Console
+
+from helpers.sett.simulation.ActionTrace import TraceReplayer, load_trace
+from helpers.sett.simulation.SimulationRunner import DIGG_SETTS
+from helpers.sett.DiggSnapshotManager import DiggSnapshotManager
+from helpers.sett.SnapshotManager import SnapshotManager
+from tests.conftest import badger_single_sett
+
+console = Console()
+
+"""
+Replay a recorded simulation trace, or bisect it to the smallest failing prefix
+
+    brownie run scripts/test/replay_trace.py main traces/native.badger-42.jsonl
+    brownie run scripts/test/replay_trace.py main traces/native.badger-42.jsonl 120
+    brownie run scripts/test/replay_trace.py main traces/native.badger-42.jsonl all true
+"""
+
+
+def main(path, numActions="all", bisect=False, checkpointEvery=10, mode="test"):
+    (header, entries) = load_trace(path)
+    settId = header["settId"]
+    console.print("Trace of {}: seed {}, {} actions".format(settId, header["seed"], len(entries)))
+
+    badger = badger_single_sett({"id": settId, "mode": mode})
+    snapClass = DiggSnapshotManager if settId in DIGG_SETTS else SnapshotManager
+    replayer = TraceReplayer(badger, snapClass(badger, settId), path, checkpointEvery=int(checkpointEvery))
+
+    if str(bisect).lower() in ["true", "1"]:
+        return replayer.bisect()
+    return replayer.replay(None if numActions == "all" else int(numActions))
@@ -0,0 +1,45 @@
+from rich.console import Console
+
+from helpers.sett.SnapshotManager import SnapshotManager
+from helpers.sett.simulation.ShadowFuzzer import ShadowFuzzer, cross_check
+from helpers.sett.simulation.ShadowSett import strategy_profile
+from helpers.sett.simulation.SimulationManager import SimulationManager
+from tests.conftest import badger_single_sett
+
+console = Console()
+
+"""
+Fuzz a sett's shadow model, then cross-check windows on chain
+
+    brownie run scripts/test/shadow_fuzz.py main native.badger 100 100000 5
+
+Runs numSeeds x numActions model actions, then replays the window before each failure (and sampled windows
+up to numWindows in total) on chain through SimulationManager, reporting where model and contracts disagree.
+"""
+
+
+def main(settId="native.badger", numSeeds=100, numActions=100000, numWindows=5, windowSize=30):
+    badger = badger_single_sett({"id": settId, "mode": "test"})
+    strategy = badger.getStrategy(settId)
+    profile = strategy_profile(strategy.getName())
+
+    fuzzer = ShadowFuzzer(profile, windowSize=int(windowSize))
+    failures = fuzzer.fuzz(range(1, int(numSeeds) + 1), int(numActions))
+
+    windows = [failure.window for failure in failures[: int(numWindows)]]
+    seed = 1
+    while len(windows) < int(numWindows):
+        windows.append(fuzzer.sample_window(seed, int(windowSize)))
+        seed += 1
+
+    snap = SnapshotManager(badger, settId)
+    simulation = SimulationManager(badger, snap, settId, seed=1)
+    simulation.provision()
+
+    mismatching = 0
+    for window in windows:
+        results = cross_check(simulation, window, profile)
+        mismatching += len(results)
+        for index, actionType, mismatches in results:
+            console.print("[red]{} {}: {}[/red]".format(index, actionType, mismatches[:3]))
+    console.print("{} windows cross-checked, {} mismatching actions".format(len(windows), mismatching))
@@ -0,0 +1,55 @@
+import json
+
+from rich.console import Console
+
+from helpers.sett.simulation.SimulationRunner import SimulationRunner
+
+console = Console()
+
+"""
+Run a range of simulation seeds for one sett across parallel local dev chains
+
+    brownie run scripts/test/simulate_seeds.py main native.badger 1 100 4 30
+
+With a provisionSeed (7th argument) every seed starts from one cached provisioned state per worker.
+Action traces are written to traceDir (8th argument), replayable with scripts/test/replay_trace.py.
+With a report path (9th argument), per action type timings, RPC calls, txs and gas are printed and saved as JSON.
+
+Failing seeds are written to simulation-failures.json, each one reproducible on its own with
+SimulationManager(badger, snap, settId, seed).
+"""
+
+
+def main(
+    settId="native.badger",
+    firstSeed=1,
+    numSeeds=20,
+    workers=4,
+    numActions=30,
+    output="simulation-failures.json",
+    provisionSeed=None,
+    traceDir=None,
+    report=None,
+):
+    firstSeed = int(firstSeed)
+    runner = SimulationRunner(
+        settId,
+        workers=int(workers),
+        numActions=int(numActions),
+        provisionSeed=int(provisionSeed) if provisionSeed is not None else None,
+        traceDir=traceDir,
+        metrics=report is not None,
+    )
+    runner.run(range(firstSeed, firstSeed + int(numSeeds)))
+    runner.print_report()
+
+    if report:
+        with open(report, "w") as f:
+            json.dump(runner.metrics_report(), f, indent=4)
+        console.print("Simulation report written to {}".format(report))
+
+    failures = runner.failures()
+    if failures:
+        with open(output, "w") as f:
+            json.dump({"settId": settId, "numActions": int(numActions), "failures": failures}, f, indent=4)
+        console.print("Failing seeds written to {}".format(output))
@@ -1,4 +1,5 @@
 from assistant.rewards.rewards_assistant import fetch_current_rewards_tree
+from assistant.rewards.claims_verifier import verify_all_claims
 import json
 import secrets
 import random
@@ -168,6 +169,9 @@ def test_rewards_flow():
     badger = connect_badger(badger_config.prod_json)
     tree = badger.badgerTree
     pct_claims_to_verify = 0.001
+
+    # Additional forked nodes (same fork block) to spread sample claims across
+    fork_rpc_urls = None
     
     tokens_to_check = [
         badger.token,
@@ -187,15 +191,17 @@ def test_rewards_flow():
     active_claims = fetch_current_rewards_tree(badger)
     claims = active_claims["claims"]
 
-    users_to_verify = []
+    # Bulk check every claim, claiming for a stratified sample with latest root
+    result = verify_all_claims(
+        tree.address,
+        active_claims,
+        rpcUrls=fork_rpc_urls,
+        sampleSize=max(1, int(len(claims) * pct_claims_to_verify)),
+        shareTokens=[badger.digg.token.address],
+    )
+    assert result["valid"]
 
-    # Test claims with latest root
-    for user, claim in claims.items():
-        roll = random.random()
-        if roll < pct_claims_to_verify:
-            console.print(roll, pct_claims_to_verify)
-            users_to_verify.append(user)
-            test_claim(badger, user, claim, tokens_to_check)
+    users_to_verify = [sample["user"] for sample in result["sample"]]
 
     retroactive_content_hash = "0x346ec98585b52d981d43584477e1b831ce32165cb8e0a06d14d236241b36328e"
     retroactive_file_name = "rewards-1-" + retroactive_content_hash + ".json"
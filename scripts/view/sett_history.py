@@ -0,0 +1,49 @@
+from brownie import *
+from rich.console import Console
+from tabulate import tabulate
+
+from config.badger_config import badger_config
+from helpers.multicall import Call, CallError, as_wei, func, multicall_at_blocks
+from helpers.utils import val
+from scripts.systems.badger_system import connect_badger
+
+console = Console()
+
+"""
+Price per share and supply of every sett over a range of blocks, read from an archive node
+One multicall per block, several blocks in flight at once
+"""
+
+
+def sett_history_calls(badger):
+    calls = []
+    for key, sett in badger.sett_system.vaults.items():
+        calls.append(
+            Call(sett.address, [func.sett.getPricePerFullShare], [[(key, "ppfs"), as_wei]])
+        )
+        calls.append(
+            Call(sett.address, [func.erc20.totalSupply], [[(key, "totalSupply"), as_wei]])
+        )
+    return calls
+
+
+def main(startBlock=None, endBlock=None, step=6500):
+    badger = connect_badger(badger_config.prod_json)
+
+    endBlock = int(endBlock or chain.height)
+    startBlock = int(startBlock or endBlock - 30 * step)
+    blocks = list(range(startBlock, endBlock + 1, int(step)))
+
+    history = multicall_at_blocks(sett_history_calls(badger), blocks)
+
+    for key in badger.sett_system.vaults.keys():
+        table = []
+        for block in blocks:
+            data = history[block]
+            # Setts deployed after the block return a CallError
+            table.append(
+                [block]
+                + ["-" if isinstance(data[(key, field)], CallError) else val(data[(key, field)]) for field in ["ppfs", "totalSupply"]]
+            )
+        console.print("\n[green]===== {} =====[/green]".format(key))
+        print(tabulate(table, headers=["block", "pricePerFullShare", "totalSupply"]))
@@ -1,7 +1,8 @@
 from brownie import *
 from rich.console import Console
 from config.badger_config import badger_config
-from helpers.sett.SnapshotManager import SnapshotManager
+from helpers.sett.SystemSnapshotManager import SystemSnapshotManager
+from helpers.sett.snapshot_store import open_default_store
 from scripts.systems.badger_system import connect_badger
 from tabulate import tabulate
 
@@ -11,9 +12,15 @@ console = Console()
 def main():
     badger = connect_badger(badger_config.prod_json)
     console.print("\n[white]===== 🦡 Sett Status 🦡 =====[white]\n")
-    for key in badger.sett_system.vaults.keys():
-        snap = SnapshotManager(badger, key)
-        state = snap.snap()
+    system = SystemSnapshotManager(badger, store=open_default_store())
+
+    # Every sett at one block, in one chunked multicall
+    snaps = system.snap()
+
+    for key, state in snaps.items():
+        snap = system.manager(key)
         snap.printPermissions()
         snap.printTable(state)
 
+    if system.store:
+        system.store.close()
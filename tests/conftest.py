@@ -278,6 +278,11 @@ def badger_single_sett(settConfig, deploy=True):
                 # In this case, both the lp token and pid (pool id) exist so we can pass them in.
                 want=registry.pancake.chefPairs.bnbBtcb,
                 pid=registry.pancake.chefPids.bnbBtcb,
+                strategist=strategist,
+                guardian=guardian,
+                keeper=keeper,
+                governance=governance,
+            ).deploy(deploy=deploy)
         if settId == "native.sushiWbtcIbBtc":
             return SushiWbtcIbBtcLpOptimizerMiniDeploy(
                 "native.sushiWbtcIbBtc",
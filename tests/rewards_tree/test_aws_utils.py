@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from assistant.rewards import aws_utils
+from assistant.rewards.local_s3 import LocalS3Client
+from assistant.rewards.proof_index import index_filenames, write_proof_index
+from config.env_config import env_config
+
+
+@pytest.fixture
+def local_s3(tmp_path):
+    aws_utils.set_s3(LocalS3Client(str(tmp_path / "s3")))
+    yield
+    # The client is module global, don't leak it into later tests
+    aws_utils.set_s3(None)
+
+
+@pytest.mark.parametrize("gzipUploads", [False, True])
+def test_upload_download_local(tmp_path, local_s3, monkeypatch, gzipUploads):
+    monkeypatch.setattr(env_config, "s3_gzip_uploads", gzipUploads)
+
+    fileName = str(tmp_path / "rewards-1-0xabc.json")
+    tree = {"merkleRoot": "0x01", "cycle": 1, "claims": {}}
+    with open(fileName, "w") as f:
+        json.dump(tree, f)
+
+    # Published targets are written concurrently
+    aws_utils.upload(fileName)
+    for target in aws_utils.get_upload_targets(fileName):
+        assert json.loads(
+            aws_utils.open_object(target["bucket"], target["key"]).read()
+        ) == tree
+
+    aws_utils.upload(fileName, publish=False)
+    assert aws_utils.download_bucket_json(fileName) == tree
+    assert json.loads(aws_utils.download_bucket(fileName)) == tree
+
+    localCopy = str(tmp_path / "copy.json")
+    aws_utils.download_bucket_to_file(fileName, localCopy)
+    with open(localCopy) as f:
+        assert json.load(f) == tree
+    assert not os.path.exists(localCopy + ".tmp")
+
+
+def test_upload_proof_index(tmp_path, local_s3, monkeypatch):
+    monkeypatch.setattr(env_config, "s3_gzip_uploads", True)
+
+    fileName = str(tmp_path / "rewards-1-0xabc.json")
+    user = "0x" + "11" * 20
+    tree = {
+        "merkleRoot": "0x" + "01" * 32,
+        "cycle": 1,
+        "claims": {
+            user: {
+                "index": "0x0",
+                "user": user,
+                "cycle": "0x1",
+                "tokens": ["0x" + "22" * 20],
+                "cumulativeAmounts": ["100"],
+                "proof": ["0x" + "33" * 32],
+                "node": "0x",
+            }
+        },
+    }
+    with open(fileName, "w") as f:
+        json.dump(tree, f)
+    write_proof_index(tree, fileName)
+
+    # Uploaded raw beside the content file, even when the content file is gzipped
+    aws_utils.upload(fileName, publish=False)
+    for path in index_filenames(fileName):
+        stream = aws_utils.open_object(aws_utils.upload_bucket, aws_utils.rewards_file_key(path))
+        with open(path, "rb") as f:
+            assert stream.read() == f.read()
+        stream.close()
@@ -0,0 +1,77 @@
+from assistant.rewards import claims_verifier
+from assistant.rewards.claims_verifier import check_claims_bulk, claim_stratum, stratified_sample
+
+TOKENS = ["0xbadger", "0xdigg"]
+
+
+def make_claim(*amounts):
+    return {"tokens": TOKENS[: len(amounts)], "cumulativeAmounts": [str(amount) for amount in amounts]}
+
+
+def test_claim_stratum():
+    # Claimable amounts are grouped by thousands
+    assert claim_stratum(make_claim(5000, 1), [4000, 0], True) == (True, 2, 1)
+    assert claim_stratum(make_claim(10 ** 18), [0], True) == (True, 1, 6)
+    assert claim_stratum(make_claim(10 ** 18), [10 ** 18 - 999], True) == (True, 1, 0)
+    # Nothing left to claim
+    assert claim_stratum(make_claim(10 ** 18, 5), [10 ** 18, 0], False) == (False, 2, -1)
+
+
+def test_check_claims_bulk_regressions(monkeypatch):
+    claims = {
+        "alice": make_claim(100, 50),
+        "bob": make_claim(100, 50),
+        "carol": make_claim(100, 50),
+    }
+    claimed = {"alice": [40, 50], "bob": [100, 50], "carol": [100, 60]}
+    monkeypatch.setattr(claims_verifier, "fetch_claimed", lambda tree, claims, chunkSize: claimed)
+
+    requested = []
+
+    def fetch_claim_available(tree, claims, users, chunkSize):
+        requested.extend(users)
+        # bob's claim is reported available even though it was fully claimed
+        return {user: True for user in users}
+
+    monkeypatch.setattr(claims_verifier, "fetch_claim_available", fetch_claim_available)
+
+    bulk = check_claims_bulk("0xtree", claims)
+    # carol has claimed more digg than the file gives her
+    assert bulk["regressed"] == ["carol"]
+    # isClaimAvailableFor would revert for carol, so she is left out of the aggregate
+    assert requested == ["alice", "bob"]
+    assert bulk["availabilityMismatch"] == ["bob"]
+    assert bulk["claimableTotals"] == {"0xbadger": 60, "0xdigg": 0}
+
+
+def test_stratified_sample():
+    claims = {}
+    claimed = {}
+    available = {}
+    # 90 small claims, 9 large ones, 1 already claimed, 5 regressed
+    for i in range(90):
+        claims["small{}".format(i)] = make_claim(10 ** 3)
+        claimed["small{}".format(i)] = [0]
+        available["small{}".format(i)] = True
+    for i in range(9):
+        claims["large{}".format(i)] = make_claim(10 ** 21)
+        claimed["large{}".format(i)] = [0]
+        available["large{}".format(i)] = True
+    claims["done"] = make_claim(10 ** 18)
+    claimed["done"] = [10 ** 18]
+    available["done"] = False
+    for i in range(5):
+        claims["regressed{}".format(i)] = make_claim(1)
+        claimed["regressed{}".format(i)] = [2]
+    bulk = {"claimed": claimed, "available": available, "regressed": ["regressed{}".format(i) for i in range(5)]}
+
+    sample = stratified_sample(claims, bulk, 10)
+    assert len(sample) == len(set(sample))
+    assert not any(user.startswith("regressed") for user in sample)
+    # Proportional, with every stratum represented
+    assert len([user for user in sample if user.startswith("small")]) == 9
+    assert len([user for user in sample if user.startswith("large")]) == 1
+    assert "done" in sample
+
+    # Deterministic for a seed
+    assert stratified_sample(claims, bulk, 10) == sample
@@ -0,0 +1,54 @@
+import random
+
+from assistant.rewards.BadgerGeyserMock import BadgerGeyserMock
+from assistant.rewards.calc_stakes import build_actions, process_actions
+from assistant.rewards.rewards_state import GeyserCheckpoints
+from config.badger_config import globalStartTime
+
+
+def random_events(seed, numUsers=20, numEvents=400):
+    rng = random.Random(seed)
+    users = ["0x{:040x}".format(i + 1) for i in range(numUsers)]
+    totals = {user: 0 for user in users}
+    events = {"Staked": [], "Unstaked": []}
+    timestamp = globalStartTime
+    for block in range(numEvents):
+        timestamp += rng.randint(1, 4000)
+        user = rng.choice(users)
+        if totals[user] > 0 and rng.random() < 0.4:
+            amount = rng.randint(1, totals[user])
+            totals[user] -= amount
+            name = "Unstaked"
+        else:
+            amount = rng.randint(1, 10 ** 20)
+            totals[user] += amount
+            name = "Staked"
+        events[name].append(
+            {"user": user, "amount": amount, "total": totals[user], "timestamp": timestamp, "blockNumber": block}
+        )
+    return (events, timestamp)
+
+
+def test_checkpoints_match_full_replay():
+    (events, lastTimestamp) = random_events(3)
+    checkpoints = GeyserCheckpoints()
+
+    boundaries = [globalStartTime + 200000 * i for i in range(1, 5)] + [lastTimestamp]
+    for (startTime, endTime) in zip(boundaries, boundaries[1:]):
+        inPeriod = {
+            name: [event for event in entries if event["timestamp"] <= endTime]
+            for name, entries in events.items()
+        }
+
+        expected = BadgerGeyserMock("test")
+        expected.set_current_period(startTime, endTime)
+        process_actions(expected, build_actions(inPeriod), 0, 0, "test")
+
+        warm = checkpoints.mock_for_period("test", build_actions(inPeriod), startTime, endTime)
+
+        assert warm.totalShareSecondsInRange == expected.totalShareSecondsInRange
+        assert warm.totalShareSeconds == expected.totalShareSeconds
+        assert set(warm.users.keys()) == set(expected.users.keys())
+        for user, data in expected.users.items():
+            assert warm.users[user].shareSecondsInRange == data.shareSecondsInRange
+            assert warm.users[user].shareSeconds == data.shareSeconds
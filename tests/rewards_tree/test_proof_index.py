@@ -0,0 +1,65 @@
+import secrets
+
+from eth_utils import to_checksum_address
+
+from assistant.rewards.proof_index import ProofIndex, write_proof_index
+
+
+def random_address():
+    return to_checksum_address("0x" + secrets.token_hex(20))
+
+
+def random_32_bytes():
+    return "0x" + secrets.token_hex(32)
+
+
+def random_tree(numClaims):
+    tokens = [random_address() for i in range(3)]
+    claims = {}
+    for i in range(numClaims):
+        user = random_address()
+        claims[user] = {
+            "index": hex(i),
+            "user": user,
+            "cycle": hex(42),
+            "tokens": tokens,
+            "cumulativeAmounts": [str(secrets.randbits(128)) for token in tokens],
+            "proof": [random_32_bytes() for j in range(12)],
+            "node": "0x",
+        }
+    return {"merkleRoot": random_32_bytes(), "cycle": 42, "claims": claims}
+
+
+def test_proof_index_lookup(tmp_path):
+    tree = random_tree(500)
+    contentFileName = str(tmp_path / "rewards-1-{}.json".format(random_32_bytes()))
+
+    write_proof_index(tree, contentFileName)
+
+    with ProofIndex(contentFileName) as index:
+        assert len(index) == 500
+        assert index.cycle == 42
+        assert index.merkleRoot == tree["merkleRoot"]
+
+        for user, claim in tree["claims"].items():
+            indexed = index.get(user.lower())
+            assert indexed["user"] == user
+            assert indexed["index"] == claim["index"]
+            assert indexed["cycle"] == claim["cycle"]
+            assert indexed["tokens"] == claim["tokens"]
+            assert indexed["cumulativeAmounts"] == claim["cumulativeAmounts"]
+            assert indexed["proof"] == claim["proof"]
+
+        assert index.get(random_address()) is None
+        assert sorted(index.addresses()) == sorted(tree["claims"].keys())
+
+
+def test_proof_index_empty_tree(tmp_path):
+    tree = random_tree(0)
+    contentFileName = str(tmp_path / "rewards-1-empty.json")
+
+    write_proof_index(tree, contentFileName)
+
+    with ProofIndex(contentFileName) as index:
+        assert len(index) == 0
+        assert index.get(random_address()) is None
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from assistant.rewards.rewards_cache import RewardsCache, content_hash_of_root
+
+
+def make_downloader(trees, calls):
+    def download(fileName, path):
+        calls.append(fileName)
+        with open(path, "w") as f:
+            json.dump(trees[fileName], f)
+
+    return download
+
+
+def test_rewards_cache(tmp_path):
+    trees = {}
+    for cycle in range(1, 4):
+        root = "0x" + "{:064x}".format(cycle)
+        trees["rewards-1-{}.json".format(cycle)] = {
+            "merkleRoot": root,
+            "cycle": cycle,
+            "claims": {"0x" + "11" * 20: {"cumulativeAmounts": ["1" * 200]}},
+        }
+
+    calls = []
+    download = make_downloader(trees, calls)
+    cache = RewardsCache(str(tmp_path / "cache"))
+
+    fileName = "rewards-1-1.json"
+    contentHash = content_hash_of_root(trees[fileName]["merkleRoot"])
+
+    # Second fetch of an unchanged hash is served from disk
+    path = cache.fetch(fileName, contentHash, download)
+    assert cache.fetch(fileName, contentHash, download) == path
+    assert calls == [fileName]
+
+    # Corrupt entries are dropped and fetched again
+    with open(path, "a") as f:
+        f.write(" ")
+    assert cache.get(fileName, contentHash) is None
+    cache.fetch(fileName, contentHash, download)
+    assert calls == [fileName, fileName]
+
+    # A file that does not match its content hash is rejected
+    with pytest.raises(Exception):
+        cache.fetch("rewards-1-2.json", contentHash, download)
+
+    # Oldest cycles are evicted first once over the size bound
+    cache.maxBytes = cache.size() + 1
+    for cycle in [2, 3]:
+        name = "rewards-1-{}.json".format(cycle)
+        cache.fetch(name, content_hash_of_root(trees[name]["merkleRoot"]), download)
+    assert [entry["cycle"] for entry in cache.entries()] == [3]
@@ -0,0 +1,70 @@
+import pytest
+
+from assistant.rewards.rewards_checker import diff_rewards
+from assistant.rewards.rewards_diff import diff_content_files
+
+badger = "0x3472A5A71965499acd81997a54BBA8D852C6E53d"
+digg = "0x798D1bE841a82a273720CE31c822C61a67a601C3"
+
+
+def make_tree(claims):
+    totals = {}
+    for user, amounts in claims.items():
+        for token, amount in amounts.items():
+            totals[token] = totals.get(token, 0) + amount
+    return {
+        "tokenTotals": totals,
+        "claims": {
+            user: {
+                "tokens": list(amounts.keys()),
+                "cumulativeAmounts": [str(amount) for amount in amounts.values()],
+            }
+            for user, amounts in claims.items()
+        },
+    }
+
+
+def test_rewards_diff():
+    before = make_tree(
+        {"a": {badger: 100, digg: 10}, "b": {badger: 50}, "c": {digg: 5}}
+    )
+    after = make_tree(
+        {
+            # Token order differs between users and files
+            "a": {digg: 12, badger: 110},
+            "b": {badger: 40, digg: 1},
+            "d": {badger: 1000},
+        }
+    )
+
+    diff = diff_content_files(before, after)
+
+    # b's badger dropped, and c disappeared from the after file
+    assert sorted(diff.regressions()) == [("b", badger, 50, 40), ("c", digg, 5, 0)]
+    assert diff.token_total_mismatches() == []
+
+    totals = diff.totals()
+    assert totals[badger] == {"before": 150, "after": 1150, "delta": 1000}
+    assert totals[digg]["delta"] == -2
+
+    assert diff.emission_mismatches({badger: 1000}) == []
+    assert diff.emission_mismatches({badger: 500}) == [(badger, 500, 1000)]
+
+    # New users count towards absolute outliers, but not relative ones
+    outliers = diff.outliers(badger, p=50)
+    assert outliers["absolute"][0] == ("d", 0, 1000)
+    assert [entry[0] for entry in outliers["relative"]] == ["a"]
+    assert diff.new_users(badger) == 1
+
+
+def test_diff_rewards_emissions():
+    before = make_tree({"a": {badger: 100}, "b": {badger: 50}})
+    after = make_tree({"a": {badger: 600}, "b": {badger: 550}})
+
+    # Within tolerance of what the geysers unlocked
+    diff_rewards(None, before, after, expected={badger: 1005})
+
+    # The after file hands out more than was emitted
+    overEmitted = make_tree({"a": {badger: 700}, "b": {badger: 550}})
+    with pytest.raises(AssertionError):
+        diff_rewards(None, before, overEmitted, expected={badger: 1000})
@@ -0,0 +1,55 @@
+import json
+import os
+
+from assistant.rewards.RewardsLogger import RewardsLogger
+from assistant.rewards.rewards_log import aggregate_log
+
+
+class StubUser:
+    def __init__(self, address, shareSeconds):
+        self.address = address
+        self.shareSeconds = shareSeconds
+
+
+def test_rewards_logger_stream(tmp_path):
+    logger = RewardsLogger(logDir=str(tmp_path), batchSize=3)
+    badger = "0x3472A5A71965499acd81997a54BBA8D852C6E53d"
+
+    for epoch in range(2):
+        users = [StubUser("0x{:040x}".format(i), 10 * (i + epoch)) for i in range(4)]
+        logger.add_epoch_data(users, "native.badger", badger, 2, epoch)
+        for user in users:
+            logger.add_user_share_seconds(user.address, "native.badger", user.shareSeconds)
+            logger.add_user_token(user.address, "native.badger", badger, 2 * user.shareSeconds)
+    logger.add_multiplier("0x{:040x}".format(1), "native.badger", 1.5)
+    logger.add_unlock_schedule(badger, [1, 2, 3, 4])
+    logger.add_distribution_info("native.badger", {badger: 100})
+
+    logger.save("rewards", summary=True)
+
+    with open(os.path.join(str(tmp_path), "rewards.json")) as f:
+        summary = json.load(f)
+
+    user = summary["userData"]["native.badger"]["0x{:040x}".format(1)]
+    assert user == {"shareSeconds": 30, "totals": {badger: 60}, "multiplier": 1.5}
+    assert summary["retroactiveData"]["native.badger"]["1"]["0x{:040x}".format(3)] == {
+        "shareSeconds": 40,
+        "totals": {badger: 80},
+    }
+    assert summary["unlockSchedules"] == {badger: [1, 2, 3, 4]}
+    assert summary["distributionInfo"] == {"native.badger": {badger: 100}}
+
+    (totals, counts) = aggregate_log(
+        os.path.join(str(tmp_path), "rewards.jsonl"), ["epoch"], type="epoch"
+    )
+    assert totals == {(0,): 120, (1,): 200}
+    assert counts == {(0,): 4, (1,): 4}
+
+
+def test_rewards_logger_no_summary_by_default(tmp_path):
+    logger = RewardsLogger(logDir=str(tmp_path))
+    logger.add_user_share_seconds("0x{:040x}".format(1), "native.badger", 10)
+    logger.save("retroactive")
+
+    assert os.path.exists(os.path.join(str(tmp_path), "retroactive.jsonl"))
+    assert not os.path.exists(os.path.join(str(tmp_path), "retroactive.json"))
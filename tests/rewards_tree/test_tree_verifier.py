@@ -0,0 +1,117 @@
+import json
+import secrets
+
+from eth_abi import encode_abi
+from eth_utils import encode_hex, to_checksum_address
+
+from assistant.rewards.merkle_tree import MerkleTree
+from assistant.rewards.rewards_stream import ContentFileStream
+from assistant.rewards.tree_verifier import StreamingMerkleRoot, verify_content_file, verify_proofs
+
+
+def random_address():
+    return to_checksum_address("0x" + secrets.token_hex(20))
+
+
+def write_content_file(path, numClaims, cycle=3):
+    tokens = [random_address(), random_address()]
+    entries = []
+    for index in range(numClaims):
+        user = random_address()
+        amounts = [secrets.randbits(96) for token in tokens]
+        encoded = encode_hex(
+            encode_abi(
+                ["uint", "address", "uint", "address[]", "uint[]"],
+                (index, user, cycle, tokens, amounts),
+            )
+        )
+        entries.append((user, index, amounts, encoded))
+
+    tree = MerkleTree([entry[3] for entry in entries])
+    content = {
+        "merkleRoot": encode_hex(tree.root),
+        "cycle": cycle,
+        "startBlock": "1",
+        "endBlock": "2",
+        "tokenTotals": {},
+        "claims": {},
+        "metadata": {},
+    }
+    for (user, index, amounts, encoded) in entries:
+        content["claims"][user] = {
+            "index": hex(index),
+            "user": user,
+            "cycle": hex(cycle),
+            "tokens": tokens,
+            "cumulativeAmounts": [str(amount) for amount in amounts],
+            "proof": tree.get_proof(encoded),
+            "node": encoded,
+        }
+
+    with open(path, "w") as f:
+        json.dump(content, f, indent=4)
+    return content
+
+
+def test_streaming_root_matches_merkle_tree():
+    for numLeaves in range(1, 40):
+        elements = ["0x" + secrets.token_hex(64) for i in range(numLeaves)]
+        tree = MerkleTree(elements)
+
+        folder = StreamingMerkleRoot()
+        for leaf in tree.elements:
+            folder.add(leaf)
+
+        assert folder.root() == tree.root
+
+
+def test_content_stream_small_chunks(tmp_path):
+    path = str(tmp_path / "rewards.json")
+    content = write_content_file(path, 50)
+
+    stream = ContentFileStream(path, chunkSize=64)
+    assert dict(stream.claims()) == content["claims"]
+    assert stream.header["merkleRoot"] == content["merkleRoot"]
+    assert stream.header["metadata"] == {}
+
+
+def test_verify_content_file(tmp_path):
+    path = str(tmp_path / "rewards.json")
+    content = write_content_file(path, 300)
+
+    result = verify_content_file(
+        path, expectedRoot=content["merkleRoot"], proofSample=1, processes=2
+    )
+    assert result["valid"]
+    assert result["numClaims"] == 300
+    assert result["numProofsChecked"] == 300
+
+    # Tampering with an amount must be caught by the node check
+    user = list(content["claims"].keys())[7]
+    content["claims"][user]["cumulativeAmounts"][0] = "1"
+    with open(path, "w") as f:
+        json.dump(content, f)
+
+    result = verify_content_file(path, proofSample=0)
+    assert not result["valid"]
+    assert result["badNodes"] == [user]
+
+
+def test_verify_proofs(tmp_path):
+    path = str(tmp_path / "rewards.json")
+    content = write_content_file(path, 250)
+
+    result = verify_proofs(path, expectedRoot=content["merkleRoot"], processes=2, chunkSize=16)
+    assert result["valid"]
+    assert result["numProofsChecked"] == 250
+
+    # A swapped proof element must fail for that claim only
+    user = list(content["claims"].keys())[11]
+    proof = content["claims"][user]["proof"]
+    proof[0] = "0x" + secrets.token_hex(32)
+    with open(path, "w") as f:
+        json.dump(content, f)
+
+    result = verify_proofs(path, processes=2)
+    assert not result["valid"]
+    assert result["badProofs"] == [user]
@@ -0,0 +1,70 @@
+import pytest
+
+from helpers.sett.simulation.ShadowFuzzer import ShadowFuzzer
+from helpers.sett.simulation.ShadowSett import (
+    ModelRevert,
+    ShadowSett,
+    StrategyProfile,
+    max_round_trip_loss,
+    strategy_profile,
+)
+
+
+def test_shadow_sett_share_math():
+    model = ShadowSett(StrategyProfile(withdrawIdleFirst=False, withdrawalFee=75))
+    model.add_user("alice", 1000)
+    model.add_user("bob", 1000)
+
+    assert model.deposit("alice", 600) == 600
+    model.earn()
+    assert (model.settWant, model.pool) == (30, 570)
+
+    # Harvested yield grows ppfs, later deposits get fewer shares
+    model.pendingYield = 300
+    assert model.harvest() == 300
+    assert model.deposit("bob", 450) == 300
+    model.check()
+
+    # 400 shares are worth 600: 480 idle in the sett, 120 from the pool (its 0.75% fee rounds down to 0)
+    assert model.withdraw("alice", 400) == 600
+    model.check()
+    assert model.withdraw("alice", 200) == 300 - 300 * 75 // 10000
+    assert model.rewards == 300 * 75 // 10000
+    model.check()
+
+    with pytest.raises(ModelRevert):
+        model.withdraw("alice", 1)
+
+
+def test_shadow_fuzz_invariants_hold():
+    for name, params in [
+        ("StrategyBadgerRewards", {}),
+        ("StrategyCurveGaugeRenBtcCrv", {"withdrawalFee": 75, "performanceFeeGovernance": 1000}),
+    ]:
+        profile = strategy_profile(name, params)
+        fuzzer = ShadowFuzzer(profile, checkEvery=1)
+        assert fuzzer.fuzz(range(1, 21), 2000) == []
+        assert fuzzer.stats["actions"] == 20 * 2000
+
+
+def test_round_trip_loss_scales_with_ppfs():
+    model = ShadowSett(StrategyProfile())
+    model.add_user("alice", 10 ** 18)
+    model.add_user("bob", 10 ** 4)
+    model.deposit("alice", 10 ** 6)
+    model.earn()
+    # ppfs far above 1: a share is worth more than the 2 wei tolerance at ppfs 1
+    model.pendingYield = 10 ** 9
+    model.harvest()
+
+    ppfs = model.ppfs()
+    model.deposit_and_withdraw("bob")
+    loss = 10 ** 4 - model.want["bob"]
+    assert 2 < loss <= max_round_trip_loss(ppfs)
+    model.check()
+
+    # Sett.withdraw divides by totalSupply
+    empty = ShadowSett(StrategyProfile())
+    empty.add_user("carol", 0)
+    with pytest.raises(ModelRevert):
+        empty.withdraw("carol", 0)
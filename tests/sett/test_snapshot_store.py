@@ -0,0 +1,47 @@
+from helpers.sett.snapshot_store import SnapshotStore
+
+
+class FakeSnap:
+    def __init__(self, block, data):
+        self.block = block
+        self.data = data
+
+
+def test_snapshot_store_series(tmp_path):
+    path = str(tmp_path / "snapshots.sqlite")
+    timestamps = lambda blocks: {block: 1600000000 + block * 100 for block in blocks}
+    store = SnapshotStore(path, batchSize=4, timestamps=timestamps)
+
+    for block in range(10):
+        for key, ppfs in [("native.badger", 10 ** 18 + block * 10 ** 15), ("native.renCrv", 10 ** 18)]:
+            store.record(
+                key,
+                FakeSnap(
+                    block,
+                    {
+                        "sett.pricePerFullShare": ppfs,
+                        "balances.want.sett": 2 ** 200 + block,
+                        "strategy.name": "not stored",
+                    },
+                ),
+            )
+    # Same block again is ignored
+    store.record("native.badger", FakeSnap(9, {"sett.pricePerFullShare": 1}))
+    store.close()
+
+    # Reopened from disk
+    store = SnapshotStore(path, timestamps=timestamps)
+    assert store.setts() == ["native.badger", "native.renCrv"]
+    assert store.metrics("native.badger") == ["balances.want.sett", "sett.pricePerFullShare"]
+
+    series = store.ppfs_series("native.badger")
+    assert [point[0] for point in series] == list(range(10))
+    assert series[9] == (9, 1600000900, 10 ** 18 + 9 * 10 ** 15)
+
+    # uint256 values are exact
+    balances = store.balance_series("want", "sett", fromBlock=5, toBlock=6)
+    assert balances["native.renCrv"] == [(5, 1600000500, 2 ** 200 + 5), (6, 1600000600, 2 ** 200 + 6)]
+
+    assert store.ppfs_apy("native.renCrv") == 0
+    assert store.ppfs_apy("native.badger") > 0
+    store.close()
@@ -0,0 +1,78 @@
+import random
+from types import SimpleNamespace
+
+from helpers.keeper_preconditions import rebase_preconditions
+from helpers.keeper_service import KeeperJob, KeeperService
+from helpers.time_utils import hours
+
+
+def test_jobs_spread_over_jitter():
+    rng = random.Random(1)
+    jobs = [KeeperJob("native.{}".format(i), "harvest", hours(24), hours(1)) for i in range(50)]
+    for job in jobs:
+        job.schedule(0, rng, first=True)
+    firstRuns = [job.nextRun for job in jobs]
+    assert all(0 <= nextRun <= hours(1) for nextRun in firstRuns)
+    assert len(set(firstRuns)) == len(jobs)
+
+    for job in jobs:
+        job.schedule(1000, rng)
+        assert hours(23) + 1000 <= job.nextRun <= hours(25) + 1000
+
+
+def test_job_due():
+    job = KeeperJob("native.badger", "earn", 600)
+    job.schedule(0, random.Random(1))
+    assert not job.due(599)
+    assert job.due(600)
+
+    job.queued = True
+    assert not job.due(600)
+    job.queued = False
+    job.enabled = False
+    assert not job.due(600)
+
+
+def test_rebase_preconditions():
+    assert rebase_preconditions(0, True, hours(2) + 1)
+    assert not rebase_preconditions(0, True, hours(2))
+    assert not rebase_preconditions(0, False, hours(3))
+
+
+def make_service(digg=None):
+    # Only the state build_jobs / ready read, without connecting to a node
+    service = KeeperService.__new__(KeeperService)
+    service.chain = "eth"
+    service.badger = SimpleNamespace(
+        digg=digg,
+        getAllSettIds=lambda: ["native.badger"],
+        getStrategy=lambda key: SimpleNamespace(address="0xStrategy"),
+    )
+    service.system = SimpleNamespace(metadata={"native.badger": {"controller": "0xController"}})
+    return service
+
+
+def test_rebase_job_needs_digg():
+    service = make_service()
+    service.actions = ["rebase"]
+    assert service.build_jobs() == []
+
+    service = make_service(digg=SimpleNamespace())
+    service.actions = ["rebase"]
+    assert [job.action for job in service.build_jobs()] == ["rebase"]
+
+
+def test_earn_checks_strategy_controller():
+    service = make_service()
+    job = KeeperJob("native.badger", "earn", 600)
+    data = {
+        "controller": "0xController",
+        "strategyController": "0xController",
+        "controllerStrategy": "0xStrategy",
+        "vaultBalance": 100,
+        "strategyBalance": 0,
+    }
+    assert service.ready(job, data, 0) == (True, None)
+
+    data["strategyController"] = "0xOtherController"
+    assert service.ready(job, data, 0) == (False, "controller / strategy mismatch")
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import pytest
+
+from helpers.multicall.multicall import Multicall, is_execution_error
+from helpers.rpc_batch import RpcError
+
+REVERT = ValueError({"code": -32015, "message": "execution reverted"})
+
+
+class FakeMulticall(Multicall):
+    """
+    aggregate() reverts if any call is bad, or fails outright with a transport error
+    """
+
+    def __init__(self, calls, transportError=None):
+        super().__init__(calls)
+        self.transportError = transportError
+        self.requests = 0
+
+    def aggregate(self, calls):
+        self.requests += 1
+        if self.transportError:
+            raise self.transportError
+        if any(call.bad for call in calls):
+            raise REVERT
+        return [(True, call.target) for call in calls]
+
+
+def make_calls(count, bad=()):
+    return [SimpleNamespace(target=i, bad=i in bad) for i in range(count)]
+
+
+def test_execution_errors():
+    assert is_execution_error(REVERT)
+    assert is_execution_error(RpcError("eth_call", {"code": 3, "message": "execution reverted: !auth"}))
+    assert not is_execution_error(RpcError("eth_call", "429 Too Many Requests"))
+    assert not is_execution_error(ValueError({"code": -32005, "message": "daily request limit exceeded"}))
+    assert not is_execution_error(TimeoutError())
+    assert not is_execution_error(ConnectionError())
+
+
+def test_bisect_isolates_reverts():
+    calls = make_calls(8, bad={5})
+    multicall = FakeMulticall(calls)
+    outputs = multicall.bisect(calls)
+    assert [success for (success, _) in outputs] == [i != 5 for i in range(8)]
+
+
+def test_bisect_raises_transport_errors():
+    calls = make_calls(8)
+    multicall = FakeMulticall(calls, transportError=ConnectionError("connection reset"))
+    with pytest.raises(ConnectionError):
+        multicall.bisect(calls)
+    # No splitting on a network error
+    assert multicall.requests == 1
@@ -0,0 +1,116 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from helpers.rpc_batch import RpcBatch, RpcError
+from helpers.rpc_metrics import RpcMetrics
+from tests.test_rpc_metrics import FakeWeb3
+
+
+class LocalNode:
+    """
+    Answers JSON-RPC batches from a few canned methods, counting HTTP requests
+    """
+
+    def __init__(self):
+        self.httpRequests = 0
+        self.batchSizes = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.httpRequests += 1
+                node.batchSizes.append(len(payload))
+                body = json.dumps([node.answer(request) for request in payload]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:{}".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, request):
+        (method, params) = (request["method"], request["params"])
+        if method == "eth_getBlockByNumber":
+            number = int(params[0], 16)
+            result = {"number": hex(number), "timestamp": hex(1600000000 + 13 * number)}
+        elif method == "eth_getBalance":
+            result = hex(int(params[0], 16) * 10)
+        elif method == "eth_getLogs":
+            result = [
+                {
+                    "blockNumber": params[0]["fromBlock"],
+                    "logIndex": "0x0",
+                    "transactionIndex": "0x1",
+                    "topics": ["0x" + "ab" * 32],
+                    "blockHash": "0x" + "01" * 32,
+                    "transactionHash": "0x" + "02" * 32,
+                    "data": "0x",
+                }
+            ]
+        else:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32601, "message": "no"}}
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+    def stop(self):
+        self.server.shutdown()
+
+
+@pytest.fixture
+def node():
+    node = LocalNode()
+    yield node
+    node.stop()
+
+
+def test_batches_requests(node):
+    batch = RpcBatch(node.url, maxBatch=50)
+    with batch:
+        blocks = [batch.get_block(number) for number in range(120)]
+        balances = [batch.get_balance(hex(i)) for i in range(10)]
+        logs = batch.get_logs({"fromBlock": 7, "toBlock": 9})
+
+    assert node.httpRequests == 3
+    assert sorted(node.batchSizes) == [31, 50, 50]
+    assert [block.result()["timestamp"] for block in blocks] == [1600000000 + 13 * n for n in range(120)]
+    assert [balance.result() for balance in balances] == [i * 10 for i in range(10)]
+    assert logs.result()[0]["blockNumber"] == 7
+
+
+def test_result_flushes_and_errors(node):
+    batch = RpcBatch(node.url)
+    block = batch.get_block(5)
+    failed = batch.request("eth_unknown", [])
+
+    # result() sends everything queued in one request
+    assert block.result()["number"] == 5
+    assert node.httpRequests == 1
+    with pytest.raises(RpcError):
+        failed.result()
+
+    assert batch.get_blocks([1, 2])[2]["timestamp"] == 1600000026
+    assert node.httpRequests == 2
+
+
+def test_batched_requests_reach_installed_metrics(node):
+    w3 = FakeWeb3()
+    metrics = RpcMetrics().install(w3)
+    try:
+        batch = RpcBatch(node.url)
+        batch.get_blocks([1, 2, 3])
+        batch.get_balance("0x1").result()
+    finally:
+        metrics.uninstall(w3)
+
+    assert metrics.rpcCalls == {"eth_getBlockByNumber": 3, "eth_getBalance": 1}
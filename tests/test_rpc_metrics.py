@@ -0,0 +1,50 @@
+from helpers.rpc_metrics import RpcMetrics
+
+
+class FakeOnion(dict):
+    def add(self, middleware, name):
+        self[name] = middleware
+
+    def remove(self, name):
+        del self[name]
+
+
+class FakeWeb3:
+    """
+    Named middleware layers around a provider answering every request
+    """
+
+    def __init__(self):
+        self.middleware_onion = FakeOnion()
+
+    def request(self, method, params):
+        make_request = lambda method, params: {"result": None}
+        for middleware in self.middleware_onion.values():
+            make_request = middleware(make_request, self)
+        return make_request(method, params)
+
+
+def test_instances_count_independently():
+    w3 = FakeWeb3()
+    first = RpcMetrics().install(w3)
+    w3.request("eth_call", [])
+
+    second = RpcMetrics().install(w3)
+    w3.request("eth_call", [])
+    w3.request("eth_blockNumber", [])
+
+    assert first.rpcCalls == {"eth_call": 2, "eth_blockNumber": 1}
+    assert second.rpcCalls == {"eth_call": 1, "eth_blockNumber": 1}
+
+    # Installing twice doesn't double count
+    second.install(w3)
+    w3.request("eth_call", [])
+    assert second.rpcCalls["eth_call"] == 2
+
+
+def test_uninstall():
+    w3 = FakeWeb3()
+    metrics = RpcMetrics().install(w3)
+    metrics.uninstall(w3)
+    w3.request("eth_call", [])
+    assert metrics.total_rpc_calls() == 0